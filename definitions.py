@@ -16,6 +16,8 @@ DATA_DIR = os.path.join(ROOT_DIR, 'data')
 # the output dir
 OUTPUT_DIR = os.path.join(ROOT_DIR, 'output')
 WIKI_DIR = os.path.join(OUTPUT_DIR, 'wiki')
+BENCHMARK_DIR = os.path.join(OUTPUT_DIR, 'benchmark')
+LOG_DIR = os.path.join(OUTPUT_DIR, 'log')
 
 # extracte_data dir
 EXTRACTE_DATA_DIR = os.path.join(ROOT_DIR, "extracte_result")
@@ -1,9 +1,10 @@
 import traceback
 from pathlib import Path
 from bs4 import BeautifulSoup
-from sekg.graph.exporter.graph_data import GraphDataReader, GraphData
+from sekg.graph.exporter.graph_data import GraphData
 from sekg.ir.doc.wrapper import MultiFieldDocumentCollection, MultiFieldDocument
 
+from graph.csr_graph import CSRGraphData, CSRGraphDataReader
 from doc.node_info import ProjectKGNodeInfoFactory, CodeElementNodeInfo, DomainEntityNodeInfo, OperationEntityNodeInfo, \
     WikidataEntityNodeInfo
 
@@ -11,21 +12,24 @@ from doc.node_info import ProjectKGNodeInfoFactory, CodeElementNodeInfo, DomainE
 ## todo: fix this class, it should all be static method.
 class GraphNodeDocumentBuilder:
     """
-    build the basic Node Document from a exist NodeDocument
+    build the basic Node Document from a exist NodeDocument.
+    the graph is only read, so it is frozen as a CSRGraphData, the relations of each node are got from its adjacency.
     """
 
     def __init__(self, graph_data):
-        if isinstance(graph_data, GraphData):
+        if isinstance(graph_data, CSRGraphData):
             self.graph_data = graph_data
+        elif isinstance(graph_data, GraphData):
+            self.graph_data = CSRGraphData(graph_data)
         elif isinstance(graph_data, Path):
-            self.graph_data = GraphData.load(str(graph_data))
+            self.graph_data = CSRGraphData(GraphData.load(str(graph_data)))
         elif isinstance(graph_data, str):
-            self.graph_data = GraphData.load(graph_data)
+            self.graph_data = CSRGraphData(GraphData.load(graph_data))
         else:
             self.graph_data = None
 
-        self.graph_data_reader = GraphDataReader(graph_data=self.graph_data,
-                                                 node_info_factory=ProjectKGNodeInfoFactory())
+        self.graph_data_reader = CSRGraphDataReader(graph_data=self.graph_data,
+                                                    node_info_factory=ProjectKGNodeInfoFactory())
 
         self.doc_collection = MultiFieldDocumentCollection()
 
@@ -238,7 +242,7 @@ class GraphNodeDocumentBuilder:
         print("no_in_relation %r, no_out_relation %r, no_jdk %r, with_method %r" % (
             no_in_relation, no_out_relation, no_jdk, method))
         sub_doc_collection = MultiFieldDocumentCollection()
-        graph_data_reader = GraphDataReader(graph_data=self.graph_data, node_info_factory=ProjectKGNodeInfoFactory())
+        graph_data_reader = self.graph_data_reader
         fail_count = 0
         for id in self.graph_data.get_node_ids():
             node_info = graph_data_reader.get_node_info(id)
@@ -300,7 +304,7 @@ class GraphNodeDocumentBuilder:
         :return:
         """
         sub_doc_collection = MultiFieldDocumentCollection()
-        graph_data_reader = GraphDataReader(graph_data=self.graph_data, node_info_factory=ProjectKGNodeInfoFactory())
+        graph_data_reader = self.graph_data_reader
         fail_count = 0
         for id in self.graph_data.get_node_ids():
             node_info = graph_data_reader.get_node_info(id)
@@ -352,7 +356,7 @@ class GraphNodeDocumentBuilder:
         self.clear()
         self.build_doc()
         sub_doc_collection = MultiFieldDocumentCollection()
-        graph_data_reader = GraphDataReader(graph_data=self.graph_data, node_info_factory=ProjectKGNodeInfoFactory())
+        graph_data_reader = self.graph_data_reader
         fail_count = 0
         for id in self.graph_data.get_node_ids():
             node_info = graph_data_reader.get_node_info(id)
@@ -4,6 +4,8 @@ import sys
 
 from sekg.ir.models.avg_w2v import AVGW2VFLModel
 
+from search.avg_w2v_ann import AVGW2VAnnSearch
+
 sys.path.append('/home/fdse/lvgang/APIKGSummaryV1')
 from pathlib import Path
 
@@ -243,8 +245,9 @@ class CodeGraphBuilder:
         preprocess_doc_collection = PreprocessMultiFieldDocumentCollection.create_from_doc_collection(
             preprocessor=CodeDocPreprocessor(), doc_collection=doc_collection)
 
-        AVGW2VFLModel.train(model_dir_path=word2vec_model_path,
-                            doc_collection=preprocess_doc_collection)
+        w2v_model = AVGW2VFLModel.train(model_dir_path=word2vec_model_path,
+                                        doc_collection=preprocess_doc_collection)
+        AVGW2VAnnSearch.build(w2v_model, word2vec_model_path)
 
         fusion.load_w2v_model(word2vec_model_path)
 
@@ -13,6 +13,8 @@ from sekg.wiki.wiki_util import WikiDataPropertyTable
 from spacy.lang.en import LEMMA_INDEX, LEMMA_EXC, LEMMA_RULES
 from spacy.lemmatizer import Lemmatizer
 
+from search.avg_w2v_ann import AVGW2VAnnSearch
+
 
 class GenericKGFusion:
     INVALID_TEXTS = {"scientific article", "wikimedia template", "wikimedia list article", "wikipedia template",
@@ -40,6 +42,7 @@ class GenericKGFusion:
         self.filter_score = filter_score
         self.NLP = SpacyNLPFactory.create_simple_nlp_pipeline()
         self.all_domain_vector = {}
+        self.ann_search = None
 
     def init_wd_from_cache(self, title_save_path=None, item_save_path=None):
         self.fetcher.init_from_cache(title_save_path=title_save_path, item_save_path=item_save_path)
@@ -62,6 +65,8 @@ class GenericKGFusion:
 
     def load_w2v_model(self, w2v_path):
         self.w2v_model = AVGW2VFLModel.load(w2v_path)
+        # the wikidata items are searched by the ann index if it is built with the model
+        self.ann_search = AVGW2VAnnSearch.load(self.w2v_model, w2v_path)
 
     def init_graph_data(self, graph_data_path):
         self.graph_data = GraphData.load(graph_data_path)
@@ -311,21 +316,35 @@ class GenericKGFusion:
         self.add_wikidata_items(wikiiterms_ids)
         self.graph_data.refresh_indexer()
 
-    def simple_fuse(self, ):
+    def search_wiki_items(self, domain_vec, valid_wiki_index, top_num):
+        """
+        find the top wikidata items of the domain term vector by the doc vectors of the avg_w2v model, by the ann index
+        if it is built with the model, otherwise by scoring all valid items.
+        :param domain_vec: the avg w2v of the domain term
+        :param valid_wiki_index: the doc indexes of the valid wikidata items
+        :param top_num: the number of the items
+        :return: (the doc indexes, the scores), sorted by the score from high to low, the score is (cosine + 1) / 2
+        """
+        if self.ann_search is not None:
+            return self.ann_search.search_by_vector(domain_vec, top_num=top_num, valid_doc_indexes=valid_wiki_index)
+        valid_scores = (self.w2v_model.avg_w2v_model.similar_by_vector(domain_vec, topn=None)[valid_wiki_index] + 1) / 2
+        order = np.lexsort((valid_wiki_index, -valid_scores))[:top_num]
+        return valid_wiki_index[order], valid_scores[order]
+
+    def simple_fuse(self, top_num=5):
         """
         simple fuse wiki data, the graph is with all wikidata nodes, we need to calculate similarity to filter some
+        :param top_num: the max number of the wikidata items linked to each domain term
         :return:
         """
         record = []
         valid_domain_id_set = self.graph_data.get_node_ids_by_label(DomainConstant.LABEL_DOMAIN_TERM)
         i = 0
         valid_wiki_id_set = self.graph_data.get_node_ids_by_label("wikidata")
-        valid_wiki_index = np.array(list(self.w2v_model.preprocess_doc_collection.doc_id_set_2_doc_index_set(
-            valid_wiki_id_set)))
+        valid_wiki_index = np.array(sorted(self.w2v_model.preprocess_doc_collection.doc_id_set_2_doc_index_set(
+            valid_wiki_id_set)), dtype=np.int64)
         print("valid_wiki_index size: ", valid_wiki_index.size)
 
-        doc_model = self.w2v_model.avg_w2v_model_field_map["doc"]
-
         for node_id in valid_domain_id_set:
             try:
                 node_json = self.graph_data.get_node_info_dict(node_id=node_id)
@@ -340,24 +359,16 @@ class GenericKGFusion:
                 text = " ".join(list(alias_set))
                 domain_words = self.w2v_model.preprocessor.clean(text)
                 domain_vec = self.w2v_model.get_avg_w2v_vec(domain_words)
-                score_vector = (doc_model.similar_by_vector(domain_vec, topn=None) + 1) / 2
-
-                sort_index = np.argsort(-score_vector)
-                score_vector = score_vector[sort_index]
-
-                over_thred = np.where(score_vector > 0.8)
-                top_wiki_valid = np.intersect1d(over_thred, valid_wiki_index)
-
-                if top_wiki_valid.size:
+                # the same top items whether the ann index is built or not, only the ones over 0.8 are linked
+                top_wiki_valid, top_scores = self.search_wiki_items(domain_vec, valid_wiki_index, top_num)
+                sorted_index_scores = np.array((top_wiki_valid[top_scores > 0.8], top_scores[top_scores > 0.8])).T
+                if len(sorted_index_scores):
                     print("number {}:{} ,Done!".format(i, node_id))
-                # score_vector = score_vector[top_wiki_valid]
-
-                sorted_index_scores = np.array((top_wiki_valid, score_vector[top_wiki_valid])).T
                 retrieval_results = []
                 rank = 0
                 for (doc_index, score) in sorted_index_scores:
-                    entity_document = self.w2v_model.doc_index2doc(doc_index)
-                    if rank >= 5:
+                    entity_document = self.w2v_model.doc_index2doc(int(doc_index))
+                    if rank >= top_num:
                         break
                     if entity_document is None:
                         continue
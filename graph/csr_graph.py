@@ -0,0 +1,256 @@
+import bisect
+
+import numpy as np
+from sekg.graph.exporter.graph_data import GraphData, GraphDataReader
+
+
+class CSRGraphData:
+    """
+    a frozen, array-backed view of a GraphData for the read-mostly work, e.g. serving the summary, building the
+    documents and the node2vec random walks. it could be used in place of the GraphData by its read methods
+    (get_node_ids, get_node_info_dict, get_node_ids_by_label, get_relations, get_all_out_relations, ...),
+    but it could not be changed.
+    - the nodes are sorted by id, the position of a node in node_ids is got by the dense lookup id_2_position, or by
+      binary search if the ids are sparse.
+    - the relation types are interned to small ints, the index in relation_types.
+    - the out relations are in CSR: the relations of the node at position p are [out_offsets[p]:out_offsets[p + 1]]
+      of out_types and out_ids (the end nodes), sorted by the relation type and the end node, so the relations of a
+      type are a range. the in relations are the same (CSC) with in_offsets, in_types and in_ids (the start nodes).
+    - the labels are bitsets, label_bits[i] is the packed bits of the nodes having the label labels[i].
+    the node info dicts are shared with the GraphData, so the GraphData could be dropped after the view is built.
+    """
+
+    # the dense lookup from node id to position is used if the ids are not sparser than this
+    MAX_ID_RANGE_RATIO = 4
+
+    def __init__(self, graph_data: GraphData):
+        node_ids = sorted(graph_data.get_node_ids())
+        id_dtype = np.int32 if len(node_ids) == 0 or (node_ids[0] >= -2 ** 31 and node_ids[-1] < 2 ** 31) \
+            else np.int64
+        self.node_ids = np.array(node_ids, dtype=id_dtype)
+        self.node_infos = [graph_data.get_node_info_dict(node_id) for node_id in node_ids]
+        self.min_id = node_ids[0] if len(node_ids) > 0 else 0
+        id_range = node_ids[-1] - self.min_id + 1 if len(node_ids) > 0 else 0
+        if id_range <= self.MAX_ID_RANGE_RATIO * len(node_ids):
+            # id - min_id -> the position of the node, -1 if the node is not exist
+            self.id_2_position = np.full(id_range, -1, dtype=np.int32 if len(node_ids) < 2 ** 31 else np.int64)
+            self.id_2_position[self.node_ids - self.min_id] = np.arange(len(node_ids))
+        else:
+            self.id_2_position = None
+
+        relations = list(graph_data.get_relation_pairs_with_type())
+        self.relation_types = sorted({relation_type for start_id, relation_type, end_id in relations})
+        self.relation_type_2_index = {relation_type: index for index, relation_type in enumerate(self.relation_types)}
+        type_dtype = np.min_scalar_type(max(len(self.relation_types) - 1, 0))
+        start_ids = np.array([relation[0] for relation in relations], dtype=id_dtype)
+        end_ids = np.array([relation[2] for relation in relations], dtype=id_dtype)
+        types = np.array([self.relation_type_2_index[relation[1]] for relation in relations], dtype=type_dtype)
+        self.out_offsets, self.out_types, self.out_ids = self.__build_adjacency(start_ids, types, end_ids)
+        self.in_offsets, self.in_types, self.in_ids = self.__build_adjacency(end_ids, types, start_ids)
+
+        self.labels = sorted(graph_data.get_all_labels())
+        self.label_2_index = {label: index for index, label in enumerate(self.labels)}
+        label_masks = np.zeros((len(self.labels), len(node_ids)), dtype=bool)
+        for index, label in enumerate(self.labels):
+            label_node_ids = np.array(sorted(graph_data.get_node_ids_by_label(label)), dtype=id_dtype)
+            label_masks[index, np.searchsorted(self.node_ids, label_node_ids)] = True
+        self.label_bits = np.packbits(label_masks, axis=1)
+
+    def __build_adjacency(self, node_ids, types, neighbour_ids):
+        """
+        :param node_ids: the node ids of the relations
+        :param types: the relation types of the relations
+        :param neighbour_ids: the ids of the other nodes of the relations
+        :return: (offsets, types, neighbour ids), the relations are sorted by the node, type and neighbour
+        """
+        order = np.lexsort((neighbour_ids, types, node_ids))
+        offsets = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(np.searchsorted(self.node_ids, node_ids), minlength=len(self.node_ids)),
+                  out=offsets[1:])
+        return offsets, types[order], neighbour_ids[order]
+
+    def get_array_bytes(self):
+        """
+        :return: the bytes of the arrays of the nodes, relations and labels, the node info dicts are not included
+        """
+        arrays = [self.node_ids, self.out_offsets, self.out_types, self.out_ids, self.in_offsets, self.in_types,
+                  self.in_ids, self.label_bits]
+        if self.id_2_position is not None:
+            arrays.append(self.id_2_position)
+        return sum(array.nbytes for array in arrays)
+
+    def get_position(self, node_id):
+        """
+        :return: the position of the node in node_ids, None if the node is not exist
+        """
+        if self.id_2_position is not None:
+            index = node_id - self.min_id
+            if 0 <= index < len(self.id_2_position):
+                position = int(self.id_2_position[index])
+                if position >= 0:
+                    return position
+            return None
+        position = int(np.searchsorted(self.node_ids, node_id))
+        if position < len(self.node_ids) and self.node_ids[position] == node_id:
+            return position
+        return None
+
+    def __get_range(self, position, offsets, types, relation_type):
+        """
+        :return: (start, end) of the relations of the node, only the relations of the type if it is not None
+        """
+        start, end = offsets[position:position + 2].tolist()
+        if relation_type is None:
+            return start, end
+        type_index = self.relation_type_2_index.get(relation_type, None)
+        if type_index is None:
+            return start, start
+        # the relations of a node are few, the python bisect is faster than np.searchsorted on them
+        node_types = types[start:end].tolist()
+        return start + bisect.bisect_left(node_types, type_index), start + bisect.bisect_right(node_types, type_index)
+
+    def __get_relations(self, node_id, relation_type, offsets, types, neighbour_ids, out):
+        position = self.get_position(node_id)
+        if position is None:
+            return set()
+        start, end = self.__get_range(position, offsets, types, relation_type)
+        node_neighbour_ids = neighbour_ids[start:end].tolist()
+        relation_types = [self.relation_types[type_index] for type_index in types[start:end].tolist()]
+        node_ids = [int(node_id)] * len(node_neighbour_ids)
+        if out:
+            return set(zip(node_ids, relation_types, node_neighbour_ids))
+        return set(zip(node_neighbour_ids, relation_types, node_ids))
+
+    def get_out_neighbour_ids(self, node_id, relation_type=None):
+        """
+        :param node_id: the node id
+        :param relation_type: only the relations of this type if it is not None
+        :return: list of the end node id of the out relations of the node
+        """
+        position = self.get_position(node_id)
+        if position is None:
+            return []
+        start, end = self.__get_range(position, self.out_offsets, self.out_types, relation_type)
+        return self.out_ids[start:end].tolist()
+
+    def get_in_neighbour_ids(self, node_id, relation_type=None):
+        """
+        :param node_id: the node id
+        :param relation_type: only the relations of this type if it is not None
+        :return: list of the start node id of the in relations of the node
+        """
+        position = self.get_position(node_id)
+        if position is None:
+            return []
+        start, end = self.__get_range(position, self.in_offsets, self.in_types, relation_type)
+        return self.in_ids[start:end].tolist()
+
+    def get_all_out_relations(self, node_id):
+        return self.__get_relations(node_id, None, self.out_offsets, self.out_types, self.out_ids, out=True)
+
+    def get_all_in_relations(self, node_id):
+        return self.__get_relations(node_id, None, self.in_offsets, self.in_types, self.in_ids, out=False)
+
+    def get_relations(self, start_id=None, relation_type=None, end_id=None):
+        """
+        the same as GraphData.get_relations(), the relations are got by the typed adjacency instead of filtering.
+        :return: set of (start_id, relation_type, end_id)
+        """
+        if start_id is not None:
+            relations = self.__get_relations(start_id, relation_type, self.out_offsets, self.out_types,
+                                             self.out_ids, out=True)
+            if end_id is not None:
+                relations = {relation for relation in relations if relation[2] == end_id}
+            return relations
+        if end_id is not None:
+            return self.__get_relations(end_id, relation_type, self.in_offsets, self.in_types, self.in_ids,
+                                        out=False)
+        if relation_type is None:
+            return self.get_relation_pairs_with_type()
+        type_index = self.relation_type_2_index.get(relation_type, None)
+        if type_index is None:
+            return set()
+        indexes = np.flatnonzero(self.out_types == type_index)
+        start_ids = self.node_ids[np.searchsorted(self.out_offsets, indexes, side="right") - 1].tolist()
+        end_ids = self.out_ids[indexes].tolist()
+        return set(zip(start_ids, [relation_type] * len(start_ids), end_ids))
+
+    def get_relation_arrays(self):
+        """
+        :return: (start ids, relation type indexes, end ids) of all relations as numpy arrays, sorted by the start
+        node, the type and the end node. the type index is the index in relation_types.
+        """
+        return np.repeat(self.node_ids, np.diff(self.out_offsets)), self.out_types, self.out_ids
+
+    def get_relation_pairs(self):
+        start_ids, types, end_ids = self.get_relation_arrays()
+        return set(zip(start_ids.tolist(), end_ids.tolist()))
+
+    def get_relation_pairs_with_type(self):
+        start_ids, types, end_ids = self.get_relation_arrays()
+        relation_types = [self.relation_types[type_index] for type_index in types.tolist()]
+        return set(zip(start_ids.tolist(), relation_types, end_ids.tolist()))
+
+    def get_node_num(self):
+        return len(self.node_ids)
+
+    def get_relation_num(self):
+        return len(self.out_ids)
+
+    def get_node_ids(self):
+        return set(self.node_ids.tolist())
+
+    def get_node_info_dict(self, node_id):
+        position = self.get_position(node_id)
+        if position is None:
+            return None
+        return self.node_infos[position]
+
+    def get_all_labels(self):
+        return list(self.labels)
+
+    def get_all_relation_types(self):
+        return set(self.relation_types)
+
+    def get_relation_count_by_type(self, relation_type):
+        type_index = self.relation_type_2_index.get(relation_type, None)
+        if type_index is None:
+            return 0
+        return int(np.count_nonzero(self.out_types == type_index))
+
+    def get_label_mask(self, label):
+        """
+        :return: the bool numpy array, True at the positions of the nodes having the label
+        """
+        label_index = self.label_2_index.get(label, None)
+        if label_index is None:
+            return np.zeros(len(self.node_ids), dtype=bool)
+        return np.unpackbits(self.label_bits[label_index], count=len(self.node_ids)).astype(bool)
+
+    def get_node_ids_by_label(self, label):
+        return set(self.node_ids[self.get_label_mask(label)].tolist())
+
+    def has_label(self, node_id, label):
+        """
+        :return: True if the node has the label, by testing its bit
+        """
+        position = self.get_position(node_id)
+        label_index = self.label_2_index.get(label, None)
+        if position is None or label_index is None:
+            return False
+        return bool((self.label_bits[label_index, position >> 3] >> (7 - (position & 7))) & 1)
+
+    def __repr__(self):
+        return "<CSRGraphData nodes=%d relations=%d relation types=%d labels=%d>" % (
+            self.get_node_num(), self.get_relation_num(), len(self.relation_types), len(self.labels))
+
+
+class CSRGraphDataReader(GraphDataReader):
+    """
+    the GraphDataReader over a CSRGraphData, the GraphDataReader only accepts the GraphData.
+    """
+
+    def __init__(self, graph_data, node_info_factory):
+        super().__init__(graph_data=None, node_info_factory=node_info_factory)
+        if isinstance(graph_data, (GraphData, CSRGraphData)):
+            self.graph_data = graph_data
@@ -1,30 +1,72 @@
-from flask import Flask, request, jsonify
+import argparse
+import os
+
 from script.summary.generate_summary import Summary
-from flask_cors import CORS
+from service.app import create_app
+from service.async_server import AdmissionControl, AsyncSummaryServer
+from service.summary_cache import SummaryResultCache
+from service.summary_registry import SummaryRegistry, SummaryReloadWatcher, load_summary
+from service.summary_store import SummaryStore
+from util.metrics_util import SummaryMetrics
 from util.path_util import PathUtil
+from util.trace_util import SlowQueryLog
 
-app = Flask(__name__)
-CORS(app)
+# the default summary of the requests, the requests could choose another project, version and model
 pro_name = "jdk8"
 version = "v3_1"
 compound_model_name = "compound_{base_model}+{extra_model}".format(base_model="avg_w2v", extra_model="svm")
-model_dir = PathUtil.sim_model(pro_name=pro_name, version=version, model_type=compound_model_name)
-summary = Summary(pro_name, version, model_dir)
+# the summaries are loaded by Summary.load() at their first request, the least recently used ones are evicted when
+# their memory is over the budget
+memory_budget_mb = 24 * 1024
+# the ann index of avg_w2v is the first stage of the cascade of the query-only summaries if
+# APISUMMARY_ANN_CASCADE_TOP_NUM is set, e.g. 2000. it is used only if its recall on the queries of the list in
+# APISUMMARY_ANN_CASCADE_QUERIES (one query per line) is high enough, see Summary.set_ann_cascade()
+ann_cascade_top_num = os.environ.get("APISUMMARY_ANN_CASCADE_TOP_NUM", None)
+
 
+def load_summary_with_ann_cascade(pro_name, version, model_name):
+    summary = load_summary(pro_name, version, model_name)
+    with open(os.environ["APISUMMARY_ANN_CASCADE_QUERIES"]) as f:
+        queries = [line.strip() for line in f if line.strip()]
+    summary.set_ann_cascade({mode_name: int(ann_cascade_top_num) for mode_name in Summary.QUERY_ONLY_MODE_NAMES},
+                            queries)
+    return summary
 
-@app.route('/createAPISummary/', methods=['POST'])
-def create_api_summary():
-    request_body = request.json
-    query = request_body['query'].strip()
-    class_name_or_number = request_body['class_name_or_number'].strip()
-    if query != '' and query is not None and class_name_or_number != '' and class_name_or_number is not None:
-        if class_name_or_number.isdigit():
-            class_or_method_2_sentence = jsonify(summary.get_summary_only_query_by_method(query, 66))
-        else:
-            a = {0: summary.get_summary(query, class_name_or_number)}
-            class_or_method_2_sentence = jsonify(a)
-        return class_or_method_2_sentence
 
+registry = SummaryRegistry((pro_name, version, compound_model_name), memory_budget_mb=memory_budget_mb,
+                           load=load_summary_with_ann_cascade if ann_cascade_top_num else load_summary)
+# the snapshot built by script.summary.build_snapshot starts fastest, otherwise the graph index and
+# the model vectors exported by script.summary.export_serving_artifacts are memory-mapped and shared by the workers
+summary = registry.get(pro_name, version, compound_model_name)
+# the loaded summaries are reloaded without stopping the service when their files are rebuilt, they could also be
+# reloaded by POST /admin/reload/ with the token in the APISUMMARY_ADMIN_TOKEN environment variable
+reload_watcher = SummaryReloadWatcher(registry, interval=60.0)
+reload_watcher.start()
+# the summaries of the hot queries materialized by script.summary.materialize_summary are served before computing
+store_path = PathUtil.summary_store(pro_name=pro_name, version=version, model_type=compound_model_name)
+summary_store = SummaryStore(store_path) if SummaryStore.exists(store_path) else None
+summary_cache = SummaryResultCache(max_size=4096, ttl=24 * 3600, store=summary_store)
+# the latency of the requests and the stages of the summary, exposed by /metrics
+metrics = SummaryMetrics(enabled=True)
+# each request is traced, the requests slower than the threshold are written into the slow-query log with their spans
+slow_query_log = SlowQueryLog(PathUtil.slow_query_log(), threshold=1.0)
+# the bounded pool of the async serving mode, the requests beyond it are rejected with 503
+admission_control = AdmissionControl(worker_num=8, queue_size=32)
+app = create_app(summary_cache=summary_cache, metrics=metrics, slow_query_log=slow_query_log,
+                 admission_control=admission_control, registry=registry,
+                 admin_token=os.environ.get("APISUMMARY_ADMIN_TOKEN", None))
+# the async serving mode with the deadline of the requests, e.g. "uvicorn run:asgi_app --port 5000"
+asgi_app = AsyncSummaryServer(app, admission_control, timeout=5.0)
 
 if __name__ == '__main__':
-    app.run()
+    parser = argparse.ArgumentParser(description="serve the api summary")
+    parser.add_argument("--async", dest="async_mode", action="store_true",
+                        help="serve asgi_app by uvicorn instead of the flask development server")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    if args.async_mode:
+        import uvicorn
+
+        uvicorn.run(asgi_app, port=args.port)
+    else:
+        app.run(threaded=True, port=args.port)
@@ -0,0 +1,82 @@
+import json
+import time
+
+import numpy as np
+
+from script.benchmark.synthetic import build_synthetic_graph_data, SyntheticSearchModel, build_synthetic_queries, \
+    JDK_CLASS_NUM
+from script.benchmark.util import latency_statistics
+from search.ivf_index import IVFIndex
+from util.path_util import PathUtil
+
+"""
+compare the IVFIndex of the doc vectors with scoring all docs like the avg_w2v model,
+the recall@10 and the latency for each probe_num, the search is on all docs and limited to the classes.
+the doc vectors are from the synthetic model of the jdk-sized graph.
+"""
+
+
+def brute_force_top(doc_vectors, query_vector, top_num, valid_doc_indexes=None):
+    scores = doc_vectors.dot(query_vector)
+    if valid_doc_indexes is None:
+        valid_doc_indexes = np.arange(len(doc_vectors))
+    else:
+        scores = scores[valid_doc_indexes]
+    order = np.lexsort((valid_doc_indexes, -scores))[:top_num]
+    return valid_doc_indexes[order]
+
+
+def benchmark_search(search, query_vectors, truths, top_num):
+    """
+    :return: the recall@top_num to the truths and the latency of the search
+    """
+    costs = []
+    recalls = []
+    for query_vector, truth in zip(query_vectors, truths):
+        start = time.perf_counter()
+        doc_indexes = search(query_vector)
+        costs.append(time.perf_counter() - start)
+        recalls.append(len(set(doc_indexes.tolist()) & set(truth.tolist())) / len(truth))
+    result = latency_statistics(costs)
+    result["recall"] = float(np.mean(recalls))
+    return result
+
+
+def benchmark_ann(class_num, query_num, top_num=10, probe_nums=(4, 16, 64, 128, 256, 512)):
+    graph_data = build_synthetic_graph_data(class_num=class_num)
+    model = SyntheticSearchModel.create(graph_data)
+    doc_vectors = model.doc_vectors
+    query_vectors = [IVFIndex.normalize(model.string2vector(query)) for query in build_synthetic_queries(query_num)]
+    class_ids = graph_data.get_node_ids_by_label("class")
+    valid_class_indexes = np.array(sorted(model.preprocess_doc_collection.doc_id_set_2_doc_index_set(class_ids)))
+
+    start = time.perf_counter()
+    index = IVFIndex.build(doc_vectors)
+    build_cost = time.perf_counter() - start
+    print("build %r in %.2fs" % (index, build_cost))
+
+    benchmark_result = {"doc_num": len(doc_vectors), "class_doc_num": len(valid_class_indexes),
+                        "list_num": index.get_list_num(), "build_seconds": build_cost, "top_num": top_num}
+    for filter_name, valid_doc_indexes in [("all_docs", None), ("classes", valid_class_indexes)]:
+        truths = [brute_force_top(doc_vectors, query_vector, top_num, valid_doc_indexes)
+                  for query_vector in query_vectors]
+        filter_result = {"brute_force": benchmark_search(
+            lambda query_vector: brute_force_top(doc_vectors, query_vector, top_num, valid_doc_indexes),
+            query_vectors, truths, top_num)}
+        for probe_num in probe_nums:
+            filter_result["probe_num_%d" % probe_num] = benchmark_search(
+                lambda query_vector: index.search(query_vector, top_num, valid_doc_indexes, probe_num)[0],
+                query_vectors, truths, top_num)
+        for name, result in filter_result.items():
+            print("%s %s recall@%d=%.3f avg=%.3fms p99=%.3fms" % (filter_name, name, top_num, result["recall"],
+                                                                  result["avg_ms"], result["p99_ms"]))
+        benchmark_result[filter_name] = filter_result
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_ann(class_num=JDK_CLASS_NUM, query_num=200)
+    result_path = PathUtil.benchmark_result("ann")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,142 @@
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+
+from script.benchmark.load_test import serve_app
+from script.benchmark.synthetic import create_synthetic_summary, build_synthetic_queries, JDK_CLASS_NUM
+from script.benchmark.util import clear_model_cache, latency_statistics
+from service.app import create_app, CLASS_NUMBER
+from service.async_server import AdmissionControl, AsyncSummaryServer, PARTIAL_HEADER, TIMEOUT_HEADER
+from service.summary_cache import SummaryResultCache
+from util.path_util import PathUtil
+
+"""
+compare the async serving mode (AsyncSummaryServer by uvicorn) with the threaded flask server of run.py under
+overload: the query-only summaries by method are requested at a fixed rate, below and beyond the capacity of the
+server, whatever the responses are. the requests have a deadline (the X-Request-Timeout header), the threaded server
+ignores it.
+for each server, the outcomes of the requests (complete, partial, 503, 504, client timeout), the throughput and
+the latency are reported. the goodput is the number of summaries per second responded within the deadline.
+the result cache is disabled, so each request is computed.
+"""
+
+
+def find_free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_asgi_app(asgi_app, host="127.0.0.1"):
+    """
+    serve the asgi app by uvicorn in a daemon thread.
+    :return: (the server, the base url), set server.should_exit to stop it
+    """
+    port = find_free_port()
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host=host, port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, "http://%s:%d" % (host, port)
+
+
+def send_request(base_url, query, timeout, client_timeout, scheduled_time=None):
+    """
+    :param scheduled_time: the time.perf_counter() the request is scheduled at, the latency is counted from it
+    :return: (the outcome: "complete", "partial", "503", "504", "client_timeout" or "error", the seconds)
+    """
+    body = {"query": query, "class_name_or_number": str(CLASS_NUMBER)}
+    http_request = urllib.request.Request(base_url + "/createAPISummary/", data=json.dumps(body).encode("utf-8"),
+                                          headers={"Content-Type": "application/json", TIMEOUT_HEADER: str(timeout)})
+    start = time.perf_counter() if scheduled_time is None else scheduled_time
+    try:
+        with urllib.request.urlopen(http_request, timeout=client_timeout) as response:
+            response.read()
+            outcome = "partial" if response.headers.get(PARTIAL_HEADER) is not None else "complete"
+    except urllib.error.HTTPError as e:
+        outcome = str(e.code)
+    except Exception as e:
+        outcome = "client_timeout" if "timed out" in str(e) else "error"
+    return outcome, time.perf_counter() - start
+
+
+def run_overload(base_url, queries, request_rate, duration, timeout, client_timeout, client_num=256):
+    """
+    send the requests at a fixed rate whatever the responses are (an open loop), so the load is not reduced
+    when the server is slow. the latency is counted from the time the request is scheduled.
+    """
+    request_num = int(request_rate * duration)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=client_num) as executor:
+        futures = []
+        for index in range(request_num):
+            scheduled_time = start + index / request_rate
+            time.sleep(max(scheduled_time - time.perf_counter(), 0))
+            futures.append(executor.submit(send_request, base_url, queries[index % len(queries)], timeout,
+                                           client_timeout, scheduled_time))
+        responses = [future.result() for future in futures]
+    total_cost = time.perf_counter() - start
+    outcome_2_num = {}
+    for outcome, cost in responses:
+        outcome_2_num[outcome] = outcome_2_num.get(outcome, 0) + 1
+    summary_costs = [cost for outcome, cost in responses if outcome in ("complete", "partial")]
+    good_num = len([cost for cost in summary_costs if cost <= timeout + AsyncSummaryServer.RESPONSE_GRACE])
+    return {
+        "request_num": len(responses),
+        "outcome_2_num": outcome_2_num,
+        "throughput_per_second": len(summary_costs) / total_cost,
+        "goodput_per_second": good_num / total_cost,
+        "summary_latency": latency_statistics(summary_costs),
+        "all_latency": latency_statistics([cost for outcome, cost in responses]),
+    }
+
+
+def benchmark_async_serving(class_num, request_rates, duration=10.0, timeout=0.25, worker_num=2, queue_size=2,
+                            client_timeout=30.0):
+    """
+    :param request_rates: the numbers of requests sent per second, e.g. below and beyond the capacity of the server
+    :param timeout: the seconds of the deadline of each request
+    """
+    summary = create_synthetic_summary(class_num=class_num)
+    queries = build_synthetic_queries(5000)
+    benchmark_result = {"class_num": class_num, "duration": duration, "timeout": timeout, "worker_num": worker_num,
+                        "queue_size": queue_size}
+    admission_control = AdmissionControl(worker_num=worker_num, queue_size=queue_size)
+    app = create_app(summary, summary_cache=SummaryResultCache(max_size=0), admission_control=admission_control)
+    threaded_server, threaded_url = serve_app(create_app(summary, summary_cache=SummaryResultCache(max_size=0)))
+    async_server, async_url = serve_asgi_app(AsyncSummaryServer(app, admission_control))
+    try:
+        for name, base_url in [("threaded", threaded_url), ("async", async_url)]:
+            send_request(base_url, queries[0], timeout, client_timeout)
+            server_result = {}
+            for request_rate in request_rates:
+                clear_model_cache(summary.model, summary.query_encoding_cache)
+                run_result = run_overload(base_url, queries, request_rate, duration, timeout, client_timeout)
+                print("%s rate=%d/s goodput=%.1f/s throughput=%.1f/s p50=%.1fms p99=%.1fms %s" % (
+                    name, request_rate, run_result["goodput_per_second"], run_result["throughput_per_second"],
+                    run_result["all_latency"]["p50_ms"], run_result["all_latency"]["p99_ms"],
+                    run_result["outcome_2_num"]))
+                server_result["rate_%d" % request_rate] = run_result
+                # the requests left in the threaded server are finished before the next run
+                time.sleep(1.0)
+            benchmark_result[name] = server_result
+        benchmark_result["admission_control"] = admission_control.get_statistics()
+    finally:
+        threaded_server.shutdown()
+        async_server.should_exit = True
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_async_serving(class_num=JDK_CLASS_NUM, request_rates=[20, 60, 120])
+    result_path = PathUtil.benchmark_result("async_serving")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,65 @@
+import json
+import random
+import time
+
+from script.benchmark.synthetic import create_synthetic_summary, build_synthetic_queries
+from script.benchmark.util import clear_model_cache
+from util.path_util import PathUtil
+
+"""
+compare the throughput of summarizing a batch of (query, class_name) by calling get_summary() for each item
+and by one get_summaries() call, on a jdk-sized synthetic graph.
+"""
+
+
+def build_batch(summary, queries, batch_size, seed=0):
+    random_generator = random.Random(seed)
+    class_names = sorted(summary.graph_data.get_node_info_dict(class_id)["properties"]["qualified_name"] for class_id
+                         in summary.graph_data.get_node_ids_by_label("class"))
+    return [(random_generator.choice(queries), random_generator.choice(class_names)) for _ in range(batch_size)]
+
+
+def run_batch(summary, batch, batch_summary, repeat_num):
+    costs = []
+    summaries = None
+    for _ in range(repeat_num):
+        clear_model_cache(summary.model, summary.query_encoding_cache)
+        start = time.perf_counter()
+        summaries = batch_summary(batch)
+        costs.append(time.perf_counter() - start)
+    avg_cost = sum(costs) / len(costs)
+    return {
+        "avg_batch_ms": 1000 * avg_cost,
+        "items_per_second": len(batch) / avg_cost,
+    }, summaries
+
+
+def benchmark_batch_summary(class_num, query_num, batch_sizes, repeat_num):
+    summary = create_synthetic_summary(class_num=class_num)
+    queries = build_synthetic_queries(query_num)
+    benchmark_result = {"class_num": class_num, "node_num": summary.graph_data.get_node_num(),
+                        "query_num": query_num}
+    for batch_size in batch_sizes:
+        batch = build_batch(summary, queries, batch_size)
+        per_call_result, per_call_summaries = run_batch(
+            summary, batch, lambda items: [summary.get_summary(query, class_name) for query, class_name in items],
+            repeat_num)
+        batch_result, batch_summaries = run_batch(summary, batch, summary.get_summaries, repeat_num)
+        if per_call_summaries != batch_summaries:
+            raise Exception("the summaries of the batch %d are different from get_summary" % batch_size)
+
+        benchmark_result["batch_%d" % batch_size] = {
+            "per_call": per_call_result,
+            "batch": batch_result,
+            "speedup": batch_result["items_per_second"] / per_call_result["items_per_second"],
+        }
+        print("batch_%d" % batch_size, json.dumps(benchmark_result["batch_%d" % batch_size], indent=4))
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_batch_summary(class_num=4240, query_num=64, batch_sizes=[32, 128], repeat_num=3)
+    result_path = PathUtil.benchmark_result("batch_summary")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
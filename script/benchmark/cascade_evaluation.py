@@ -0,0 +1,148 @@
+import json
+import time
+
+import numpy as np
+
+from script.benchmark.synthetic import build_synthetic_graph_data, create_synthetic_compound_model, \
+    build_synthetic_queries, JDK_CLASS_NUM
+from script.benchmark.util import latency_statistics
+from script.summary.generate_summary import Summary
+from search.avg_w2v_ann import AVGW2VAnnSearch
+from search.ivf_index import IVFIndex
+from util.path_util import PathUtil
+
+"""
+evaluate the two-stage cascade of the query-only summaries against scoring all candidates by the compound model:
+for each summary mode and each N, how many summaries and top classes are changed and the latency,
+and for each partition, the recall@10 and the latency of the scoring.
+it runs on the jdk-sized synthetic graph with a synthetic compound model (two sub-models weighted 0.6 and 0.4 like
+avg_w2v+svm). two first stages are compared:
+- "top_<N>": the first sub-model scores all candidates exactly, it only saves scoring the second sub-model on the
+  candidates out of the top N.
+- "ann_top_<N>": the top N are searched by the IVF index of the first sub-model (AVGW2VAnnSearch), only the
+  candidates in the probed lists are scored.
+"""
+
+SUMMARY_MODES = ["get_summary_only_query", "get_summary_only_query_by_method", "get_summary_only_query_by_sentence"]
+
+
+def get_class_names(class_summaries):
+    """
+    :return: the class names of the summary of the query-only mode, in the order of the classes
+    """
+    return [list(class_summaries[index][0].keys())[0] for index in sorted(class_summaries.keys())]
+
+
+def run_summary_mode(summary_mode, queries, class_number):
+    costs = []
+    summaries = []
+    for query in queries:
+        start = time.perf_counter()
+        summaries.append(summary_mode(query, class_number))
+        costs.append(time.perf_counter() - start)
+    return latency_statistics(costs), summaries
+
+
+def compare_summaries(full_summaries, cascade_summaries):
+    equal_num = 0
+    class_order_equal_num = 0
+    class_overlaps = []
+    for full_summary, cascade_summary in zip(full_summaries, cascade_summaries):
+        equal_num += full_summary == cascade_summary
+        full_class_names = get_class_names(full_summary)
+        cascade_class_names = get_class_names(cascade_summary)
+        class_order_equal_num += full_class_names == cascade_class_names
+        class_overlaps.append(len(set(full_class_names) & set(cascade_class_names)) / max(len(full_class_names), 1))
+    return {
+        "summary_equal_ratio": equal_num / len(full_summaries),
+        "class_order_equal_ratio": class_order_equal_num / len(full_summaries),
+        "class_overlap": float(np.mean(class_overlaps)),
+    }
+
+
+def evaluate_partitions(summary, queries, top_nums, first_stage_ann, recall_num=10):
+    """
+    compare scoring a partition by the cascade with scoring all its docs by the compound model.
+    :return: partition name -> "full", "top_<N>" or "ann_top_<N>" -> the scoring latency (and the recall@recall_num
+    of the cascade)
+    """
+    label_partitions = summary.label_partitions
+    query_vectors_list = [label_partitions.encode(query) for query in queries]
+    result = {}
+    for name in label_partitions.PARTITION_NAMES:
+        costs = []
+        full_scores_list = []
+        for query_vectors in query_vectors_list:
+            start = time.perf_counter()
+            full_scores_list.append(label_partitions.score(query_vectors, name))
+            costs.append(time.perf_counter() - start)
+        result[name] = {"full": {"score_latency": latency_statistics(costs)}}
+        for top_num in top_nums:
+            for prefix, ann in [("top", None), ("ann_top", first_stage_ann)]:
+                costs = []
+                recalls = []
+                for query, query_vectors, full_scores in zip(queries, query_vectors_list, full_scores_list):
+                    start = time.perf_counter()
+                    cascade_scores = label_partitions.cascade_score(query_vectors, name, top_num,
+                                                                    first_stage_ann=ann)
+                    costs.append(time.perf_counter() - start)
+                    full_ids = {item.doc_id for item in label_partitions.search(query, name, recall_num,
+                                                                                scores=full_scores)}
+                    cascade_ids = {item.doc_id for item in label_partitions.search(query, name, recall_num,
+                                                                                   scores=cascade_scores)}
+                    recalls.append(len(full_ids & cascade_ids) / max(len(full_ids), 1))
+                result_name = "%s_%d" % (prefix, top_num)
+                result[name][result_name] = {"score_latency": latency_statistics(costs),
+                                             "recall_at_%d" % recall_num: float(np.mean(recalls))}
+                print("partition %s %s recall@%d=%.3f score p50=%.3fms(full %.3fms)" % (
+                    name, result_name, recall_num, float(np.mean(recalls)),
+                    result[name][result_name]["score_latency"]["p50_ms"],
+                    result[name]["full"]["score_latency"]["p50_ms"]))
+    return result
+
+
+def evaluate_cascade(class_num, query_num, top_nums, class_number=66):
+    graph_data = build_synthetic_graph_data(class_num=class_num)
+    model = create_synthetic_compound_model(graph_data)
+    summary = Summary.create(graph_data, model)
+    # the ann index of the first sub-model, like the one built by script.model.avg_w2v.train
+    first_stage_ann = AVGW2VAnnSearch(model.model_list[0], IVFIndex.build(model.model_list[0].doc_vectors))
+    queries = build_synthetic_queries(query_num)
+    evaluation_result = {
+        "class_num": class_num,
+        "query_num": query_num,
+        "partition_sizes": {name: len(summary.label_partitions.get_partition(name)) for name in
+                            summary.label_partitions.PARTITION_NAMES},
+        "ann_index": repr(first_stage_ann.index),
+        "partitions": evaluate_partitions(summary, queries, top_nums, first_stage_ann),
+    }
+    for mode_name in SUMMARY_MODES:
+        summary_mode = getattr(summary, mode_name)
+        summary.set_cascade({})
+        run_summary_mode(summary_mode, queries[:2], class_number)
+        full_latency, full_summaries = run_summary_mode(summary_mode, queries, class_number)
+        mode_result = {"full": {"latency": full_latency}}
+        for top_num in top_nums:
+            for prefix, first_stage in [("top", None), ("ann_top", first_stage_ann)]:
+                summary.set_cascade({mode_name: top_num}, first_stage)
+                cascade_latency, cascade_summaries = run_summary_mode(summary_mode, queries, class_number)
+                top_result = compare_summaries(full_summaries, cascade_summaries)
+                top_result["latency"] = cascade_latency
+                top_result["speedup"] = full_latency["p50_ms"] / cascade_latency["p50_ms"]
+                result_name = "%s_%d" % (prefix, top_num)
+                mode_result[result_name] = top_result
+                print("%s %s summary_equal=%.2f class_order_equal=%.2f class_overlap=%.3f p50=%.2fms(full %.2fms)"
+                      % (mode_name, result_name, top_result["summary_equal_ratio"],
+                         top_result["class_order_equal_ratio"], top_result["class_overlap"],
+                         cascade_latency["p50_ms"], full_latency["p50_ms"]))
+        evaluation_result[mode_name] = mode_result
+    summary.set_cascade({})
+    return evaluation_result
+
+
+if __name__ == '__main__':
+    result = evaluate_cascade(class_num=JDK_CLASS_NUM, query_num=50, top_nums=[500, 2000, 8000])
+    result_path = PathUtil.benchmark_result("cascade")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the evaluation result to %s" % result_path)
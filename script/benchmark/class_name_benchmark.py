@@ -0,0 +1,89 @@
+import json
+import random
+import string
+import time
+
+from script.benchmark.synthetic import build_synthetic_graph_data, JDK_CLASS_NUM
+from script.benchmark.util import latency_statistics
+from search.class_name_index import ClassNameIndex
+from util.path_util import PathUtil
+
+"""
+the latency of the ClassNameIndex on the jdk-sized synthetic classes: the autocomplete of the prefixes of
+the qualified names and of the simple names, and the resolution of the qualified names, the simple names and the
+names with one typo. the accuracy of the fuzzy resolution is the ratio of the names with a typo resolved to the
+right class.
+"""
+
+
+def add_typo(name, random_generator):
+    """
+    delete, substitute, insert or transpose one character of the simple name
+    """
+    package_name, simple_name = name.rsplit(".", 1)
+    position = random_generator.randrange(1, len(simple_name) - 1)
+    typo_type = random_generator.choice(["delete", "substitute", "insert", "transpose"])
+    character = random_generator.choice(string.ascii_lowercase)
+    if typo_type == "delete":
+        simple_name = simple_name[:position] + simple_name[position + 1:]
+    elif typo_type == "substitute":
+        simple_name = simple_name[:position] + character + simple_name[position + 1:]
+    elif typo_type == "insert":
+        simple_name = simple_name[:position] + character + simple_name[position:]
+    else:
+        simple_name = simple_name[:position - 1] + simple_name[position] + simple_name[position - 1] + \
+                      simple_name[position + 1:]
+    return package_name + "." + simple_name
+
+
+def measure(function, arguments):
+    costs = []
+    results = []
+    for argument in arguments:
+        start = time.perf_counter()
+        results.append(function(argument))
+        costs.append(time.perf_counter() - start)
+    return latency_statistics(costs), results
+
+
+def benchmark_class_name_index(class_num, name_num=1000, seed=0):
+    graph_data = build_synthetic_graph_data(class_num=class_num)
+    class_id_2_qualified_name = {class_id: graph_data.get_node_info_dict(class_id)["properties"]["qualified_name"]
+                                 for class_id in graph_data.get_node_ids_by_label("class")}
+    start = time.perf_counter()
+    index = ClassNameIndex.build(class_id_2_qualified_name)
+    build_seconds = time.perf_counter() - start
+    print("build %r in %.2fs" % (index, build_seconds))
+
+    random_generator = random.Random(seed)
+    class_ids = random_generator.sample(sorted(class_id_2_qualified_name.keys()), min(name_num, class_num))
+    qualified_names = [class_id_2_qualified_name[class_id] for class_id in class_ids]
+    simple_names = [ClassNameIndex.get_simple_name(name) for name in qualified_names]
+    typo_names = [add_typo(name, random_generator) for name in qualified_names]
+
+    benchmark_result = {"class_num": class_num, "name_num": len(index), "build_seconds": build_seconds}
+    complete_result = {}
+    for prefix_length in [3, 6, 12]:
+        complete_result["qualified_name_prefix_%d" % prefix_length] = measure(
+            index.complete, [name[:prefix_length] for name in qualified_names])[0]
+        complete_result["simple_name_prefix_%d" % prefix_length] = measure(
+            index.complete, [name[:prefix_length] for name in simple_names])[0]
+    benchmark_result["complete"] = complete_result
+
+    resolve_result = {}
+    for name, names in [("qualified_name", qualified_names), ("simple_name", simple_names), ("typo", typo_names)]:
+        statistics, results = measure(index.resolve, names)
+        statistics["accuracy"] = sum(1 for (class_id, match), right_class_id in zip(results, class_ids)
+                                     if class_id == right_class_id) / len(class_ids)
+        resolve_result[name] = statistics
+        print("resolve %s p50=%.3fms accuracy=%.3f" % (name, statistics["p50_ms"], statistics["accuracy"]))
+    benchmark_result["resolve"] = resolve_result
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_class_name_index(class_num=JDK_CLASS_NUM)
+    result_path = PathUtil.benchmark_result("class_name")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,93 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from script.benchmark.synthetic import create_synthetic_summary, build_synthetic_queries, JDK_CLASS_NUM
+from script.benchmark.util import clear_model_cache, latency_statistics
+from service.app import CLASS_NUMBER
+from service.summary_cache import SummaryResultCache
+from util.path_util import PathUtil
+
+"""
+the bursts of identical requests, like a popular query sent by many clients at the same time: the requests of a
+burst are released together by a barrier to the SummaryResultCache with the coalescing on and off. the result cache
+is disabled, so only the identical requests in flight could share a summary.
+for each burst size, the latency of the bursts and of the requests and the number of summaries computed are
+reported. the summaries of a burst must be the same.
+"""
+
+SUMMARY_MODES = ["get_summary", "get_summary_only_query_by_method"]
+
+
+def run_bursts(summary, summary_cache, mode_name, requests, burst_size):
+    burst_costs = []
+    request_costs = []
+    with ThreadPoolExecutor(max_workers=burst_size) as executor:
+        for query, class_name_or_number in requests:
+            clear_model_cache(summary.model, summary.query_encoding_cache)
+            barrier = threading.Barrier(burst_size)
+
+            def send(_):
+                barrier.wait()
+                start = time.perf_counter()
+                result = summary_cache.get_summary(summary, mode_name, query, class_name_or_number)
+                return time.perf_counter() - start, start, result
+
+            start_time = None
+            end_time = None
+            results = []
+            for cost, start, result in executor.map(send, range(burst_size)):
+                request_costs.append(cost)
+                start_time = start if start_time is None else min(start_time, start)
+                end_time = start + cost if end_time is None else max(end_time, start + cost)
+                results.append(result)
+            burst_costs.append(end_time - start_time)
+            if any(result != results[0] for result in results):
+                raise Exception("the summaries of the identical requests are different")
+    statistics = summary_cache.get_statistics()
+    return {
+        "burst": latency_statistics(burst_costs),
+        "request": latency_statistics(request_costs),
+        "computed": statistics["computed"],
+        "coalesced": statistics["coalesced"],
+    }
+
+
+def benchmark_coalescing(class_num, burst_num, burst_sizes, seed=0):
+    summary = create_synthetic_summary(class_num=class_num)
+    queries = build_synthetic_queries(burst_num, seed=seed)
+    class_names = sorted(summary.graph_index.get_qualified_name(class_id) for class_id in
+                         summary.graph_index.get_all_class_ids())
+    random_generator = random.Random(seed)
+    mode_2_requests = {
+        "get_summary": [(query, random_generator.choice(class_names)) for query in queries],
+        "get_summary_only_query_by_method": [(query, CLASS_NUMBER) for query in queries],
+    }
+    benchmark_result = {"class_num": class_num, "burst_num": burst_num}
+    for mode_name in SUMMARY_MODES:
+        mode_result = {}
+        for burst_size in burst_sizes:
+            burst_result = {}
+            for coalesce in [False, True]:
+                summary_cache = SummaryResultCache(max_size=0, coalesce=coalesce)
+                burst_result["coalesce" if coalesce else "no_coalesce"] = run_bursts(
+                    summary, summary_cache, mode_name, mode_2_requests[mode_name], burst_size)
+            burst_result["speedup_burst"] = burst_result["no_coalesce"]["burst"]["p50_ms"] / \
+                burst_result["coalesce"]["burst"]["p50_ms"]
+            print("%s burst_size=%d burst p50=%.1fms(no coalescing %.1fms) computed=%d(no coalescing %d)" % (
+                mode_name, burst_size, burst_result["coalesce"]["burst"]["p50_ms"],
+                burst_result["no_coalesce"]["burst"]["p50_ms"], burst_result["coalesce"]["computed"],
+                burst_result["no_coalesce"]["computed"]))
+            mode_result["burst_size_%d" % burst_size] = burst_result
+        benchmark_result[mode_name] = mode_result
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_coalescing(class_num=JDK_CLASS_NUM, burst_num=30, burst_sizes=[1, 8, 32])
+    result_path = PathUtil.benchmark_result("coalescing")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
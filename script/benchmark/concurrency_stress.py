@@ -0,0 +1,81 @@
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from script.benchmark.synthetic import create_synthetic_summary, build_synthetic_queries
+from script.benchmark.util import latency_statistics
+from util.path_util import PathUtil
+
+"""
+serve the summary requests by many threads with one Summary,
+and check the result of each request is the same as it is served alone.
+"""
+
+SUMMARY_MODES = ["get_summary", "get_summary_only_query", "get_summary_only_query_by_method",
+                 "get_summary_only_query_by_sentence"]
+
+
+def create_requests(summary, queries, class_number):
+    rand = random.Random(0)
+    class_names = [summary.graph_data.get_node_info_dict(class_id)["properties"]["qualified_name"] for class_id in
+                   sorted(summary.graph_data.get_node_ids_by_label("class"))]
+    requests = []
+    for query in queries:
+        for mode_name in SUMMARY_MODES:
+            if mode_name == "get_summary":
+                requests.append((mode_name, query, rand.choice(class_names)))
+            else:
+                requests.append((mode_name, query, class_number))
+    return requests
+
+
+def serve_request(summary, request):
+    mode_name, query, class_name_or_number = request
+    start = time.perf_counter()
+    result = getattr(summary, mode_name)(query, class_name_or_number)
+    return result, time.perf_counter() - start
+
+
+def stress_summary(class_num, query_num, class_number, thread_num, repeat_num):
+    summary = create_synthetic_summary(class_num=class_num)
+    queries = build_synthetic_queries(query_num)
+    requests = create_requests(summary, queries, class_number)
+
+    print("serve %d requests by one thread" % len(requests))
+    expected_results = [serve_request(summary, request)[0] for request in requests]
+
+    concurrent_requests = [(index, request) for index, request in enumerate(requests)] * repeat_num
+    random.Random(1).shuffle(concurrent_requests)
+    print("serve %d requests by %d threads" % (len(concurrent_requests), thread_num))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=thread_num) as executor:
+        responses = list(executor.map(lambda item: serve_request(summary, item[1]), concurrent_requests))
+    total_cost = time.perf_counter() - start
+
+    mixed_num = 0
+    for (index, request), (result, cost) in zip(concurrent_requests, responses):
+        if result != expected_results[index]:
+            mixed_num += 1
+            print("the result of %r is mixed with other requests" % (request,))
+
+    stress_result = {
+        "class_num": class_num,
+        "thread_num": thread_num,
+        "request_num": len(concurrent_requests),
+        "mixed_result_num": mixed_num,
+        "throughput_per_second": len(concurrent_requests) / total_cost,
+        "latency": latency_statistics([cost for result, cost in responses]),
+    }
+    print(json.dumps(stress_result, indent=4))
+    if mixed_num > 0:
+        raise Exception("%d of %d concurrent requests get a wrong result" % (mixed_num, len(concurrent_requests)))
+    return stress_result
+
+
+if __name__ == '__main__':
+    result = stress_summary(class_num=4240, query_num=10, class_number=66, thread_num=8, repeat_num=4)
+    result_path = PathUtil.benchmark_result("concurrency_stress")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,123 @@
+import gc
+import json
+import time
+import tracemalloc
+
+from graph.csr_graph import CSRGraphData
+from script.benchmark.synthetic import build_synthetic_graph_data, JDK_CLASS_NUM
+from script.summary.graph_index import SummaryGraphIndex
+from util.path_util import PathUtil
+
+"""
+compare the frozen CSRGraphData with the GraphData it is built from, on the synthetic graph with the size of jdk8:
+1. the memory: the memory allocated for the GraphData, for the CSRGraphData built from it, and the memory kept by the
+   CSRGraphData after the GraphData is dropped (its arrays and the shared node info dicts). it is traced by
+   tracemalloc, so the graph is built slower than usual.
+2. the speed of the traversals used by the summary, the document builder and the node2vec trainer. the results of
+   both graphs must be the same.
+"""
+
+
+def trace_memory_kb(function):
+    """
+    :return: (the result of the function, the kb allocated by it and still alive after it returns)
+    """
+    gc.collect()
+    start = tracemalloc.get_traced_memory()[0]
+    result = function()
+    gc.collect()
+    return result, (tracemalloc.get_traced_memory()[0] - start) / 1024
+
+
+def benchmark_memory(class_num):
+    tracemalloc.start()
+    try:
+        graph_data, graph_data_kb = trace_memory_kb(lambda: build_synthetic_graph_data(class_num=class_num))
+        csr_graph_data, csr_kb = trace_memory_kb(lambda: CSRGraphData(graph_data))
+        start = tracemalloc.get_traced_memory()[0]
+        del graph_data
+        gc.collect()
+        released_kb = (start - tracemalloc.get_traced_memory()[0]) / 1024
+    finally:
+        tracemalloc.stop()
+    return {
+        "node_num": csr_graph_data.get_node_num(),
+        "relation_num": csr_graph_data.get_relation_num(),
+        "graph_data_kb": graph_data_kb,
+        "csr_graph_data_kb": csr_kb,
+        "csr_array_kb": csr_graph_data.get_array_bytes() / 1024,
+        # the memory of the GraphData not shared with the CSRGraphData, e.g. the networkx adjacency and label sets
+        "released_kb": released_kb,
+        "kept_kb": graph_data_kb + csr_kb - released_kb,
+    }
+
+
+def time_traversal(graph, traversal, repeat=3):
+    """
+    :return: (the result of the traversal, the min seconds of the runs)
+    """
+    costs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = traversal(graph)
+        costs.append(time.perf_counter() - start)
+    return result, min(costs)
+
+
+def benchmark_traversal(class_num):
+    graph_data = build_synthetic_graph_data(class_num=class_num)
+    start = time.perf_counter()
+    csr_graph_data = CSRGraphData(graph_data)
+    build_seconds = time.perf_counter() - start
+    node_ids = sorted(graph_data.get_node_ids())
+    class_ids = sorted(graph_data.get_node_ids_by_label("class"))
+    name_2_traversal = {
+        # the out and in relations of each node, e.g. the document of each node
+        "all_out_relations": lambda graph: [graph.get_all_out_relations(node_id) for node_id in node_ids],
+        "all_in_relations": lambda graph: [graph.get_all_in_relations(node_id) for node_id in node_ids],
+        # the typed relations of a node, e.g. the methods of each class, the mentions of a domain entity
+        "typed_in_relations": lambda graph: [graph.get_relations(relation_type="belong to", end_id=class_id)
+                                             for class_id in class_ids],
+        # the relations of a type and the nodes of a label, e.g. building the SummaryGraphIndex
+        "relations_by_type": lambda graph: graph.get_relations(relation_type="has sentence"),
+        "node_ids_by_label": lambda graph: graph.get_node_ids_by_label("method") - graph.get_node_ids_by_label(
+            "construct method"),
+        # the input of the node2vec trainer
+        "relation_pairs": lambda graph: graph.get_relation_pairs(),
+        "summary_graph_index": lambda graph: SummaryGraphIndex(graph).get_all_method_ids(),
+    }
+    benchmark_result = {"build_seconds": build_seconds}
+    for name, traversal in name_2_traversal.items():
+        graph_data_result, graph_data_seconds = time_traversal(graph_data, traversal)
+        csr_result, csr_seconds = time_traversal(csr_graph_data, traversal)
+        if graph_data_result != csr_result:
+            raise Exception("the results of %s are different" % name)
+        benchmark_result[name] = {
+            "graph_data_ms": 1000 * graph_data_seconds,
+            "csr_ms": 1000 * csr_seconds,
+            "speedup": graph_data_seconds / csr_seconds,
+        }
+        print("%s: %.1fms(GraphData %.1fms)" % (name, 1000 * csr_seconds, 1000 * graph_data_seconds))
+    return benchmark_result
+
+
+def benchmark_csr_graph(class_num):
+    memory_result = benchmark_memory(class_num)
+    print("nodes=%d relations=%d GraphData=%.1fMB CSRGraphData=%.1fMB(arrays %.1fMB) kept after dropping the "
+          "GraphData=%.1fMB" % (memory_result["node_num"], memory_result["relation_num"],
+                                memory_result["graph_data_kb"] / 1024, memory_result["csr_graph_data_kb"] / 1024,
+                                memory_result["csr_array_kb"] / 1024, memory_result["kept_kb"] / 1024))
+    return {
+        "class_num": class_num,
+        "memory": memory_result,
+        "traversal": benchmark_traversal(class_num),
+    }
+
+
+if __name__ == '__main__':
+    result = benchmark_csr_graph(class_num=JDK_CLASS_NUM)
+    result_path = PathUtil.benchmark_result("csr_graph")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,101 @@
+import json
+import random
+import time
+
+from script.benchmark.synthetic import build_synthetic_graph_data, create_synthetic_compound_model, \
+    build_synthetic_queries, JDK_CLASS_NUM
+from script.benchmark.util import clear_model_cache, latency_statistics
+from script.summary.generate_summary import Summary
+from util.path_util import PathUtil
+
+"""
+compare get_summary(), which scores all the candidates of the class by one CandidateScorer, with the former
+get_summary() calling model.search() for the sentences of the class, for the methods and for the sentences of
+each top method. the summaries must be the same.
+the scores cached by the models are cleared before each query, like a new query to the service, then the other
+classes of the query are summarized with the cached scores.
+it runs on the jdk-sized synthetic graph with a synthetic compound model.
+"""
+
+
+def get_top_sentence_names(model, query, sentence_ids):
+    if len(sentence_ids) == 0:
+        return []
+    return [result.doc_name for result in model.search(query, 10, set(sentence_ids))[:2]]
+
+
+def get_summary_by_searches(summary, query, class_name):
+    """
+    the former get_summary(), each candidate set is ranked by one model.search() on the whole corpus
+    """
+    model = summary.model
+    class_id = summary.graph_index.find_node_id_by_qualified_name(class_name)
+    if class_id is None:
+        return None
+    class_or_method_2_sentence_list = [{class_name: {
+        'sentence': get_top_sentence_names(model, query, summary.get_sentence_from_class_or_method(class_id)),
+        'url': summary.get_class_url(class_name)}}]
+    method_ids = summary.get_method_id_from_class(class_id)
+    if len(method_ids) == 0:
+        return class_or_method_2_sentence_list
+    for result in model.search(query, 10, set(method_ids))[:3]:
+        method_name = result.doc_name
+        split_method_name = method_name.split(class_name + '.')
+        if len(split_method_name) > 1:
+            method_name = split_method_name[1]
+        class_or_method_2_sentence_list.append({method_name: {
+            'sentence': get_top_sentence_names(model, query, summary.get_sentence_from_class_or_method(result.doc_id)),
+            'url': ''}})
+    return class_or_method_2_sentence_list
+
+
+def clear_all_model_cache(summary):
+    clear_model_cache(summary.model, summary.query_encoding_cache)
+    for sub_model in summary.model.model_list:
+        clear_model_cache(sub_model)
+
+
+def run_get_summary(summary, get_summary, queries, class_names_list):
+    first_costs = []
+    other_costs = []
+    summaries = []
+    for query, class_names in zip(queries, class_names_list):
+        clear_all_model_cache(summary)
+        for class_index, class_name in enumerate(class_names):
+            start = time.perf_counter()
+            summaries.append(get_summary(query, class_name))
+            (first_costs if class_index == 0 else other_costs).append(time.perf_counter() - start)
+    return {"first_class": latency_statistics(first_costs), "other_classes": latency_statistics(other_costs)}, \
+        summaries
+
+
+def benchmark_get_summary(class_num, query_num, class_num_per_query=4):
+    graph_data = build_synthetic_graph_data(class_num=class_num)
+    summary = Summary.create(graph_data, create_synthetic_compound_model(graph_data))
+    queries = build_synthetic_queries(query_num)
+    class_names = sorted(summary.graph_index.get_qualified_name(class_id) for class_id in
+                         graph_data.get_node_ids_by_label("class"))
+    random_generator = random.Random(0)
+    class_names_list = [random_generator.sample(class_names, class_num_per_query) for _ in queries]
+
+    scorer_result, scorer_summaries = run_get_summary(summary, summary.get_summary, queries, class_names_list)
+    search_result, search_summaries = run_get_summary(
+        summary, lambda query, class_name: get_summary_by_searches(summary, query, class_name), queries,
+        class_names_list)
+    if scorer_summaries != search_summaries:
+        raise Exception("the summaries of the candidate scorer are different from model.search()")
+    benchmark_result = {"class_num": class_num, "query_num": query_num, "class_num_per_query": class_num_per_query,
+                        "candidate_scorer": scorer_result, "model_search": search_result}
+    for name in ["first_class", "other_classes"]:
+        benchmark_result["speedup_" + name] = search_result[name]["p50_ms"] / scorer_result[name]["p50_ms"]
+        print("%s p50=%.2fms(model.search %.2fms)" % (name, scorer_result[name]["p50_ms"],
+                                                       search_result[name]["p50_ms"]))
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_get_summary(class_num=JDK_CLASS_NUM, query_num=30)
+    result_path = PathUtil.benchmark_result("get_summary")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,171 @@
+import json
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from script.benchmark.load_test import serve_app
+from script.benchmark.synthetic import build_synthetic_graph_data, build_synthetic_queries, SyntheticSearchModel, \
+    JDK_CLASS_NUM
+from script.benchmark.util import latency_statistics
+from script.summary.generate_summary import Summary
+from service.app import create_app, CLASS_NUMBER
+from service.summary_cache import SummaryResultCache
+from service.summary_registry import SummaryRegistry, SummaryReloadWatcher
+from util.path_util import PathUtil
+
+"""
+the summaries are reloaded while the clients keep sending requests to the flask app, no request may fail:
+1. the default summary is reloaded by POST /admin/reload/.
+2. the files of the default summary are changed, it is reloaded by the SummaryReloadWatcher.
+3. a new version is loaded and becomes the default one by POST /admin/reload/ with "make_default".
+the latency of the requests sent during the reloads is compared with the other requests, and the seconds of loading
+and draining of each reload are reported.
+it runs on the synthetic summaries, each version is a synthetic graph with another seed.
+"""
+
+VERSION_2_SEED = {"v1": 0, "v2": 1}
+
+
+def load_synthetic_summary(class_num, pro_name, version, model_name):
+    graph_data = build_synthetic_graph_data(class_num=class_num, seed=VERSION_2_SEED[version])
+    model = SyntheticSearchModel.create(graph_data, seed=VERSION_2_SEED[version])
+    return Summary.create(graph_data, model, pro_name=pro_name, version=version, model_name=model_name)
+
+
+def post_json(url, body):
+    http_request = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"),
+                                          headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(http_request, timeout=60) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+class ReloadClients:
+    """
+    the clients sending the query-only summaries to the app until they are stopped.
+    """
+
+    def __init__(self, base_url, queries, client_num):
+        self.base_url = base_url
+        self.queries = queries
+        self.client_num = client_num
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        # (the start time, the seconds, the error or None)
+        self.responses = []
+        self.threads = []
+
+    def __run_client(self, client_index):
+        query_index = client_index
+        while not self.stop_event.is_set():
+            query = self.queries[query_index % len(self.queries)]
+            query_index += self.client_num
+            start_time = time.time()
+            start = time.perf_counter()
+            try:
+                post_json(self.base_url + "/createAPISummary/",
+                          {"query": query, "class_name_or_number": str(CLASS_NUMBER)})
+                error = None
+            except Exception as e:
+                error = repr(e)
+            with self.lock:
+                self.responses.append((start_time, time.perf_counter() - start, error))
+
+    def start(self):
+        self.threads = [threading.Thread(target=self.__run_client, args=(client_index,), daemon=True)
+                        for client_index in range(self.client_num)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+
+
+def wait_reload(base_url, reload_num, timeout=600):
+    """
+    :return: the status of the reload_num-th reload after it is finished
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        statuses = get_json(base_url + "/admin/reload/")
+        if len(statuses) >= reload_num and statuses[reload_num - 1]["state"] in ("done", "failed"):
+            return statuses[reload_num - 1]
+        time.sleep(0.2)
+    raise Exception("the reload is not finished in %d seconds" % timeout)
+
+
+def benchmark_hot_reload(class_num, client_num=8, steady_seconds=3.0):
+    registry = SummaryRegistry(("synthetic", "v1", "synthetic"),
+                               load=lambda *key: load_synthetic_summary(class_num, *key), pro_names=["synthetic"])
+    watched_file = Path(tempfile.mkdtemp()) / "summary.snapshot"
+    watched_file.write_text("0")
+    watcher = SummaryReloadWatcher(registry, interval=0.5, get_paths=lambda *key: [str(watched_file)])
+    registry.get(*registry.default_key)
+    server, base_url = serve_app(create_app(summary_cache=SummaryResultCache(max_size=0), registry=registry))
+    clients = ReloadClients(base_url, build_synthetic_queries(2000), client_num)
+    watcher.start()
+    clients.start()
+    try:
+        time.sleep(steady_seconds)
+        print("reload the default summary by the admin endpoint")
+        post_json(base_url + "/admin/reload/", {})
+        statuses = [wait_reload(base_url, 1)]
+        time.sleep(steady_seconds)
+        print("change the files of the default summary")
+        watched_file.write_text("1")
+        statuses.append(wait_reload(base_url, 2))
+        time.sleep(steady_seconds)
+        print("load the new version as the default summary")
+        post_json(base_url + "/admin/reload/", {"version": "v2", "make_default": True})
+        statuses.append(wait_reload(base_url, 3))
+        time.sleep(steady_seconds)
+    finally:
+        clients.stop()
+        watcher.stop()
+    registry_statistics = get_json(base_url + "/registryStatistics/")
+    server.shutdown()
+
+    errors = [error for start_time, cost, error in clients.responses if error is not None]
+    reload_costs = []
+    other_costs = []
+    for start_time, cost, error in clients.responses:
+        during_reload = any(status["start_time"] <= start_time <= status["end_time"] for status in statuses)
+        (reload_costs if during_reload else other_costs).append(cost)
+    benchmark_result = {
+        "class_num": class_num,
+        "client_num": client_num,
+        "request_num": len(clients.responses),
+        "error_num": len(errors),
+        "errors": sorted(set(errors))[:5],
+        "latency_during_reload": latency_statistics(reload_costs),
+        "latency_other": latency_statistics(other_costs),
+        "reloads": [{name: status.get(name, None) for name in ["version", "make_default", "state", "load_seconds",
+                                                               "drain_seconds", "drained"]}
+                    for status in statuses],
+        "registry": registry_statistics,
+    }
+    print("requests=%d errors=%d p99 during reload=%.1fms(other %.1fms)" % (
+        len(clients.responses), len(errors), benchmark_result["latency_during_reload"]["p99_ms"],
+        benchmark_result["latency_other"]["p99_ms"]))
+    if len(errors) > 0 or any(status["state"] != "done" for status in statuses):
+        raise Exception("the requests failed during the reloads: %r" % benchmark_result["errors"])
+    if registry_statistics["default"]["version"] != "v2":
+        raise Exception("the new version is not the default summary")
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_hot_reload(class_num=JDK_CLASS_NUM)
+    result_path = PathUtil.benchmark_result("hot_reload")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
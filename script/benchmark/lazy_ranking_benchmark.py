@@ -0,0 +1,55 @@
+import json
+from unittest import mock
+
+from script.benchmark.synthetic import create_synthetic_summary, build_synthetic_queries
+from script.benchmark.util import clear_model_cache, benchmark_summary_mode, full_ranking_factory
+from script.summary import generate_summary
+from script.summary.ranking_context import RankingContext
+from search.lazy_ranking import LazyRanking
+from util.path_util import PathUtil
+
+"""
+compare the latency and the memory allocation of the query-only summaries
+when the methods and sentences are ranked by the LazyRanking or by sorting the whole corpus.
+"""
+
+
+def run_summary_mode(summary, summary_mode, queries, class_number, ranking_factory):
+    # the ranking factory of the summary is replaced only while the mode is benchmarked
+    with mock.patch.object(generate_summary, "LazyRanking", ranking_factory):
+        clear_model_cache(summary.model, summary.query_encoding_cache)
+        latency_result, summaries = benchmark_summary_mode(summary_mode, queries, class_number)
+        clear_model_cache(summary.model, summary.query_encoding_cache)
+        memory_result, _ = benchmark_summary_mode(summary_mode, queries[:3], class_number, trace_memory=True)
+    latency_result["avg_peak_memory_kb"] = memory_result["avg_peak_memory_kb"]
+    return latency_result, summaries
+
+
+def benchmark_lazy_ranking(class_num, query_num, class_number):
+    summary = create_synthetic_summary(class_num=class_num)
+    queries = build_synthetic_queries(query_num)
+    benchmark_result = {"class_num": class_num, "node_num": summary.graph_data.get_node_num(),
+                        "class_number": class_number}
+    for mode_name in ["get_summary_only_query_by_method", "get_summary_only_query_by_sentence"]:
+        summary_mode = getattr(summary, mode_name)
+        full_result, full_summaries = run_summary_mode(summary, summary_mode, queries, class_number,
+                                                       full_ranking_factory(RankingContext))
+        lazy_result, lazy_summaries = run_summary_mode(summary, summary_mode, queries, class_number, LazyRanking)
+        if full_summaries != lazy_summaries:
+            raise Exception("the summary of %s is changed by the LazyRanking" % mode_name)
+
+        benchmark_result[mode_name] = {
+            "full_ranking": full_result,
+            "lazy_ranking": lazy_result,
+            "speedup": full_result["avg_ms"] / lazy_result["avg_ms"],
+        }
+        print(mode_name, json.dumps(benchmark_result[mode_name], indent=4))
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_lazy_ranking(class_num=4240, query_num=20, class_number=66)
+    result_path = PathUtil.benchmark_result("lazy_ranking")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
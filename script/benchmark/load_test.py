@@ -0,0 +1,229 @@
+import json
+import logging
+import random
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from werkzeug.serving import make_server
+
+from script.benchmark.synthetic import create_synthetic_summary, build_synthetic_queries, JDK_CLASS_NUM
+from script.benchmark.util import clear_model_cache, latency_statistics, process_memory, reset_peak_memory, \
+    process_peak_memory
+from service.app import create_app, CLASS_NUMBER, QUERY_ONLY_MODE_NAME
+from service.summary_cache import SummaryResultCache
+from util.path_util import PathUtil
+
+"""
+the load test of the summary: a replayable query set is sent to the Summary in-process and to the flask app
+over http, by a number of concurrent clients. for each summary mode, the throughput, the latency percentiles,
+the errors and the memory of the process are reported as json, so the results of the releases could be diffed.
+all modes are run in-process, only the modes of /createAPISummary/ are run over http.
+
+it runs on a jdk-sized synthetic graph and model by default, the query set is saved as jsonl at the first run
+and replayed later. the http target is the flask app of service.app on the synthetic summary served in a thread,
+or a running server given by its base url (with a query set of the real classes).
+"""
+
+SUMMARY_MODES = ["get_summary", "get_summary_only_query", "get_summary_only_query_by_method",
+                 "get_summary_only_query_by_sentence"]
+
+
+def build_query_set(summary, query_num, class_number=CLASS_NUMBER, seed=0):
+    """
+    :return: list of request, {"mode": ..., "query": ..., "class_name_or_number": ...}, query_num for each mode
+    """
+    rand = random.Random(seed)
+    class_names = sorted(summary.graph_index.get_qualified_name(class_id) for class_id in
+                         summary.graph_index.get_all_class_ids())
+    requests = []
+    for mode_name in SUMMARY_MODES:
+        for query in build_synthetic_queries(query_num, seed=seed + len(requests)):
+            class_name_or_number = rand.choice(class_names) if mode_name == "get_summary" else class_number
+            requests.append({"mode": mode_name, "query": query, "class_name_or_number": class_name_or_number})
+    return requests
+
+
+def save_query_set(requests, query_set_path):
+    with open(str(query_set_path), "w") as f:
+        for request in requests:
+            f.write(json.dumps(request) + "\n")
+
+
+def load_query_set(query_set_path):
+    with open(str(query_set_path)) as f:
+        return [json.loads(line) for line in f if line.strip() != ""]
+
+
+class InProcessTarget:
+    """
+    call the summary mode of the Summary directly.
+    """
+    name = "in_process"
+    modes = SUMMARY_MODES
+
+    def __init__(self, summary):
+        self.summary = summary
+
+    def send(self, request):
+        return getattr(self.summary, request["mode"])(request["query"], request["class_name_or_number"])
+
+    def reset(self):
+        clear_model_cache(self.summary.model, self.summary.query_encoding_cache)
+
+
+class HttpTarget:
+    """
+    post the request to /createAPISummary/ of the flask app, it serves get_summary() for a class name and
+    the query-only mode QUERY_ONLY_MODE_NAME for a class number, the number of classes is always CLASS_NUMBER.
+    """
+    name = "http"
+    modes = ["get_summary", QUERY_ONLY_MODE_NAME]
+
+    def __init__(self, base_url, summary=None, timeout=60):
+        """
+        :param base_url: e.g. http://127.0.0.1:5000
+        :param summary: the Summary served in this process, its model cache is cleared by reset()
+        :param timeout: the seconds waiting for a response
+        """
+        self.base_url = base_url.rstrip("/")
+        self.summary = summary
+        self.timeout = timeout
+
+    def send(self, request):
+        body = {"query": request["query"], "class_name_or_number": str(request["class_name_or_number"])}
+        http_request = urllib.request.Request(self.base_url + "/createAPISummary/",
+                                              data=json.dumps(body).encode("utf-8"),
+                                              headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def reset(self):
+        if self.summary is not None:
+            clear_model_cache(self.summary.model, self.summary.query_encoding_cache)
+
+
+def serve_app(app, host="127.0.0.1", port=0):
+    """
+    serve the flask app by a threaded werkzeug server in a daemon thread.
+    :return: (the server, the base url), call server.shutdown() to stop it
+    """
+    # the access log of each request is not printed
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(host, port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, "http://%s:%d" % (host, server.server_port)
+
+
+def run_load(target, requests, concurrency):
+    """
+    send the requests by the concurrent clients, each client sends the next request after the last one returns.
+    :return: the result of the run
+    """
+    target.reset()
+    reset_peak_memory()
+
+    def timed_send(request):
+        start = time.perf_counter()
+        try:
+            target.send(request)
+            error = None
+        except Exception as e:
+            error = repr(e)
+        return time.perf_counter() - start, error
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        responses = list(executor.map(timed_send, requests))
+    total_cost = time.perf_counter() - start
+    errors = [error for cost, error in responses if error is not None]
+    memory = process_memory()
+    return {
+        "request_num": len(requests),
+        "error_num": len(errors),
+        "errors": sorted(set(errors))[:5],
+        "throughput_per_second": len(requests) / total_cost,
+        "latency": latency_statistics([cost for cost, error in responses]),
+        "rss_mb": memory["rss_kb"] / 1024,
+        "peak_rss_mb": process_peak_memory() / 1024,
+    }
+
+
+def benchmark_load(targets, requests, concurrencies, warmup_num=2):
+    """
+    :param targets: the targets, e.g. InProcessTarget and HttpTarget, each one runs the modes in its modes
+    :param requests: the query set
+    :param concurrencies: the numbers of the concurrent clients
+    :param warmup_num: the number of requests of each mode sent before measuring
+    :return: target name -> summary mode -> "concurrency_<n>" -> result
+    """
+    benchmark_result = {}
+    for target in targets:
+        benchmark_result[target.name] = {}
+        for mode_name in target.modes:
+            mode_requests = [request for request in requests if request["mode"] == mode_name]
+            if len(mode_requests) == 0:
+                continue
+            for request in mode_requests[:warmup_num]:
+                target.send(request)
+            mode_result = {}
+            for concurrency in concurrencies:
+                run_result = run_load(target, mode_requests, concurrency)
+                print("%s %s concurrency=%d throughput=%.1f/s p50=%.1fms p99=%.1fms errors=%d" % (
+                    target.name, mode_name, concurrency, run_result["throughput_per_second"],
+                    run_result["latency"]["p50_ms"], run_result["latency"]["p99_ms"], run_result["error_num"]))
+                mode_result["concurrency_%d" % concurrency] = run_result
+            benchmark_result[target.name][mode_name] = mode_result
+    return benchmark_result
+
+
+def load_test_synthetic(class_num, query_num, concurrencies, query_set_path=None, base_url=None):
+    """
+    run the load test on the synthetic summary in-process and over http.
+    :param class_num: the number of classes of the synthetic graph
+    :param query_num: the number of queries of each mode, used if the query set is not saved
+    :param concurrencies: the numbers of the concurrent clients
+    :param query_set_path: the jsonl of the query set, it is built and saved if not exists, then replayed
+    :param base_url: the base url of a running server, if it is None, the app is served on the synthetic summary
+    :return: the benchmark result
+    """
+    summary = create_synthetic_summary(class_num=class_num)
+    if query_set_path is not None and Path(query_set_path).exists():
+        print("replay the query set %s" % query_set_path)
+        requests = load_query_set(query_set_path)
+    else:
+        requests = build_query_set(summary, query_num)
+        if query_set_path is not None:
+            save_query_set(requests, query_set_path)
+            print("save the query set to %s" % query_set_path)
+
+    server = None
+    if base_url is None:
+        # the result cache is disabled, so each request is computed like in-process
+        app = create_app(summary, summary_cache=SummaryResultCache(max_size=0))
+        server, base_url = serve_app(app)
+    targets = [InProcessTarget(summary), HttpTarget(base_url, summary=summary if server is not None else None)]
+    try:
+        benchmark_result = benchmark_load(targets, requests, concurrencies)
+    finally:
+        if server is not None:
+            server.shutdown()
+    benchmark_result["config"] = {
+        "class_num": class_num,
+        "request_num": len(requests),
+        "concurrencies": list(concurrencies),
+        "base_url": base_url,
+    }
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result_path = PathUtil.benchmark_result("load_test")
+    result = load_test_synthetic(class_num=JDK_CLASS_NUM, query_num=50, concurrencies=[1, 4, 16],
+                                 query_set_path=str(Path(result_path).with_name("load_test_queries.jsonl")))
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,89 @@
+import json
+import random
+import time
+
+from script.benchmark.synthetic import build_synthetic_graph_data, create_synthetic_compound_model, \
+    build_synthetic_queries, JDK_CLASS_NUM
+from script.benchmark.util import clear_model_cache, latency_statistics
+from script.summary.generate_summary import Summary
+from util.path_util import PathUtil
+
+"""
+count the query encodings computed and saved by the QueryEncodingCache for each request of a session:
+a new query is summarized for two classes by get_summary(), then by the query-only modes, like a user trying
+the summary modes in the web page. the session is run with the cache and with the cache removed, the scores cached
+by the models themselves are cleared before each session, so each session starts from a new query.
+it runs on the jdk-sized synthetic graph with a synthetic compound model (two vector sub-models).
+"""
+
+SESSION_REQUESTS = ["get_summary", "get_summary", "get_summary_only_query_by_method", "get_summary_only_query",
+                    "get_summary_only_query_by_sentence"]
+
+
+def clear_all_model_cache(summary):
+    clear_model_cache(summary.model, summary.query_encoding_cache)
+    for sub_model in summary.model.model_list:
+        clear_model_cache(sub_model)
+
+
+def run_sessions(summary, queries, class_names, class_number):
+    """
+    :return: list of (request name, the cost, the encoding statistics of the request) for each request
+    """
+    random_generator = random.Random(0)
+    records = []
+    for query in queries:
+        clear_all_model_cache(summary)
+        for request_index, mode_name in enumerate(SESSION_REQUESTS):
+            argument = random_generator.choice(class_names) if mode_name == "get_summary" else class_number
+            summary.query_encoding_cache.start_request()
+            start = time.perf_counter()
+            getattr(summary, mode_name)(query, argument)
+            cost = time.perf_counter() - start
+            records.append(("%d.%s" % (request_index, mode_name), cost,
+                            summary.query_encoding_cache.get_request_statistics()))
+    return records
+
+
+def summarize_records(records):
+    request_name_2_records = {}
+    for request_name, cost, statistics in records:
+        request_name_2_records.setdefault(request_name, []).append((cost, statistics))
+    result = {}
+    for request_name, request_records in sorted(request_name_2_records.items()):
+        result[request_name] = {
+            "latency": latency_statistics([cost for cost, statistics in request_records]),
+            "avg_encoded": sum(statistics["encoded"] for cost, statistics in request_records) / len(request_records),
+            "avg_saved": sum(statistics["saved"] for cost, statistics in request_records) / len(request_records),
+        }
+    return result
+
+
+def benchmark_query_encoding(class_num, query_num, class_number=66):
+    graph_data = build_synthetic_graph_data(class_num=class_num)
+    summary = Summary.create(graph_data, create_synthetic_compound_model(graph_data))
+    queries = build_synthetic_queries(query_num)
+    class_names = sorted(summary.graph_index.get_qualified_name(class_id) for class_id in
+                         graph_data.get_node_ids_by_label("class"))
+    run_sessions(summary, queries[:2], class_names, class_number)
+
+    benchmark_result = {"class_num": class_num, "query_num": query_num}
+    benchmark_result["cached"] = summarize_records(run_sessions(summary, queries, class_names, class_number))
+    summary.query_encoding_cache.remove()
+    benchmark_result["not_cached"] = summarize_records(run_sessions(summary, queries, class_names, class_number))
+    summary.query_encoding_cache.install(summary.model)
+    benchmark_result["cache_statistics"] = summary.query_encoding_cache.get_statistics()
+    for request_name in benchmark_result["cached"]:
+        cached, not_cached = benchmark_result["cached"][request_name], benchmark_result["not_cached"][request_name]
+        print("%s encoded=%.2f saved=%.2f p50=%.2fms(not cached %.2fms)" % (
+            request_name, cached["avg_encoded"], cached["avg_saved"], cached["latency"]["p50_ms"],
+            not_cached["latency"]["p50_ms"]))
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_query_encoding(class_num=JDK_CLASS_NUM, query_num=50)
+    result_path = PathUtil.benchmark_result("query_encoding")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,77 @@
+import json
+from unittest import mock
+
+from script.benchmark.synthetic import create_synthetic_summary, build_synthetic_queries
+from script.benchmark.util import clear_model_cache, benchmark_summary_mode, full_ranking_factory
+from script.summary import generate_summary
+from script.summary.ranking_context import RankingContext
+from util.path_util import PathUtil
+
+"""
+compare the summary latency of the RankingContext with the list.index() ranking lookup used before,
+on a jdk-sized synthetic graph. both of them rank the whole corpus.
+"""
+
+
+class ListIndexRankingContext(RankingContext):
+    """
+    the old way, the ranking of a doc is got by list.index() over the ranking of the whole corpus.
+    """
+
+    @staticmethod
+    def from_retrieval_results(retrieval_results):
+        return ListIndexRankingContext([item.doc_id for item in retrieval_results])
+
+    def get_ranking(self, doc_id):
+        if doc_id not in self.ranked_doc_ids:
+            return None
+        return self.ranked_doc_ids.index(doc_id)
+
+    def sort(self, doc_ids, top_num=0):
+        doc_id_rankings = [(self.ranked_doc_ids.index(doc_id), doc_id) for doc_id in set(doc_ids) if
+                           doc_id in self.ranked_doc_ids]
+        doc_id_rankings.sort()
+        ranked_doc_ids = [doc_id for ranking, doc_id in doc_id_rankings]
+        if top_num > 0:
+            return ranked_doc_ids[:top_num]
+        return ranked_doc_ids
+
+    def __contains__(self, doc_id):
+        return doc_id in self.ranked_doc_ids
+
+
+def benchmark_ranking_context(class_num, query_num, class_number):
+    summary = create_synthetic_summary(class_num=class_num)
+    queries = build_synthetic_queries(query_num)
+    benchmark_result = {"class_num": class_num, "node_num": summary.graph_data.get_node_num(),
+                        "class_number": class_number}
+    for mode_name in ["get_summary_only_query_by_method", "get_summary_only_query_by_sentence"]:
+        summary_mode = getattr(summary, mode_name)
+
+        # the ranking factory of the summary is replaced only while the mode is benchmarked
+        with mock.patch.object(generate_summary, "LazyRanking", full_ranking_factory(ListIndexRankingContext)):
+            clear_model_cache(summary.model, summary.query_encoding_cache)
+            list_index_result, list_index_summaries = benchmark_summary_mode(summary_mode, queries, class_number)
+
+        with mock.patch.object(generate_summary, "LazyRanking", full_ranking_factory(RankingContext)):
+            clear_model_cache(summary.model, summary.query_encoding_cache)
+            ranking_context_result, ranking_context_summaries = benchmark_summary_mode(summary_mode, queries,
+                                                                                       class_number)
+        if list_index_summaries != ranking_context_summaries:
+            raise Exception("the summary of %s is changed by the RankingContext" % mode_name)
+
+        benchmark_result[mode_name] = {
+            "list_index": list_index_result,
+            "ranking_context": ranking_context_result,
+            "speedup": list_index_result["avg_ms"] / ranking_context_result["avg_ms"],
+        }
+        print(mode_name, json.dumps(benchmark_result[mode_name], indent=4))
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_ranking_context(class_num=4240, query_num=20, class_number=66)
+    result_path = PathUtil.benchmark_result("ranking_context")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
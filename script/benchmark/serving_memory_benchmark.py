@@ -0,0 +1,93 @@
+import gc
+import json
+import multiprocessing
+import pickle
+import tempfile
+from pathlib import Path
+
+from script.benchmark.synthetic import build_synthetic_graph_data, SyntheticSearchModel, build_synthetic_queries, \
+    JDK_CLASS_NUM
+from script.benchmark.util import process_memory
+from script.summary.generate_summary import Summary
+from util.path_util import PathUtil
+
+"""
+compare the memory of the serving worker processes when each worker loads the graph data and the model into
+its heap, and when the graph index and the model vectors are memory-mapped from the serving artifacts.
+the workers are independent processes like the gunicorn workers, all of them are alive when the memory is read.
+linux only, the memory is read from /proc/self/smaps_rollup.
+"""
+
+HEAP_DATA_NAME = "graph_and_model.pkl"
+MODEL_NAME = "model.pkl"
+SERVING_ARTIFACTS_NAME = "serving"
+
+
+def serve_worker(mode, data_dir, queries, class_number, barrier, result_queue):
+    data_dir = Path(data_dir)
+    if mode == "heap":
+        with open(str(data_dir / HEAP_DATA_NAME), "rb") as f:
+            graph_data, model = pickle.load(f)
+        summary = Summary.create(graph_data, model)
+    else:
+        with open(str(data_dir / MODEL_NAME), "rb") as f:
+            model = pickle.load(f)
+        summary = Summary.create_from_serving_artifacts(str(data_dir / SERVING_ARTIFACTS_NAME), model)
+    gc.collect()
+    for query in queries:
+        summary.get_summary_only_query_by_method(query, class_number)
+    barrier.wait()
+    result_queue.put(process_memory())
+    # keep the worker alive until all the workers read their memory
+    barrier.wait()
+
+
+def run_workers(mode, data_dir, queries, class_number, worker_num):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(worker_num)
+    result_queue = context.Queue()
+    workers = [context.Process(target=serve_worker,
+                               args=(mode, data_dir, queries, class_number, barrier, result_queue))
+               for _ in range(worker_num)]
+    for worker in workers:
+        worker.start()
+    worker_memories = [result_queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return {
+        "worker_memory": worker_memories,
+        "avg_rss_mb": sum(memory["rss_kb"] for memory in worker_memories) / worker_num / 1024,
+        "avg_private_mb": sum(memory["private_clean_kb"] + memory["private_dirty_kb"] for memory in
+                              worker_memories) / worker_num / 1024,
+        "total_pss_mb": sum(memory["pss_kb"] for memory in worker_memories) / 1024,
+    }
+
+
+def benchmark_serving_memory(class_num, query_num, class_number, worker_num):
+    with tempfile.TemporaryDirectory() as data_dir:
+        print("building synthetic graph and model with %d classes" % class_num)
+        graph_data = build_synthetic_graph_data(class_num=class_num)
+        model = SyntheticSearchModel.create(graph_data)
+        with open(str(Path(data_dir) / HEAP_DATA_NAME), "wb") as f:
+            pickle.dump((graph_data, model), f)
+        with open(str(Path(data_dir) / MODEL_NAME), "wb") as f:
+            pickle.dump(model, f)
+        Summary.create(graph_data, model).export_serving_artifacts(str(Path(data_dir) / SERVING_ARTIFACTS_NAME))
+        del graph_data, model
+        gc.collect()
+
+        queries = build_synthetic_queries(query_num)
+        benchmark_result = {"class_num": class_num, "worker_num": worker_num}
+        for mode in ["heap", "mmap"]:
+            benchmark_result[mode] = run_workers(mode, data_dir, queries, class_number, worker_num)
+            print(mode, json.dumps({key: value for key, value in benchmark_result[mode].items() if
+                                    key != "worker_memory"}, indent=4))
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_serving_memory(class_num=JDK_CLASS_NUM, query_num=5, class_number=66, worker_num=4)
+    result_path = PathUtil.benchmark_result("serving_memory")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,85 @@
+import gc
+import json
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+from sekg.graph.exporter.graph_data import GraphData
+
+from script.benchmark.synthetic import build_synthetic_graph_data, SyntheticSearchModel, build_synthetic_queries, \
+    JDK_CLASS_NUM
+from script.summary.generate_summary import Summary
+from util.path_util import PathUtil
+
+"""
+compare the startup time of the summary: the cold init loads the graph data and the search model and builds
+the graph index, the candidates and the urls, the snapshot init loads them from Summary.build_snapshot().
+"""
+
+GRAPH_DATA_NAME = "synthetic.graph"
+MODEL_NAME = "synthetic.model"
+SNAPSHOT_NAME = "snapshot"
+
+
+def cold_init(data_dir):
+    graph_data = GraphData.load(str(Path(data_dir) / GRAPH_DATA_NAME))
+    with open(str(Path(data_dir) / MODEL_NAME), "rb") as f:
+        model = pickle.load(f)
+    return Summary.create(graph_data, model)
+
+
+def snapshot_init(data_dir):
+    return Summary.from_snapshot(str(Path(data_dir) / SNAPSHOT_NAME))
+
+
+def time_init(init, data_dir, repeat_num):
+    costs = []
+    summary = None
+    for _ in range(repeat_num):
+        summary = None
+        gc.collect()
+        start = time.perf_counter()
+        summary = init(data_dir)
+        costs.append(time.perf_counter() - start)
+    return {"avg_s": sum(costs) / len(costs), "min_s": min(costs)}, summary
+
+
+def benchmark_startup(class_num, repeat_num, query_num, class_number):
+    with tempfile.TemporaryDirectory() as data_dir:
+        print("building synthetic graph and model with %d classes" % class_num)
+        graph_data = build_synthetic_graph_data(class_num=class_num)
+        model = SyntheticSearchModel.create(graph_data)
+        graph_data.save(str(Path(data_dir) / GRAPH_DATA_NAME))
+        with open(str(Path(data_dir) / MODEL_NAME), "wb") as f:
+            pickle.dump(model, f)
+        start = time.perf_counter()
+        Summary.create(graph_data, model).build_snapshot(str(Path(data_dir) / SNAPSHOT_NAME))
+        build_snapshot_cost = time.perf_counter() - start
+        del graph_data, model
+
+        cold_result, cold_summary = time_init(cold_init, data_dir, repeat_num)
+        snapshot_result, snapshot_summary = time_init(snapshot_init, data_dir, repeat_num)
+        queries = build_synthetic_queries(query_num)
+        for query in queries:
+            if cold_summary.get_summary_only_query_by_method(query, class_number) != \
+                    snapshot_summary.get_summary_only_query_by_method(query, class_number):
+                raise Exception("the summary loaded from the snapshot is different for %r" % query)
+
+    benchmark_result = {
+        "class_num": class_num,
+        "build_snapshot_s": build_snapshot_cost,
+        "cold_init": cold_result,
+        "snapshot_init": snapshot_result,
+        "speedup": cold_result["avg_s"] / snapshot_result["avg_s"],
+    }
+    print(json.dumps(benchmark_result, indent=4))
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_startup(class_num=JDK_CLASS_NUM, repeat_num=3, query_num=5, class_number=66)
+    result_path = PathUtil.benchmark_result("startup")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
@@ -0,0 +1,53 @@
+import json
+import time
+
+from script.benchmark.synthetic import create_synthetic_summary, build_synthetic_queries, JDK_CLASS_NUM
+from script.benchmark.util import clear_model_cache, latency_statistics
+from util.path_util import PathUtil
+
+"""
+compare the time to the first class summary of get_summary_only_query_by_method(), which returns all classes
+at once, and iter_summary_only_query_by_method(), which yields each class as soon as it is summarized.
+"""
+
+
+def benchmark_stream_summary(class_num, query_num, class_number):
+    summary = create_synthetic_summary(class_num=class_num)
+    queries = build_synthetic_queries(query_num)
+    full_costs = []
+    first_costs = []
+    stream_costs = []
+    for query in queries:
+        clear_model_cache(summary.model, summary.query_encoding_cache)
+        start = time.perf_counter()
+        full_result = summary.get_summary_only_query_by_method(query, class_number)
+        full_costs.append(time.perf_counter() - start)
+
+        clear_model_cache(summary.model, summary.query_encoding_cache)
+        stream_result = {}
+        start = time.perf_counter()
+        for index, class_summary in summary.iter_summary_only_query_by_method(query, class_number):
+            if index == 0:
+                first_costs.append(time.perf_counter() - start)
+            stream_result[index] = class_summary
+        stream_costs.append(time.perf_counter() - start)
+        if stream_result != full_result:
+            raise Exception("the streamed summary is different for %r" % query)
+
+    benchmark_result = {
+        "class_num": class_num,
+        "class_number": class_number,
+        "full_response": latency_statistics(full_costs),
+        "stream_first_class": latency_statistics(first_costs),
+        "stream_all_classes": latency_statistics(stream_costs),
+    }
+    print(json.dumps(benchmark_result, indent=4))
+    return benchmark_result
+
+
+if __name__ == '__main__':
+    result = benchmark_stream_summary(class_num=JDK_CLASS_NUM, query_num=32, class_number=66)
+    result_path = PathUtil.benchmark_result("stream_summary")
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=4)
+    print("save the benchmark result to %s" % result_path)
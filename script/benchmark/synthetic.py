@@ -0,0 +1,179 @@
+import random
+
+import numpy as np
+from sekg.graph.exporter.graph_data import GraphData
+from sekg.ir.doc.wrapper import MultiFieldDocumentCollection, MultiFieldDocument, PreprocessMultiFieldDocumentCollection
+from sekg.ir.models.base import DocumentSimModel
+from sekg.ir.models.compound import CompoundSearchModel
+from sekg.ir.preprocessor.base import SimplePreprocessor
+
+from script.summary.generate_summary import Summary
+
+"""
+build a synthetic graph and search model with the same shape as the jdk8 graph and the compound model,
+so the summary could be benchmarked without the real data.
+"""
+
+# the size of the jdk8 graph at v3_1
+JDK_CLASS_NUM = 4240
+JDK_METHOD_NUM_PER_CLASS = 8
+JDK_SENTENCE_NUM_PER_NODE = 2
+
+
+def synthetic_words(word_num):
+    return ["word%d" % index for index in range(word_num)]
+
+
+def build_synthetic_graph_data(class_num=JDK_CLASS_NUM, method_num_per_class=JDK_METHOD_NUM_PER_CLASS,
+                               sentence_num_per_node=JDK_SENTENCE_NUM_PER_NODE, word_num=5000, seed=0):
+    """
+    build a graph data with classes, methods(some are construct method) and sentences,
+    the method "belong to" the class, the class and method "has sentence".
+    the number of methods and sentences of each node is random, but the average is the given num.
+    """
+    rand = random.Random(seed)
+    words = synthetic_words(word_num)
+    graph_data = GraphData()
+
+    def add_sentences(node_id):
+        for _ in range(rand.randint(0, sentence_num_per_node * 2)):
+            sentence_name = " ".join(rand.sample(words, rand.randint(5, 15)))
+            sentence_id = graph_data.add_node({"entity", "sentence"}, {"sentence_name": sentence_name})
+            graph_data.add_relation(node_id, "has sentence", sentence_id)
+
+    for class_index in range(class_num):
+        package_name = "java.%s.%s" % (rand.choice(words), rand.choice(words))
+        class_name = "%s.Class%d%s" % (package_name, class_index, rand.choice(words).capitalize())
+        class_labels = {"entity", "class"}
+        if rand.random() < 0.05:
+            class_labels.add("class type")
+        class_id = graph_data.add_node(class_labels, {"qualified_name": class_name})
+        add_sentences(class_id)
+
+        for method_index in range(rand.randint(0, method_num_per_class * 2)):
+            method_labels = {"entity", "method"}
+            method_name = "%s.%s%d(%s)" % (class_name, rand.choice(words), method_index, rand.choice(words))
+            if method_index == 0:
+                method_labels.add("construct method")
+            elif rand.random() < 0.1:
+                method_labels = {"entity", "base override method"}
+            method_id = graph_data.add_node(method_labels, {"qualified_name": method_name})
+            graph_data.add_relation(method_id, "belong to", class_id)
+            add_sentences(method_id)
+
+    return graph_data
+
+
+def build_synthetic_doc_collection(graph_data: GraphData):
+    """
+    build the preprocessed document collection for all class, method and sentence in the graph.
+    """
+    doc_collection = MultiFieldDocumentCollection()
+    for node_id in sorted(graph_data.get_node_ids()):
+        properties = graph_data.get_node_info_dict(node_id)["properties"]
+        if "qualified_name" in properties:
+            name = properties["qualified_name"]
+        else:
+            name = properties["sentence_name"]
+        doc = MultiFieldDocument(id=node_id, name=name)
+        doc.add_field("name", name)
+        for start_id, relation_type, end_id in graph_data.get_all_out_relations(node_id):
+            if relation_type == "has sentence":
+                doc.add_field("sentence_%d" % end_id, graph_data.get_node_info_dict(end_id)["properties"]["sentence_name"])
+        doc_collection.add_document(doc)
+    return PreprocessMultiFieldDocumentCollection.create_from_doc_collection(SimplePreprocessor(), doc_collection)
+
+
+class SyntheticSearchModel(DocumentSimModel):
+    """
+    a search model like the avg_w2v model, the words have random vectors and
+    the score is the cosine similarity between the avg vector of query and document.
+    """
+
+    def __init__(self, name, model_dir_path, **config):
+        super().__init__(name, model_dir_path, **config)
+        # like the KeyedVectors of gensim, the vector of a word is word_vectors[word_2_index[word]]
+        self.word_2_index = {}
+        self.word_vectors = None
+        self.doc_vectors = None
+        self.embedding_size = 100
+
+    @staticmethod
+    def create(graph_data: GraphData, embedding_size=100, word_num=5000, seed=0):
+        model = SyntheticSearchModel("synthetic", None)
+        model.embedding_size = embedding_size
+        rand = np.random.RandomState(seed)
+        model.word_2_index = {word: index for index, word in enumerate(synthetic_words(word_num))}
+        model.word_vectors = rand.randn(word_num, embedding_size).astype(np.float32)
+        preprocess_doc_collection = build_synthetic_doc_collection(graph_data)
+        model.set_preprocess_doc_collection(preprocess_doc_collection)
+        model.set_preprocessor(preprocess_doc_collection.get_preprocessor())
+        doc_vectors = [model.words2vector(doc.get_document_text_words())
+                       for doc in preprocess_doc_collection.get_all_preprocess_document_list()]
+        model.doc_vectors = np.array(doc_vectors, dtype=np.float32)
+        model.doc_vectors /= np.linalg.norm(model.doc_vectors, axis=1, keepdims=True)
+        return model
+
+    def init_model(self):
+        pass
+
+    def init_model_as_submodel(self):
+        pass
+
+    def support_text2vector(self):
+        return True
+
+    def string2vector(self, doc):
+        return self.words2vector(self.preprocessor.clean(doc))
+
+    def words2vector(self, words):
+        word_indexes = [self.word_2_index[word] for word in words if word in self.word_2_index]
+        if len(word_indexes) == 0:
+            vector = np.zeros(self.embedding_size, dtype=np.float32)
+            vector[0] = 1e-07
+            return vector
+        return np.mean(self.word_vectors[word_indexes], axis=0)
+
+    def get_full_doc_score_vec(self, query):
+        full_entity_score_vec = self.get_cache_score_vector(query)
+        if full_entity_score_vec is not None:
+            return full_entity_score_vec
+        query_vec = self.string2vector(query)
+        query_vec = query_vec / np.linalg.norm(query_vec)
+        full_entity_score_vec = (np.dot(self.doc_vectors, query_vec) + 1) / 2
+        self.cache_entity_score_vector(query, full_entity_score_vec)
+        return full_entity_score_vec
+
+    def train_from_doc_collection_with_preprocessor(self, doc_collection, **config):
+        pass
+
+
+def create_synthetic_compound_model(graph_data: GraphData, weights=(0.6, 0.4), seed=0):
+    """
+    create a compound model like compound_avg_w2v+svm, the sub-models are two synthetic models with different
+    word vectors, so they rank the documents differently.
+    """
+    model_list = [SyntheticSearchModel.create(graph_data, seed=seed + index) for index in range(len(weights))]
+    model = CompoundSearchModel("synthetic_compound", None)
+    model.model_list = model_list
+    model.model_weight_list = list(weights)
+    model.set_preprocess_doc_collection(model_list[0].preprocess_doc_collection)
+    model.set_preprocessor(model_list[0].preprocessor)
+    return model
+
+
+def build_synthetic_queries(query_num=100, word_num=5000, seed=0):
+    rand = random.Random(seed)
+    words = synthetic_words(word_num)
+    return [" ".join(rand.sample(words, rand.randint(2, 6))) for _ in range(query_num)]
+
+
+def create_synthetic_summary(class_num=JDK_CLASS_NUM, seed=0):
+    """
+    create a Summary on the synthetic graph and search model.
+    """
+    print("building synthetic graph with %d classes" % class_num)
+    graph_data = build_synthetic_graph_data(class_num=class_num, seed=seed)
+    print("building synthetic search model for %d nodes" % graph_data.get_node_num())
+    model = SyntheticSearchModel.create(graph_data, seed=seed)
+    return Summary.create(graph_data, model)
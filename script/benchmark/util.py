@@ -0,0 +1,117 @@
+import math
+import time
+import tracemalloc
+
+from util.memory_util import MemoryUtil
+
+
+def clear_model_cache(model, query_encoding_cache=None):
+    """
+    clear the query cache of the search model, so each run computes the scores again.
+    :param query_encoding_cache: the QueryEncodingCache installed on the model, e.g. summary.query_encoding_cache,
+    it is cleared too so the queries are encoded again
+    """
+    model.query_2_score_vector_cache.clear()
+    model.query_2_sorted_index_scores_cache.clear()
+    if query_encoding_cache is not None:
+        query_encoding_cache.clear()
+
+
+def full_ranking_factory(ranking_context_class):
+    """
+    the factory creating the ranking by sorting the whole corpus with model.search(),
+    it could replace the LazyRanking in the summary for comparing.
+    :param ranking_context_class: RankingContext or its subclass
+    :return: the factory with the same parameters as LazyRanking
+    """
+
+    def create_full_ranking(model, query, valid_doc_id_set, valid_scores=None):
+        retrieval_results = model.search(query, len(valid_doc_id_set), valid_doc_id_set)
+        return ranking_context_class.from_retrieval_results(retrieval_results)
+
+    return create_full_ranking
+
+
+def latency_statistics(costs):
+    """
+    :param costs: the cost of each call in seconds
+    :return: a dict of the latency statistics in ms
+    """
+    costs = sorted(costs)
+    return {
+        "num": len(costs),
+        "avg_ms": 1000 * sum(costs) / len(costs),
+        "p50_ms": 1000 * costs[len(costs) // 2],
+        "p95_ms": 1000 * percentile(costs, 95),
+        "p99_ms": 1000 * percentile(costs, 99),
+        "max_ms": 1000 * costs[-1],
+    }
+
+
+def percentile(sorted_values, percent):
+    """
+    the nearest-rank percentile.
+    :param sorted_values: the values sorted ascending
+    :param percent: 0-100
+    """
+    rank = max(int(math.ceil(percent / 100 * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def benchmark_summary_mode(summary_mode, queries, class_number, trace_memory=False):
+    """
+    run the summary mode for each query.
+    :param summary_mode: the summary method, e.g. summary.get_summary_only_query_by_method
+    :param queries: the queries
+    :param class_number: the number of class in the summary
+    :param trace_memory: if True, the peak memory allocated by each call is traced, it makes the call slow
+    :return: (the latency statistics, the summaries)
+    """
+    costs = []
+    peak_memories = []
+    results = []
+    for query in queries:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        results.append(summary_mode(query, class_number))
+        costs.append(time.perf_counter() - start)
+        if trace_memory:
+            peak_memories.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    statistics = latency_statistics(costs)
+    if trace_memory:
+        statistics["avg_peak_memory_kb"] = sum(peak_memories) / len(peak_memories) / 1024
+    return statistics, results
+
+
+def process_memory():
+    """
+    the memory of the current process in kb, see MemoryUtil.process_memory().
+    :return: dict of rss, pss, shared and private memory
+    """
+    return MemoryUtil.process_memory()
+
+
+def reset_peak_memory():
+    """
+    reset the peak rss of the current process (linux only), so process_peak_memory() reads the peak since now.
+    :return: True if it is reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def process_peak_memory():
+    """
+    :return: the peak rss of the current process in kb, read from /proc/self/status (linux only)
+    """
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
@@ -7,6 +7,7 @@ from sekg.ir.preprocessor.code_text import CodeDocPreprocessor
 from sekg.util.annotation import catch_exception
 
 from definitions import SUPPORT_PROJECT_LIST, DATA_DIR
+from search.label_partition import LabelPartitionIndex
 from util.path_util import PathUtil
 
 
@@ -33,6 +34,7 @@ def train_model(pro_name, version, weight):
                                       graph_data_path=graph_data_path,
                                       kg_name_searcher_path=kg_name_searcher_path,
                                       )
+    LabelPartitionIndex.build_and_save(model, model_dir_path, graph_data_path)
     return model_dir_path
 
 
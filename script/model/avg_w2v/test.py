@@ -1,31 +1,42 @@
 from sekg.graph.exporter.graph_data import GraphData
 from sekg.ir.models.avg_w2v import AVGW2VFLModel
 
+from search.avg_w2v_ann import AVGW2VAnnSearch
+from search.label_partition import LabelPartitionIndex
 from util.path_util import PathUtil
 
+
+def search(ann_search, label_partitions, query, partition_name, top_num):
+    """
+    search the docs of the partition by the ann index if it is built, otherwise all docs of the partition are scored.
+    """
+    if ann_search is not None:
+        return ann_search.search(query, top_num, label_partitions.get_partition(partition_name))
+    return label_partitions.search(query, partition_name, top_num)
+
+
 if __name__ == '__main__':
     pro_name = "jdk8"
     version = "v3"
     model_dir_path = PathUtil.sim_model(pro_name=pro_name, version=version, model_type="avg_w2v")
     model = AVGW2VFLModel.load(model_dir_path)
+    # search by the ann index if it is built by train.py
+    ann_search = AVGW2VAnnSearch.load(model, model_dir_path)
     graph_data_path = PathUtil.graph_data(pro_name=pro_name, version=version)
     graph_data: GraphData = GraphData.load(graph_data_path)
-    valid_class_ids = graph_data.get_node_ids_by_label("class")
-    valid_class_ids = valid_class_ids - graph_data.get_node_ids_by_label("class type")
-    valid_method_ids = graph_data.get_node_ids_by_label("method")
-    valid_method_ids.update(graph_data.get_node_ids_by_label("base override method"))
-    valid_sentence_ids = graph_data.get_node_ids_by_label("sentence")
+    # each search only scores the docs of the class, method(without construct method) or sentence partition
+    label_partitions = LabelPartitionIndex.load_or_build(model, model_dir_path, graph_data)
     while True:
         query = input("please input query: ")
         select = int(input("1、class; 2、methos; 3、sentence"))
         top_num = int(input("please input top num"))
         result = []
         if select == 1:
-            result = model.search(query=query, top_num=top_num, valid_doc_id_set=valid_class_ids)
+            result = search(ann_search, label_partitions, query, "class", top_num)
         elif select == 2:
-            result = model.search(query=query, top_num=top_num, valid_doc_id_set=valid_method_ids)
+            result = search(ann_search, label_partitions, query, "method", top_num)
         elif select == 3:
-            result = model.search(query=query, top_num=top_num, valid_doc_id_set=valid_sentence_ids)
+            result = search(ann_search, label_partitions, query, "sentence", top_num)
         else:
             print("invalid input")
         for index, item in enumerate(result):
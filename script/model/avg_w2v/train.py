@@ -8,6 +8,8 @@ from sekg.ir.preprocessor.code_text import CodeDocPreprocessor
 from sekg.util.annotation import catch_exception
 
 from definitions import SUPPORT_PROJECT_LIST, DATA_DIR
+from search.avg_w2v_ann import AVGW2VAnnSearch
+from search.label_partition import LabelPartitionIndex
 from util.path_util import PathUtil
 
 
@@ -20,8 +22,12 @@ def train_avg_w2v_model(pro_name, version):
     pre_doc_path = PathUtil.pre_doc(pro_name, version, pre_way="code-pre")
     pre_doc_collection.save(pre_doc_path)
     word2vec_model_path = PathUtil.sim_model(pro_name=pro_name, version=version, model_type="avg_w2v")
-    AVGW2VFLModel.train(model_dir_path=word2vec_model_path,
-                        doc_collection=pre_doc_collection)
+    model = AVGW2VFLModel.train(model_dir_path=word2vec_model_path,
+                                doc_collection=pre_doc_collection)
+    # the ann index is saved in the model dir, the probe_num of the search could be changed when searching
+    AVGW2VAnnSearch.build(model, word2vec_model_path)
+    LabelPartitionIndex.build_and_save(model, word2vec_model_path,
+                                       PathUtil.graph_data(pro_name=pro_name, version=version))
     return word2vec_model_path
 
 
@@ -2,6 +2,7 @@ from sekg.graph.exporter.graph_data import GraphData
 from sekg.ir.models.avg_w2v import AVGW2VFLModel
 from sekg.ir.models.bm25 import BM25Model
 
+from search.label_partition import LabelPartitionIndex
 from util.path_util import PathUtil
 
 if __name__ == '__main__':
@@ -11,22 +12,19 @@ if __name__ == '__main__':
     model = BM25Model.load(model_dir_path)
     graph_data_path = PathUtil.graph_data(pro_name=pro_name, version=version)
     graph_data: GraphData = GraphData.load(graph_data_path)
-    valid_class_ids = graph_data.get_node_ids_by_label("class")
-    valid_class_ids = valid_class_ids - graph_data.get_node_ids_by_label("class type")
-    valid_method_ids = graph_data.get_node_ids_by_label("method")
-    valid_method_ids.update(graph_data.get_node_ids_by_label("base override method"))
-    valid_sentence_ids = graph_data.get_node_ids_by_label("sentence")
+    # each search only scores the docs of the class, method(without construct method) or sentence partition
+    label_partitions = LabelPartitionIndex.load_or_build(model, model_dir_path, graph_data)
     while True:
         query = input("please input query: ")
         select = int(input("1、class; 2、methos; 3、sentence"))
         top_num = int(input("please input top num"))
         result = []
         if select == 1:
-            result = model.search(query=query, top_num=top_num, valid_doc_id_set=valid_class_ids)
+            result = label_partitions.search(query, "class", top_num)
         elif select == 2:
-            result = model.search(query=query, top_num=top_num, valid_doc_id_set=valid_method_ids)
+            result = label_partitions.search(query, "method", top_num)
         elif select == 3:
-            result = model.search(query=query, top_num=top_num, valid_doc_id_set=valid_sentence_ids)
+            result = label_partitions.search(query, "sentence", top_num)
         else:
             print("invalid input")
         for index, item in enumerate(result):
@@ -7,6 +7,7 @@ from sekg.util.annotation import catch_exception
 from sekg.ir.models.bm25 import BM25Model
 
 from definitions import SUPPORT_PROJECT_LIST, DATA_DIR
+from search.label_partition import LabelPartitionIndex
 from util.path_util import PathUtil
 
 
@@ -17,7 +18,8 @@ def train_model(pro_name, version):
     processor = Preprocessor()
     doc_collection = PreprocessMultiFieldDocumentCollection.create_from_doc_collection(processor, collection)
     model_dir_path = PathUtil.sim_model(pro_name=pro_name, version=version, model_type="bm25")
-    BM25Model.train(model_dir_path, doc_collection=doc_collection)
+    model = BM25Model.train(model_dir_path, doc_collection=doc_collection)
+    LabelPartitionIndex.build_and_save(model, model_dir_path, PathUtil.graph_data(pro_name=pro_name, version=version))
     return model_dir_path
 
 
@@ -0,0 +1,21 @@
+from search.model_bundle import ModelBundle
+from util.path_util import PathUtil
+
+"""
+build the read-only model bundle of the compound model, the summary loads the model from the latest bundle
+instead of rewriting the submodel.config of the model dir. run it again after the models are retrained,
+a new bundle is built and becomes the current one, the old bundles are kept.
+"""
+
+if __name__ == '__main__':
+    pro_name = "jdk8"
+    version = "v3_1"
+    compound_model_name = "compound_{base_model}+{extra_model}".format(base_model="avg_w2v", extra_model="svm")
+    model_dir = PathUtil.sim_model(pro_name=pro_name, version=version, model_type=compound_model_name)
+    # the sub-model dirs in the submodel.config are the dirs at training time, they may be moved since then
+    sub_model_dirs = [
+        PathUtil.sim_model(pro_name=pro_name, version=version, model_type="avg_w2v"),
+        PathUtil.sim_model(pro_name=pro_name, version=version, model_type="svm"),
+    ]
+    bundle_root_dir = PathUtil.model_bundle(pro_name=pro_name, version=version, model_type=compound_model_name)
+    ModelBundle.build(model_dir, bundle_root_dir, sub_model_dirs=sub_model_dirs)
@@ -5,6 +5,7 @@ from sekg.ir.models.n2v.svm.filter_semantic_tfidf_n2v import FilterSemanticTFIDF
 from sekg.ir.preprocessor.code_text import CodeDocPreprocessor
 from script.model.avg_w2v.train import train_avg_w2v_model
 from script.model.n2v.svm_train import SVMTrainer
+from search.label_partition import LabelPartitionIndex
 from util.annotation import catch_exception
 from util.path_util import PathUtil
 
@@ -34,6 +35,7 @@ def train_model(pro_name, version, first_model_config, second_model_config):
                                       doc_collection=doc_collection,
                                       sub_search_model_config=sub_search_model_config
                                       )
+    LabelPartitionIndex.build_and_save(model, model_dir_path, PathUtil.graph_data(pro_name=pro_name, version=version))
 
     return model_dir_path
 
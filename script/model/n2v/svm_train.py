@@ -6,12 +6,14 @@ from sekg.ir.models.avg_w2v import AVGW2VFLModel
 from definitions import OUTPUT_DIR, DATA_DIR, SUPPORT_PROJECT_LIST
 from sekg.ir.preprocessor.base import Preprocessor
 
+from search.label_partition import LabelPartitionIndex
 from util.path_util import PathUtil
 
 
 class SVMTrainer():
     def __init__(self, pro_name, version):
         self.model_dir_path = PathUtil.sim_model(pro_name=pro_name, version=version, model_type="svm")
+        self.graph_data_path = PathUtil.graph_data(pro_name=pro_name, version=version)
         self.model = FilterSemanticTFIDFNode2VectorModel(name="svm", model_dir_path=self.model_dir_path)
         self.document_collection_path = PathUtil.doc(pro_name, version)
         self.collection = MultiFieldDocumentCollection.load(str(self.document_collection_path))
@@ -30,6 +32,7 @@ class SVMTrainer():
                                                                doc_sim_model_class=AVGW2VFLModel
                                                                )
         self.model.save(self.model_dir_path)
+        LabelPartitionIndex.build_and_save(self.model, self.model_dir_path, self.graph_data_path)
 
 
 if __name__ == '__main__':
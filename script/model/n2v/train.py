@@ -4,6 +4,7 @@ from sekg.graph.exporter.graph_data import GraphData
 from sekg.model.node2vec.train import GraphNode2VecTrainer
 
 from definitions import OUTPUT_DIR, SUPPORT_PROJECT_LIST
+from graph.csr_graph import CSRGraphData
 from util.annotation import catch_exception
 
 
@@ -16,8 +17,10 @@ def train_node2vec(pro_name, version):
     node2vec_output_dir.mkdir(exist_ok=True, parents=True)
     graph_random_walk_path = str(
         node2vec_output_dir / "{pro}.{version}.unweight.rwp".format(pro=pro_name, version=version))
-    trainer = GraphNode2VecTrainer(GraphData.load(
-        str(graph_data_output_dir / ("{pro}.{version}.graph".format(pro=pro_name, version=version)))))
+    # the trainer only reads the nodes and the relation pairs, the frozen graph gives the pairs from its arrays and
+    # the GraphData is dropped before the random walks
+    trainer = GraphNode2VecTrainer(CSRGraphData(GraphData.load(
+        str(graph_data_output_dir / ("{pro}.{version}.graph".format(pro=pro_name, version=version))))))
     trainer.init_unweight_graph()
     trainer.generate_random_path(rw_path_store_path=graph_random_walk_path)
     graph2vec_model_path = str(
@@ -0,0 +1,17 @@
+from script.summary.generate_summary import Summary
+from util.path_util import PathUtil
+
+"""
+build the snapshot of the query-ready summary, run.py and the console tests load it instead of
+the graph data and the search model if it exists. run it again after the graph data or the model is rebuilt.
+"""
+
+if __name__ == '__main__':
+    pro_name = "jdk8"
+    version = "v3_1"
+    compound_model_name = "compound_{base_model}+{extra_model}".format(base_model="avg_w2v", extra_model="svm")
+    model_dir = PathUtil.sim_model(pro_name=pro_name, version=version, model_type=compound_model_name)
+    snapshot_dir = PathUtil.summary_snapshot(pro_name=pro_name, version=version, model_type=compound_model_name)
+    summary = Summary(pro_name, version, model_dir)
+    summary.build_snapshot(snapshot_dir)
+    print("build the summary snapshot in %s" % snapshot_dir)
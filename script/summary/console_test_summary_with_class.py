@@ -6,7 +6,8 @@ if __name__ == '__main__':
     version = "v3_1"
     compound_model_name = "compound_{base_model}+{extra_model}".format(base_model="avg_w2v", extra_model="svm")
     model_dir = PathUtil.sim_model(pro_name=pro_name, version=version, model_type=compound_model_name)
-    summary = Summary(pro_name, version, model_dir)
+    # the snapshot is loaded if it is built from the current graph data and model
+    summary = Summary.load(pro_name, version, model_dir)
     while True:
         query = input("please input query:")
         class_name = input("please input qualified class name")
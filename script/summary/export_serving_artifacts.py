@@ -0,0 +1,19 @@
+from script.summary.generate_summary import Summary
+from util.path_util import PathUtil
+
+"""
+export the serving artifacts of the summary: the graph index (adjacency, node ids of the labels, qualified names
+and sentence texts) and the vectors of the search model, as flat files memory-mapped by the serving workers.
+run it again after the graph data or the model is rebuilt.
+"""
+
+if __name__ == '__main__':
+    pro_name = "jdk8"
+    version = "v3_1"
+    compound_model_name = "compound_{base_model}+{extra_model}".format(base_model="avg_w2v", extra_model="svm")
+    model_dir = PathUtil.sim_model(pro_name=pro_name, version=version, model_type=compound_model_name)
+    serving_artifacts_dir = PathUtil.serving_artifacts(pro_name=pro_name, version=version,
+                                                       model_type=compound_model_name)
+    summary = Summary(pro_name, version, model_dir)
+    summary.export_serving_artifacts(serving_artifacts_dir)
+    print("export the serving artifacts to %s" % serving_artifacts_dir)
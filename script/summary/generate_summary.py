@@ -1,126 +1,622 @@
 import json
 import pickle
+import threading
+from pathlib import Path
+
 from sekg.ir.models.compound import CompoundSearchModel
 from sekg.graph.exporter.graph_data import GraphData
+from graph.csr_graph import CSRGraphData
+from script.summary.graph_index import SummaryGraphIndex
+from script.summary.request_context import SummaryRequestContext
+from search.avg_w2v_ann import AVGW2VAnnSearch
+from search.candidate_scorer import CandidateScorer
+from search.class_name_index import ClassNameIndex
+from search.label_partition import LabelPartitionIndex
+from search.lazy_ranking import LazyRanking
+from search.model_bundle import ModelBundle
+from search.model_instrument import ModelInstrument
+from search.query_encoding_cache import QueryEncodingCache
+from search.model_vectors import ModelVectors
+from util.artifact_util import ArtifactUtil
+from util.metrics_util import SummaryMetrics
 from util.path_util import PathUtil
+from util.trace_util import Tracer
 
 
 class Summary:
-    class_or_method_2_sentence_ids = {}
-    sorted_method_and_sentence_id_dict = {}
-    all_class_summary = {}
-    sort_method_ids = []
-    sort_sentence_ids = []
-
-    def __init__(self, pro_name, version, model_dir):
-        graph_data_path = PathUtil.graph_data(pro_name=pro_name, version=version)
-        self.graph_data:GraphData=GraphData.load(graph_data_path)
-        self.model = self.create_search_model(pro_name, version, model_dir)
+    """
+    generate the api summary for query.
+    the graph and the search model are read-only after init and the state of each query is kept in a
+    SummaryRequestContext, so one Summary could be used by many threads at the same time.
+    it is loaded from the graph data and the model, the serving artifacts or a snapshot, see load().
+    """
+    SERVING_GRAPH_INDEX_DIR = "graph"
+    SERVING_MODEL_VECTORS_DIR = "vectors"
+    SERVING_LABEL_PARTITIONS_DIR = "partitions"
+    # the fingerprints of the graph data and the model the serving artifacts are exported from, written at last
+    SERVING_MANIFEST_NAME = "artifacts.json"
+    # the indexes built in the model dirs after training, they are not a part of the model fingerprint
+    DERIVED_MODEL_DIR_NAMES = (LabelPartitionIndex.INDEX_DIR, AVGW2VAnnSearch.INDEX_DIR)
+
+    SNAPSHOT_MANIFEST_NAME = "manifest.json"
+    SNAPSHOT_MODEL_NAME = "model.pkl"
+    SNAPSHOT_CLASS_URLS_NAME = "class_urls.pkl"
+
+    # shared by all summaries until set_metrics() is called, it records nothing
+    metrics = SummaryMetrics(enabled=False)
+    model_instrument = None
+    # the spans are recorded only in the threads tracing a request
+    tracer = Tracer()
+    # the summary modes finding the classes by the query
+    QUERY_ONLY_MODE_NAMES = ["get_summary_only_query", "get_summary_only_query_by_method",
+                             "get_summary_only_query_by_sentence"]
+    # the summary mode name -> the number of candidates rescored by the whole model, see set_cascade()
+    cascade_top_nums = {}
+    cascade_first_stage = None
+
+    def __init__(self, pro_name, version, model_dir, serving_artifacts_dir=None):
+        """
+        :param pro_name: the project name
+        :param version: the version of the graph data
+        :param model_dir: the dir of the compound search model
+        :param serving_artifacts_dir: the dir of the serving artifacts exported for the graph data and the model,
+        if it is given, the graph data is not loaded and the graph index and the model vectors are memory-mapped
+        """
+        model = self.create_search_model(pro_name, version, model_dir)
+        # the bundle dir is the model actually loaded
+        model_path = self.get_model_bundle_dir(pro_name, version, model_dir) or model_dir
+        source_fingerprints = self.get_source_fingerprints(pro_name, version, model_dir)
+        artifact_key = (pro_name, version, Path(model_dir).name, self.get_artifact_version(source_fingerprints))
+        if serving_artifacts_dir is not None:
+            if self.get_serving_artifacts_fingerprints(serving_artifacts_dir) != source_fingerprints:
+                raise Exception("the serving artifacts in %s are exported from other graph data or model, export "
+                                "them again by script.summary.export_serving_artifacts" % serving_artifacts_dir)
+            self.__init_from_serving_artifacts(serving_artifacts_dir, model, artifact_key, source_fingerprints)
+        else:
+            graph_data_path = PathUtil.graph_data(pro_name=pro_name, version=version)
+            # the summary only reads the graph, the GraphData is dropped after the frozen view is built
+            graph_data = CSRGraphData(GraphData.load(graph_data_path))
+            # the label partitions are built with the model by script.model.compound.train
+            label_partitions = LabelPartitionIndex.load(model, LabelPartitionIndex.get_index_dir(model_path))
+            self.__init_serving_state(SummaryGraphIndex(graph_data), model, artifact_key, graph_data,
+                                      label_partitions=label_partitions, source_fingerprints=source_fingerprints)
         print("It's ok for init!")
 
-    def get_sentence_from_class_or_method(self, id):
-        try:
-            sentence_id_list = []
-            relations = self.graph_data.get_all_out_relations(id)
-            for re in relations:
-                if re[1] == "has sentence":
-                    sentence_id = re[2]
-                    sentence_id_list.append(sentence_id)
-            return sentence_id_list
-        except Exception as e:
-            print("exception:" + str(e))
+    @staticmethod
+    def get_source_fingerprints(pro_name, version, model_dir):
+        """
+        the fingerprints of the graph data and the model loaded by Summary(pro_name, version, model_dir),
+        the snapshot and the serving artifacts built from other files are stale.
+        the model fingerprint is the checksum of the latest model bundle, or the fingerprint of the model dir and
+        the dirs of its sub-models if the bundle is not built, the indexes built in them after training are excluded.
+        :return: {"graph": the graph fingerprint, "model": the model fingerprint}
+        """
+        bundle_dir = Summary.get_model_bundle_dir(pro_name, version, model_dir)
+        if bundle_dir is not None:
+            model_fingerprint = ModelBundle.load_manifest(bundle_dir)["checksum"]
+        else:
+            model_fingerprint = ArtifactUtil.fingerprint(model_dir, *ModelBundle.get_sub_model_dirs(model_dir),
+                                                         exclude_dir_names=Summary.DERIVED_MODEL_DIR_NAMES)
+        return {"graph": ArtifactUtil.fingerprint(PathUtil.graph_data(pro_name=pro_name, version=version)),
+                "model": model_fingerprint}
+
+    @staticmethod
+    def get_artifact_version(source_fingerprints):
+        """
+        :return: the artifact version of the summary loaded from the graph data and the model of the fingerprints,
+        it is the same whether the summary is loaded from the sources or the serving artifacts
+        """
+        return "%s.%s" % (source_fingerprints["graph"][:16], source_fingerprints["model"][:16])
+
+    @classmethod
+    def load(cls, pro_name, version, model_dir):
+        """
+        load the summary for serving in the fastest way: from the snapshot built by script.summary.build_snapshot,
+        else from the serving artifacts exported by script.summary.export_serving_artifacts, else from the graph data
+        and the model. the snapshot and the serving artifacts built from other graph data or model, e.g. before the
+        graph is rebuilt, are stale and skipped. the summary loaded from the same files has the same artifact_key in
+        every process.
+        :param pro_name: the project name
+        :param version: the version of the graph data
+        :param model_dir: the dir of the compound search model
+        :return: Summary
+        """
+        model_type = Path(model_dir).name
+        source_fingerprints = cls.get_source_fingerprints(pro_name, version, model_dir)
+        snapshot_dir = PathUtil.summary_snapshot(pro_name=pro_name, version=version, model_type=model_type)
+        if cls.snapshot_exists(snapshot_dir):
+            if cls.load_snapshot_manifest(snapshot_dir).get("source_fingerprints", None) == source_fingerprints:
+                return cls.from_snapshot(snapshot_dir, source_fingerprints)
+            print("the snapshot in %s is stale, build it again by script.summary.build_snapshot" % snapshot_dir)
+        serving_artifacts_dir = PathUtil.serving_artifacts(pro_name=pro_name, version=version, model_type=model_type)
+        if cls.get_serving_artifacts_fingerprints(serving_artifacts_dir) == source_fingerprints:
+            return cls(pro_name, version, model_dir, serving_artifacts_dir=serving_artifacts_dir)
+        if len(ArtifactUtil.list_files(serving_artifacts_dir)) > 0:
+            print("the serving artifacts in %s are stale, export them again by script.summary.export_serving_artifacts"
+                  % serving_artifacts_dir)
+        return cls(pro_name, version, model_dir)
+
+    @staticmethod
+    def get_load_paths(pro_name, version, model_dir):
+        """
+        :return: the files and dirs read by load(), the summary loaded should be reloaded when any of them is changed
+        """
+        model_type = Path(model_dir).name
+        return [PathUtil.summary_snapshot(pro_name=pro_name, version=version, model_type=model_type),
+                PathUtil.serving_artifacts(pro_name=pro_name, version=version, model_type=model_type),
+                PathUtil.model_bundle(pro_name, version, model_type),
+                PathUtil.graph_data(pro_name=pro_name, version=version),
+                model_dir]
+
+    @classmethod
+    def create(cls, graph_data: GraphData, model, pro_name="synthetic", version="memory", model_name="synthetic"):
+        """
+        create the summary from a loaded graph data and search model, e.g. the synthetic ones for benchmark.
+        :param graph_data: the graph data, it is frozen as a CSRGraphData
+        :param model: the search model
+        :param pro_name: the project name of the graph data
+        :param version: the version of the graph data
+        :param model_name: the name of the search model
+        :return: Summary
+        """
+        summary = cls.__new__(cls)
+        artifact_version = "%x.%x" % (id(graph_data), id(model))
+        if not isinstance(graph_data, CSRGraphData):
+            graph_data = CSRGraphData(graph_data)
+        summary.__init_serving_state(SummaryGraphIndex(graph_data), model,
+                                     (pro_name, version, model_name, artifact_version), graph_data)
+        return summary
+
+    @classmethod
+    def create_from_serving_artifacts(cls, serving_artifacts_dir, model, pro_name="synthetic", version="memory",
+                                      model_name="synthetic"):
+        """
+        create the summary from the serving artifacts and a loaded search model,
+        the graph index is memory-mapped and the vectors of the model are replaced by the memory-mapped ones.
+        :param serving_artifacts_dir: the dir written by export_serving_artifacts()
+        :param model: the search model the artifacts are exported from
+        :return: Summary
+        """
+        summary = cls.__new__(cls)
+        source_fingerprints = cls.get_serving_artifacts_fingerprints(serving_artifacts_dir)
+        if source_fingerprints is None:
+            artifact_version = ArtifactUtil.fingerprint(serving_artifacts_dir)
+        else:
+            artifact_version = cls.get_artifact_version(source_fingerprints)
+        summary.__init_from_serving_artifacts(serving_artifacts_dir, model,
+                                              (pro_name, version, model_name, artifact_version), source_fingerprints)
+        return summary
+
+    @staticmethod
+    def get_serving_artifacts_fingerprints(serving_artifacts_dir):
+        """
+        :return: the source fingerprints (see get_source_fingerprints()) recorded by export_serving_artifacts(),
+        None if the artifacts are not exported completely or they are exported from a summary without source files
+        """
+        manifest_path = Path(serving_artifacts_dir) / Summary.SERVING_MANIFEST_NAME
+        if not manifest_path.exists():
             return None
+        with open(str(manifest_path)) as f:
+            return json.load(f)["source_fingerprints"]
 
-    def get_method_id_from_class(self, class_id):
-        try:
-            method_id_list = []
-            relations = self.graph_data.get_all_in_relations(class_id)
-            method_relation_class = ["belong to"]
-            for re in relations:
-                if re[1] in method_relation_class:
-                    method_id = re[0]
-                    if method_id == class_id:
-                        method_id = re[2]
-                    node_dict = self.graph_data.get_node_info_dict(method_id)
-                    if ("method" in node_dict["labels"] or "base override method" in node_dict["labels"]) and "construct method" not in node_dict["labels"]:
-                        method_id_list.append(method_id)
-            return method_id_list
-        except Exception as e:
-            print("exception:" + str(e))
+    def __init_from_serving_artifacts(self, serving_artifacts_dir, model, artifact_key, source_fingerprints):
+        graph_index = SummaryGraphIndex.load(Path(serving_artifacts_dir) / self.SERVING_GRAPH_INDEX_DIR)
+        model_fingerprint = ModelVectors.fingerprint(model)
+        ModelVectors.map(model, Path(serving_artifacts_dir) / self.SERVING_MODEL_VECTORS_DIR, model_fingerprint)
+        label_partitions = LabelPartitionIndex.load(model,
+                                                    Path(serving_artifacts_dir) / self.SERVING_LABEL_PARTITIONS_DIR,
+                                                    model_fingerprint)
+        self.__init_serving_state(graph_index, model, artifact_key, label_partitions=label_partitions,
+                                  source_fingerprints=source_fingerprints)
+
+    def __init_serving_state(self, graph_index: SummaryGraphIndex, model, artifact_key,
+                             graph_data: CSRGraphData = None, label_partitions=None, class_id_2_urls=None,
+                             source_fingerprints=None):
+        # the graph data is None if the summary is created from the serving artifacts
+        self.graph_data = graph_data
+        # the fingerprints of the graph data and model files it is loaded from, None if it is created in memory
+        self.source_fingerprints = source_fingerprints
+        self.graph_index = graph_index
+        self.model = model
+        # (pro_name, version, model name, the fingerprint of graph and model files), changed when other data is loaded
+        self.artifact_key = artifact_key
+        self.query_encoding_cache = QueryEncodingCache(max_size=4096)
+        self.query_encoding_cache.install(model)
+        if label_partitions is None:
+            label_partitions = LabelPartitionIndex.build(model, {
+                "class": graph_index.get_all_class_ids(),
+                "method": graph_index.get_all_method_ids(),
+                "sentence": graph_index.get_all_sentence_ids(),
+            })
+        self.label_partitions = label_partitions
+        # the candidates of the rankings, they are the same for all queries
+        self.class_candidates = label_partitions.get_partition("class")
+        self.method_candidates = label_partitions.get_partition("method")
+        self.sentence_candidates = label_partitions.get_partition("sentence")
+        if class_id_2_urls is None:
+            class_id_2_urls = {}
+            for class_id in graph_index.get_all_class_ids():
+                class_id_2_urls[class_id] = self.create_class_urls(graph_index.get_qualified_name(class_id))
+        # class id -> (the url by all parts of the name, the url by the top 4 parts of the name)
+        self.class_id_2_urls = class_id_2_urls
+        # built at the first use, see get_class_name_index()
+        self.class_name_index = None
+        self.class_name_index_lock = threading.Lock()
+
+    def get_memory_bytes(self):
+        """
+        estimate the memory of the summary by the bytes of its arrays: the graph index, the frozen graph data, the
+        vectors of the model and the label partitions. the memory-mapped arrays are counted in full, the python
+        objects, e.g. the documents of the model and the node info dicts, are not counted.
+        """
+        memory_bytes = self.graph_index.get_array_bytes() + ModelVectors.get_array_bytes(self.model) + \
+            self.label_partitions.get_array_bytes()
+        if self.graph_data is not None:
+            memory_bytes += self.graph_data.get_array_bytes()
+        return memory_bytes
+
+    def set_metrics(self, metrics: SummaryMetrics):
+        """
+        record the latency of the stages of the summary and its search model into the metrics, the metrics are
+        disabled by default. the stages are "graph_lookup" (finding the class by name), "search" (scoring the
+        candidates of get_summary() or the classes), "rank" (scoring the candidates for the rankings), "assemble"
+        (the graph lookups and the sorting for one class) and the stages of the search model timed by
+        ModelInstrument.
+        :param metrics: the SummaryMetrics
+        """
+        if self.model_instrument is not None:
+            self.model_instrument.remove()
+        self.metrics = metrics
+        self.model_instrument = ModelInstrument(metrics)
+        self.model_instrument.instrument(self.model)
+
+    def set_cascade(self, mode_name_2_top_num, first_stage=None):
+        """
+        rank the candidates of the query-only summary modes by a two-stage cascade: the first stage picks the top N
+        candidates, only they are rescored by the whole compound model, see LabelPartitionIndex.cascade_score().
+        :param mode_name_2_top_num: the summary mode name -> N, e.g. {"get_summary_only_query_by_method": 2000},
+        the modes not in it score all candidates by the whole model
+        :param first_stage: the LabelPartitionIndex of the first-stage model (e.g. bm25) built for the same docs, or
+        the AVGW2VAnnSearch of the first sub-model, which searches the top N by its ann index instead of scoring all
+        candidates. if it is None, all candidates are scored exactly by the first sub-model of the compound model
+        (avg_w2v)
+        """
+        self.cascade_top_nums = dict(mode_name_2_top_num)
+        self.cascade_first_stage = first_stage
+
+    def set_ann_cascade(self, mode_name_2_top_num, queries, min_recall=0.9, recall_num=10, first_stage_ann=None):
+        """
+        use the ann index of the avg_w2v sub-model as the first stage of the cascade, see set_cascade(). the index
+        misses some top docs, so it is used only if the recall@recall_num of the cascade on the queries, to scoring
+        all candidates by the whole model, is at least min_recall for each N, otherwise the cascade is not changed.
+        :param mode_name_2_top_num: the summary mode name -> N, see set_cascade()
+        :param queries: the queries of the recall check, e.g. the hot queries
+        :param min_recall: the min recall of the partitions
+        :param recall_num: the number of top docs compared
+        :param first_stage_ann: the AVGW2VAnnSearch of the first sub-model, if it is None, it is loaded from the
+        ann index built in the sub-model dir by script.model.avg_w2v.train
+        :return: N -> the recall, None if the ann index is not built
+        """
+        if first_stage_ann is None:
+            sub_model = self.label_partitions.sub_models[0]
+            if getattr(sub_model, "avg_w2v_model", None) is not None and \
+                    getattr(sub_model, "model_dir_path", None) is not None:
+                first_stage_ann = AVGW2VAnnSearch.load(sub_model)
+        if first_stage_ann is None:
+            print("the ann index of the avg_w2v sub-model is not built, the ann cascade is not used")
             return None
+        top_num_2_recall = {top_num: self.label_partitions.cascade_recall(queries, top_num, first_stage_ann,
+                                                                          recall_num)
+                            for top_num in sorted(set(mode_name_2_top_num.values()))}
+        if min(top_num_2_recall.values(), default=1.0) < min_recall:
+            print("the recall@%d of the ann cascade %r is lower than %.2f, it is not used" % (
+                recall_num, top_num_2_recall, min_recall))
+            return top_num_2_recall
+        self.set_cascade(mode_name_2_top_num, first_stage_ann)
+        return top_num_2_recall
+
+    def score_partition(self, mode_name, query, query_vectors, name):
+        """
+        :param mode_name: the summary mode name, the partition is scored by the cascade if it is set for the mode
+        :param query: the query
+        :param query_vectors: the query encoded by self.label_partitions.encode()
+        :param name: the partition name
+        :return: the scores of the docs of the partition
+        """
+        top_num = self.cascade_top_nums.get(mode_name, None)
+        if top_num is None:
+            return self.label_partitions.score(query_vectors, name)
+        if isinstance(self.cascade_first_stage, AVGW2VAnnSearch):
+            return self.label_partitions.cascade_score(query_vectors, name, top_num,
+                                                       first_stage_ann=self.cascade_first_stage)
+        first_stage_scores = None
+        if self.cascade_first_stage is not None:
+            first_stage_scores = self.cascade_first_stage.score(self.cascade_first_stage.encode(query), name)
+        return self.label_partitions.cascade_score(query_vectors, name, top_num,
+                                                   first_stage_scores=first_stage_scores)
+
+    def build_snapshot(self, snapshot_dir):
+        """
+        save the query-ready state of the summary: the serving artifacts (with the label partitions),
+        the whole search model and the urls of the classes, so it could be loaded fast by from_snapshot().
+        the manifest records the fingerprints of the graph data and the model, so the stale snapshot is refused.
+        :param snapshot_dir: the dir to save the snapshot
+        """
+        snapshot_dir = Path(snapshot_dir)
+        self.export_serving_artifacts(snapshot_dir)
+        # the instrumented model and the model with the query encoding cache can't be pickled
+        if self.model_instrument is not None:
+            self.model_instrument.remove()
+        self.query_encoding_cache.remove()
+        ModelVectors.dump(self.model, str(snapshot_dir / self.SNAPSHOT_MODEL_NAME),
+                          str(snapshot_dir / self.SERVING_MODEL_VECTORS_DIR))
+        self.query_encoding_cache.install(self.model)
+        if self.model_instrument is not None:
+            self.model_instrument.instrument(self.model)
+        with open(str(snapshot_dir / self.SNAPSHOT_CLASS_URLS_NAME), "wb") as f:
+            pickle.dump(self.class_id_2_urls, f)
+        # the manifest is written at last, a snapshot without it is not complete
+        pro_name, version, model_name, artifact_version = self.artifact_key
+        manifest = {"pro_name": pro_name, "version": version, "model_name": model_name,
+                    "artifact_version": artifact_version, "source_fingerprints": self.source_fingerprints}
+        with open(str(snapshot_dir / self.SNAPSHOT_MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=4)
+
+    @staticmethod
+    def snapshot_exists(snapshot_dir):
+        return (Path(snapshot_dir) / Summary.SNAPSHOT_MANIFEST_NAME).exists()
 
-    def get_one_class_or_method_2_sentence(self, query, name, valid_sentence_id_set, class_or_method_2_sentence,
+    @staticmethod
+    def load_snapshot_manifest(snapshot_dir):
+        with open(str(Path(snapshot_dir) / Summary.SNAPSHOT_MANIFEST_NAME)) as f:
+            return json.load(f)
+
+    @classmethod
+    def from_snapshot(cls, snapshot_dir, source_fingerprints=None):
+        """
+        load the summary from the snapshot saved by build_snapshot(), the graph data and the sub-models are not loaded,
+        the arrays are memory-mapped.
+        :param snapshot_dir: the dir of the snapshot
+        :param source_fingerprints: the fingerprints of the current graph data and model by get_source_fingerprints(),
+        the snapshot built from other files is refused. if it is None, the snapshot is not checked, e.g. the snapshot
+        of a synthetic summary
+        :return: Summary
+        """
+        snapshot_dir = Path(snapshot_dir)
+        manifest = cls.load_snapshot_manifest(snapshot_dir)
+        if source_fingerprints is not None and manifest.get("source_fingerprints", None) != source_fingerprints:
+            raise Exception("the snapshot in %s is built from other graph data or model, build it again by "
+                            "script.summary.build_snapshot" % snapshot_dir)
+        model = ModelVectors.load(str(snapshot_dir / cls.SNAPSHOT_MODEL_NAME),
+                                  str(snapshot_dir / cls.SERVING_MODEL_VECTORS_DIR))
+        graph_index = SummaryGraphIndex.load(snapshot_dir / cls.SERVING_GRAPH_INDEX_DIR)
+        # the model is loaded from the vectors exported with the label partitions, its fingerprint is not computed again
+        label_partitions = LabelPartitionIndex.load(model, snapshot_dir / cls.SERVING_LABEL_PARTITIONS_DIR,
+                                                    ModelVectors.get_exported_fingerprint(
+                                                        snapshot_dir / cls.SERVING_MODEL_VECTORS_DIR))
+        with open(str(snapshot_dir / cls.SNAPSHOT_CLASS_URLS_NAME), "rb") as f:
+            class_id_2_urls = pickle.load(f)
+        # the artifact key is the same as the summary the snapshot is built from, so the cached results are still valid
+        artifact_key = (manifest["pro_name"], manifest["version"], manifest["model_name"],
+                        manifest["artifact_version"])
+        summary = cls.__new__(cls)
+        summary.__init_serving_state(graph_index, model, artifact_key, label_partitions=label_partitions,
+                                     class_id_2_urls=class_id_2_urls,
+                                     source_fingerprints=manifest.get("source_fingerprints", None))
+        return summary
+
+    def export_serving_artifacts(self, serving_artifacts_dir):
+        """
+        export the graph index, the vectors of the search model and the label partitions as flat files,
+        the summary could be created from them by create_from_serving_artifacts() or Summary(serving_artifacts_dir=).
+        :param serving_artifacts_dir: the dir to save the serving artifacts
+        """
+        self.graph_index.save(Path(serving_artifacts_dir) / self.SERVING_GRAPH_INDEX_DIR)
+        model_fingerprint = ModelVectors.fingerprint(self.model)
+        ModelVectors.export(self.model, Path(serving_artifacts_dir) / self.SERVING_MODEL_VECTORS_DIR, model_fingerprint)
+        self.label_partitions.save(Path(serving_artifacts_dir) / self.SERVING_LABEL_PARTITIONS_DIR, model_fingerprint)
+        # the manifest is written at last, the artifacts without it are not complete
+        with open(str(Path(serving_artifacts_dir) / self.SERVING_MANIFEST_NAME), "w") as f:
+            json.dump({"source_fingerprints": self.source_fingerprints}, f, indent=4)
+
+    def get_sentence_from_class_or_method(self, id):
+        return self.graph_index.get_sentence_ids(id)
+
+    def get_method_id_from_class(self, class_id):
+        return self.graph_index.get_method_ids(class_id)
+
+    def get_one_class_or_method_2_sentence(self, scorer, name, valid_sentence_id_set, class_or_method_2_sentence,
                                            judge):
-        count = 1
-        class_or_method_2_sentence[name]['sentence'] = []
-        class_or_method_2_sentence[name]['url'] = ''
-        if judge == 0:
-            class_or_method_2_sentence[name]['url'] = 'https://docs.oracle.com/javase/8/docs/api'
-            split_name = name.split('.')
-            for key in split_name:
-                class_or_method_2_sentence[name]['url'] += '/' + key
-            class_or_method_2_sentence[name]['url'] += '.html'
-        sorted_sentence_ids = self.model.search(query, 10, valid_sentence_id_set)
-        for sentence_id in sorted_sentence_ids:
-            class_or_method_2_sentence[name]['sentence'].append(sentence_id.doc_name)
-            count = count + 1
-            if count > 2:
-                break
-        return class_or_method_2_sentence
+        with self.tracer.span("get_one_class_or_method_2_sentence", name=name,
+                              sentence_num=len(valid_sentence_id_set)):
+            class_or_method_2_sentence[name]['sentence'] = []
+            class_or_method_2_sentence[name]['url'] = ''
+            if judge == 0:
+                class_or_method_2_sentence[name]['url'] = self.get_class_url(name)
+            for sentence_id, sentence_name in scorer.top(valid_sentence_id_set, 2):
+                class_or_method_2_sentence[name]['sentence'].append(sentence_name)
+            return class_or_method_2_sentence
 
     def sorted_method_and_sentence_id(self, method_ids, query, class_id, class_name):
-        count = 1
+        with self.tracer.span("sorted_method_and_sentence_id", method_num=len(method_ids)):
+            return self.__sorted_method_and_sentence_id(method_ids, query, class_id, class_name)
+
+    def __sorted_method_and_sentence_id(self, method_ids, query, class_id, class_name):
+        class_sentence_ids, method_id_2_sentence_ids, candidate_ids = self.get_class_candidate_ids(class_id,
+                                                                                                   method_ids)
+        with self.metrics.stage("search"), self.tracer.span("score_candidates", candidate_num=len(candidate_ids)):
+            scorer = CandidateScorer.create(self.label_partitions, query, candidate_ids)
+        return self.rank_class_candidates(scorer, method_ids, class_sentence_ids, method_id_2_sentence_ids,
+                                          class_name)
+
+    def get_class_candidate_ids(self, class_id, method_ids):
+        """
+        :return: (the sentence ids of the class, the method id -> its sentence ids, the union of the sentences of
+        the class, its methods and the sentences of all its methods), the union is scored together
+        """
+        class_sentence_ids = self.get_sentence_from_class_or_method(class_id)
+        method_id_2_sentence_ids = {method_id: self.get_sentence_from_class_or_method(method_id) for method_id in
+                                    method_ids}
+        candidate_ids = set(class_sentence_ids)
+        candidate_ids.update(method_ids)
+        for sentence_ids in method_id_2_sentence_ids.values():
+            candidate_ids.update(sentence_ids)
+        return class_sentence_ids, method_id_2_sentence_ids, candidate_ids
+
+    def rank_class_candidates(self, scorer, method_ids, class_sentence_ids, method_id_2_sentence_ids, class_name):
+        """
+        :param scorer: the CandidateScorer of the candidates by get_class_candidate_ids()
+        :return: the summary of the class, see get_summary()
+        """
         class_or_method_2_sentence_list = []
-        class_or_method_2_sentence = {}
-        valid_sentence_id_set = set()
-        class_or_method_2_sentence[class_name] = {}
-        for sentence_id in self.get_sentence_from_class_or_method(class_id):
-            valid_sentence_id_set.add(sentence_id)
-        self.get_one_class_or_method_2_sentence(query, class_name, valid_sentence_id_set, class_or_method_2_sentence, 0)
+        class_or_method_2_sentence = {class_name: {}}
+        self.get_one_class_or_method_2_sentence(scorer, class_name, class_sentence_ids, class_or_method_2_sentence, 0)
         class_or_method_2_sentence_list.append(class_or_method_2_sentence)
-        sorted_method_ids = self.model.search(query, 10, set(method_ids))
         class_name += '.'
-        for method_id in sorted_method_ids:
+        for method_id, method_name in scorer.top(method_ids, 3):
             class_or_method_2_sentence = {}
-            valid_sentence_id_set = set(self.get_sentence_from_class_or_method(method_id.doc_id))
-            method_name = method_id.doc_name
             try:
                 method_name = method_name.split(class_name)[1]
             except Exception as e:
                 pass
             class_or_method_2_sentence[method_name] = {}
-            self.get_one_class_or_method_2_sentence(query, method_name, valid_sentence_id_set,
-                                                    class_or_method_2_sentence,
-                                                    1)
-            count = count + 1
+            self.get_one_class_or_method_2_sentence(scorer, method_name, method_id_2_sentence_ids[method_id],
+                                                    class_or_method_2_sentence, 1)
             class_or_method_2_sentence_list.append(class_or_method_2_sentence)
-            if count > 3:
-                break
         return class_or_method_2_sentence_list
 
+    def get_name_searcher(self):
+        """
+        :return: the KGNameSearcher loaded with the search model (by the svm sub-model), None if it is not loaded
+        """
+        for sub_model in LabelPartitionIndex.get_sub_models(self.model)[0]:
+            name_searcher = getattr(sub_model, "kg_name_searcher", None)
+            if name_searcher is not None:
+                return name_searcher
+        return None
+
+    def get_class_name_index(self):
+        """
+        :return: the ClassNameIndex of all the classes with the names of the KGNameSearcher, it is built at the first
+        call
+        """
+        if self.class_name_index is None:
+            with self.class_name_index_lock:
+                if self.class_name_index is None:
+                    class_id_2_qualified_name = {class_id: self.graph_index.get_qualified_name(class_id) for class_id
+                                                 in self.graph_index.get_all_class_ids()}
+                    self.class_name_index = ClassNameIndex.build(class_id_2_qualified_name, self.get_name_searcher())
+        return self.class_name_index
+
+    def find_class(self, class_name):
+        """
+        find the class by the qualified name, if it is not found, the name is resolved by the ClassNameIndex.
+        :param class_name: the qualified name of the class, or other name of it, could be with a typo
+        :return: (the class id, the qualified name of the class), (None, class_name) if no class is found
+        """
+        class_id = self.graph_index.find_node_id_by_qualified_name(class_name)
+        if class_id is not None:
+            return class_id, class_name
+        class_id, match = self.get_class_name_index().resolve(class_name)
+        if class_id is None:
+            return None, class_name
+        return class_id, self.graph_index.get_qualified_name(class_id)
+
     def get_summary(self, query, class_name):
-        class_node_dict = self.graph_data.find_one_node_by_property('qualified_name', class_name)
-        class_id = class_node_dict['id']
-        method_id_list_2_class = self.get_method_id_from_class(class_id)
-        class_or_method_2_sentence = self.sorted_method_and_sentence_id(method_id_list_2_class, query,
-                                                                        class_id, class_name)
-        return class_or_method_2_sentence
+        with self.tracer.span("get_summary", class_name=class_name) as span:
+            with self.metrics.stage("graph_lookup"):
+                class_id, qualified_name = self.find_class(class_name)
+            if class_id is None:
+                span.set(class_found=False)
+                return None
+            if qualified_name != class_name:
+                span.set(resolved_class_name=qualified_name)
+                class_name = qualified_name
+            method_id_list_2_class = self.get_method_id_from_class(class_id)
+            span.set(method_num=len(method_id_list_2_class))
+            class_or_method_2_sentence = self.sorted_method_and_sentence_id(method_id_list_2_class, query,
+                                                                            class_id, class_name)
+            return class_or_method_2_sentence
+
+    def get_summaries(self, batch):
+        """
+        get the summaries for a batch of (query, class_name), the summary of each item is the same as get_summary().
+        each distinct query is encoded once by the label partitions, the items of the same class share the graph
+        lookups, and the candidates of the class are scored by a CandidateScorer on each encoded query.
+        :param batch: list of (query, class_name)
+        :return: list of summary in the order of the batch, the summary is None if the class is not exist
+        """
+        query_2_vectors = {}
+        with self.metrics.stage("search"):
+            for query, class_name in batch:
+                if query not in query_2_vectors:
+                    query_2_vectors[query] = self.label_partitions.encode(query)
+        class_name_2_positions = {}
+        for position, (query, class_name) in enumerate(batch):
+            class_name_2_positions.setdefault(class_name, []).append(position)
+
+        summaries = [None] * len(batch)
+        for class_name, positions in class_name_2_positions.items():
+            with self.metrics.stage("graph_lookup"):
+                class_id, class_name = self.find_class(class_name)
+            if class_id is None:
+                continue
+            method_ids = self.get_method_id_from_class(class_id)
+            class_sentence_ids, method_id_2_sentence_ids, candidate_ids = self.get_class_candidate_ids(class_id,
+                                                                                                       method_ids)
+            for position in positions:
+                query = batch[position][0]
+                with self.metrics.stage("search"):
+                    scorer = CandidateScorer.create(self.label_partitions, query, candidate_ids,
+                                                    query_vectors=query_2_vectors[query])
+                summaries[position] = self.rank_class_candidates(scorer, method_ids, class_sentence_ids,
+                                                                 method_id_2_sentence_ids, class_name)
+        return summaries
+
+    @staticmethod
+    def get_class_url(class_name):
+        return 'https://docs.oracle.com/javase/8/docs/api/' + '/'.join(class_name.split('.')) + '.html'
+
+    @staticmethod
+    def create_class_urls(class_name):
+        """
+        :return: (the url by all parts of the class name, the url by the top 4 parts of the class name)
+        """
+        url = 'https://docs.oracle.com/javase/8/docs/api'
+        split_num = 0
+        for key in class_name.split('.'):
+            split_num += 1
+            if split_num <= 4:
+                url += '/' + key
+            else:
+                url += '.' + key
+        return Summary.get_class_url(class_name), url + '.html'
+
+    def get_class_urls(self, class_id, class_name):
+        urls = self.class_id_2_urls.get(class_id, None)
+        if urls is None:
+            urls = self.create_class_urls(class_name)
+        return urls
+
+    @staticmethod
+    def get_model_bundle_dir(pro_name, version, model_dir):
+        """
+        :return: the dir of the latest model bundle built by script.model.compound.build_bundle, None if not built
+        """
+        return ModelBundle.get_current(PathUtil.model_bundle(pro_name, version, Path(model_dir).name))
 
     @staticmethod
     def create_search_model(pro_name, version, model_dir):
-        sub_search_model_config_path = model_dir / "submodel.config"
-        with open(sub_search_model_config_path, 'rb') as aq:
-            sub_search_model_config = pickle.loads(aq.read())
-        model_1 = PathUtil.sim_model(pro_name, version, "avg_w2v")
-        model_2 = PathUtil.sim_model(pro_name, version, "svm")
-        new_sub_search_model_config = [
-            (model_1, sub_search_model_config[0][1], sub_search_model_config[0][2], sub_search_model_config[0][3]),
-            (model_2, sub_search_model_config[1][1], sub_search_model_config[1][2], sub_search_model_config[1][3]),
-        ]
-        with open(sub_search_model_config_path, 'wb') as out:
-            out.write(pickle.dumps(new_sub_search_model_config))
-        model = CompoundSearchModel.load(model_dir)
-        return model
+        """
+        load the compound search model from its latest bundle, the files are only read, so many processes
+        could load it at the same time. if the bundle is not built, the model is loaded from the model dir,
+        then the dirs of the sub-models in its submodel.config must be valid.
+        """
+        bundle_dir = Summary.get_model_bundle_dir(pro_name, version, model_dir)
+        if bundle_dir is not None:
+            return ModelBundle.load(bundle_dir)
+        print("the model bundle is not built, load the model from %s" % model_dir)
+        return CompoundSearchModel.load(model_dir)
 
     @staticmethod
     def get_test_data(path):
@@ -132,14 +628,30 @@ class Summary:
         except Exception as e:
             print("exception:" + str(e))
 
+    def create_rankings(self, mode_name, context, query_vectors):
+        """
+        rank all the methods and all the sentences for the query of the context,
+        only the documents of the method and sentence partitions are scored.
+        :param mode_name: the summary mode name, see score_partition()
+        :param context: the SummaryRequestContext
+        :param query_vectors: the query encoded by self.label_partitions.encode()
+        """
+        context.method_ranking = LazyRanking(
+            self.model, context.query, self.method_candidates,
+            valid_scores=self.score_partition(mode_name, context.query, query_vectors, "method"))
+        context.sentence_ranking = LazyRanking(
+            self.model, context.query, self.sentence_candidates,
+            valid_scores=self.score_partition(mode_name, context.query, query_vectors, "sentence"))
+
     def get_summary_only_query(self, query, number):
+        context = SummaryRequestContext(query)
         all_class_2_summary = {}
         class_id_2_method_ids = {}
         class_and_method_ids = []
-        method_and_sentence_ids = []
-        valid_class_ids = self.graph_data.get_node_ids_by_label("class") - self.graph_data.get_node_ids_by_label(
-            "class type")
-        sorted_class_ids = self.model.search(query, number, valid_class_ids)
+        with self.metrics.stage("search"):
+            query_vectors = self.label_partitions.encode(query)
+            class_scores = self.score_partition("get_summary_only_query", query, query_vectors, "class")
+            sorted_class_ids = self.label_partitions.search(query, "class", number, scores=class_scores)
         count_class = 0
         for sorted_class_id in sorted_class_ids:
             if count_class > number - 1:
@@ -147,113 +659,51 @@ class Summary:
             class_id = sorted_class_id.doc_id
             class_and_method_ids.append(class_id)
             class_id_2_method_ids[class_id] = self.get_method_id_from_class(class_id)
-            method_and_sentence_ids += class_id_2_method_ids[class_id]
             class_and_method_ids += class_id_2_method_ids[class_id]
         for class_or_method_id in class_and_method_ids:
-            self.class_or_method_2_sentence_ids[class_or_method_id] = self.get_sentence_from_class_or_method(
+            context.class_or_method_2_sentence_ids[class_or_method_id] = self.get_sentence_from_class_or_method(
                 class_or_method_id)
-            method_and_sentence_ids += self.class_or_method_2_sentence_ids[class_or_method_id]
-        sorted_method_and_sentence_ids = self.model.search(query, len(method_and_sentence_ids), method_and_sentence_ids)
-        number = 1
-        for item in sorted_method_and_sentence_ids:
-            self.sorted_method_and_sentence_id_dict[item.doc_id] = number
-            number += 1
+        with self.metrics.stage("rank"):
+            self.create_rankings("get_summary_only_query", context, query_vectors)
         index = 0
         for class_id in list(class_id_2_method_ids.keys()):
             all_class_2_summary[index] = []
-            class_node = self.graph_data.find_nodes_by_ids(class_id)
-            class_name = class_node[0]['properties']['qualified_name']
+            class_name = self.graph_index.get_qualified_name(class_id)
             class_name_1 = class_name + '.'
-            method_num_2_id = {}
-            method_nums = []
             method_ids = class_id_2_method_ids[class_id]
             class_or_method_2_sentence = {class_name: {}}
-            class_or_method_2_sentence[class_name]['url'] = 'https://docs.oracle.com/javase/8/docs/api'
-            split_name = class_name.split('.')
-            for key in split_name:
-                class_or_method_2_sentence[class_name]['url'] += '/' + key
-            class_or_method_2_sentence[class_name]['url'] += '.html'
+            class_or_method_2_sentence[class_name]['url'] = self.get_class_urls(class_id, class_name)[0]
             class_or_method_2_sentence[class_name]['sentence'] = []
-            self.create_class_or_method_2_sentence(class_id, class_name, class_or_method_2_sentence)
+            self.create_class_or_method_2_sentence(context, class_id, class_name, class_or_method_2_sentence)
             all_class_2_summary[index].append(class_or_method_2_sentence)
-            for method_id in method_ids:
-                method_num_2_id[self.sorted_method_and_sentence_id_dict[method_id]] = method_id
-                method_nums.append(self.sorted_method_and_sentence_id_dict[method_id])
-            method_nums.sort()
-            if len(method_nums) > 3:
-                count_method = 0
-                for method_num in method_nums:
-                    if count_method >= 3:
-                        break
-                    count_method += 1
-                    method_id = method_num_2_id[method_num]
-                    method_node = self.graph_data.find_nodes_by_ids(method_id)
-                    method_name = method_node[0]['properties']['qualified_name']
-                    method_name = method_name.split(class_name_1)[1]
-                    class_or_method_2_sentence = {method_name: {}}
-                    class_or_method_2_sentence[method_name]['url'] = ''
-                    self.create_class_or_method_2_sentence(method_id, method_name, class_or_method_2_sentence)
-                    all_class_2_summary[index].append(class_or_method_2_sentence)
-            else:
-                for method_num in method_nums:
-                    method_id = method_num_2_id[method_num]
-                    method_node = self.graph_data.find_nodes_by_ids(method_id)
-                    method_name = method_node[0]['properties']['qualified_name']
-                    method_name = method_name.split(class_name_1)[1]
-                    class_or_method_2_sentence = {method_name: {}}
-                    class_or_method_2_sentence[method_name]['url'] = ''
-                    self.create_class_or_method_2_sentence(method_id, method_name, class_or_method_2_sentence)
-                    all_class_2_summary[index].append(class_or_method_2_sentence)
+            for method_id in context.method_ranking.sort(method_ids, 3):
+                method_name = self.graph_index.get_qualified_name(method_id)
+                method_name = method_name.split(class_name_1)[1]
+                class_or_method_2_sentence = {method_name: {}}
+                class_or_method_2_sentence[method_name]['url'] = ''
+                self.create_class_or_method_2_sentence(context, method_id, method_name, class_or_method_2_sentence)
+                all_class_2_summary[index].append(class_or_method_2_sentence)
             index += 1
         return all_class_2_summary
 
-    def create_class_or_method_2_sentence(self, class_or_method_id, name, class_or_method_2_sentence):
+    def create_class_or_method_2_sentence(self, context, class_or_method_id, name, class_or_method_2_sentence):
         class_or_method_2_sentence[name]['sentence'] = []
-        sentence_num_2_id = {}
-        sentence_nums = []
-        for sentence_id in self.class_or_method_2_sentence_ids[class_or_method_id]:
-            sentence_num_2_id[self.sorted_method_and_sentence_id_dict[sentence_id]] = sentence_id
-            sentence_nums.append(self.sorted_method_and_sentence_id_dict[sentence_id])
-        sentence_nums.sort()
-        if len(sentence_nums) > 3:
-            count_sentence = 0
-            for sentence_num in sentence_nums:
-                if count_sentence >= 3:
-                    break
-                count_sentence += 1
-                sentence_id = sentence_num_2_id[sentence_num]
-                sentence_name = self.graph_data.find_nodes_by_ids(sentence_id)[0]['properties']['sentence_name']
-                class_or_method_2_sentence[name]['sentence'].append(sentence_name)
-        else:
-            for sentence_num in sentence_nums:
-                sentence_id = sentence_num_2_id[sentence_num]
-                sentence_name = self.graph_data.find_nodes_by_ids(sentence_id)[0]['properties']['sentence_name']
-                class_or_method_2_sentence[name]['sentence'].append(sentence_name)
+        sentence_ids = context.class_or_method_2_sentence_ids[class_or_method_id]
+        for sentence_id in context.sentence_ranking.sort(sentence_ids, 3):
+            sentence_name = self.graph_index.get_sentence_name(sentence_id)
+            class_or_method_2_sentence[name]['sentence'].append(sentence_name)
 
     def get_summary_only_query_by_sentence(self, query, number):
-        self.class_or_method_2_sentence_ids = {}
-        self.sorted_method_and_sentence_id_dict = {}
-        self.all_class_summary = {}
-        self.sort_method_ids = []
-        self.sort_sentence_ids = []
+        context = SummaryRequestContext(query)
         method_ids = []
         class_ids = []
         count = 0
-        all_method_ids = self.graph_data.get_node_ids_by_label("method")
-        all_method_ids.update(self.graph_data.get_node_ids_by_label("base override method"))
-        constructor_method_ids = self.graph_data.get_node_ids_by_label("construct method")
-        valid_method_ids = all_method_ids - constructor_method_ids
-        sort_method_document_ids = self.model.search(query, len(valid_method_ids), valid_method_ids)
-        for item in sort_method_document_ids:
-            self.sort_method_ids.append(item.doc_id)
-        valid_sentence_ids = self.graph_data.get_node_ids_by_label("sentence")
-        sort_sentence_document_ids = self.model.search(query, len(valid_sentence_ids), valid_sentence_ids)
-        for item in sort_sentence_document_ids:
-            self.sort_sentence_ids.append(item.doc_id)
-        for sentence_id in self.sort_sentence_ids:
+        with self.metrics.stage("rank"):
+            self.create_rankings("get_summary_only_query_by_sentence", context, self.label_partitions.encode(query))
+        for sentence_id in context.sentence_ranking:
             if count >= number:
                 break
-            method_ids_by_sentence_id = self.get_method_ids_sort_by_sentence_id(sentence_id, method_ids)
+            method_ids_by_sentence_id = self.get_method_ids_sort_by_sentence_id(context, sentence_id, method_ids)
             method_ids += method_ids_by_sentence_id
             for method_id in method_ids_by_sentence_id:
                 class_id = self.get_class_id_from_method(method_id)
@@ -261,132 +711,73 @@ class Summary:
                     if count >= number:
                         break
                     class_ids.append(class_id)
-                    self.get_single_summary(class_id, count)
+                    with self.metrics.stage("assemble"):
+                        self.get_single_summary(context, class_id, count)
                     count += 1
-        return self.all_class_summary
+        return context.all_class_summary
 
-    def get_method_ids_sort_by_sentence_id(self, sentence_id, have_method_ids=[]):
-        try:
-            method_ids = []
-            relations = self.graph_data.get_all_in_relations(sentence_id)
-            method_relation_class = ["has sentence"]
-            for re in relations:
-                if re[1] in method_relation_class:
-                    method_id = re[0]
-                    if sentence_id == method_id:
-                        method_id = re[0]
-                    if method_id not in self.sort_method_ids or method_id in have_method_ids:
-                        continue
-                    method_ids.append(method_id)
-            return method_ids
-        except Exception as e:
-            print("exception:" + str(e))
-            return -1
+    def get_method_ids_sort_by_sentence_id(self, context, sentence_id, have_method_ids=[]):
+        method_ids = []
+        for method_id in self.graph_index.get_sentence_owner_ids(sentence_id):
+            if method_id not in context.method_ranking or method_id in have_method_ids:
+                continue
+            method_ids.append(method_id)
+        return method_ids
 
     def get_summary_only_query_by_method(self, query, number):
-        self.class_or_method_2_sentence_ids = {}
-        self.sorted_method_and_sentence_id_dict = {}
-        self.all_class_summary = {}
-        self.sort_method_ids = []
-        self.sort_sentence_ids = []
+        return dict(self.iter_summary_only_query_by_method(query, number))
+
+    def iter_summary_only_query_by_method(self, query, number):
+        """
+        the generator version of get_summary_only_query_by_method, each class summary is yielded as soon as
+        its methods and sentences are ranked, and it is not kept after yielded.
+        :param query: the query
+        :param number: the max number of classes
+        :return: generator of (index of the class, the summary of the class and its methods)
+        """
+        context = SummaryRequestContext(query)
         class_ids = []
         count = 0
-        all_method_ids = self.graph_data.get_node_ids_by_label("method")
-        all_method_ids.update(self.graph_data.get_node_ids_by_label("base override method"))
-        constructor_method_ids = self.graph_data.get_node_ids_by_label("construct method")
-        valid_method_ids = all_method_ids - constructor_method_ids
-        sort_method_document_ids = self.model.search(query, len(valid_method_ids), valid_method_ids)
-        for item in sort_method_document_ids:
-            self.sort_method_ids.append(item.doc_id)
-        valid_sentence_ids = self.graph_data.get_node_ids_by_label("sentence")
-        sort_sentence_document_ids = self.model.search(query, len(valid_sentence_ids), valid_sentence_ids)
-        for item in sort_sentence_document_ids:
-            self.sort_sentence_ids.append(item.doc_id)
-        for method_id in self.sort_method_ids:
+        with self.metrics.stage("rank"):
+            self.create_rankings("get_summary_only_query_by_method", context, self.label_partitions.encode(query))
+        for method_id in context.method_ranking:
             class_id = self.get_class_id_from_method(method_id)
             if class_id not in class_ids:
                 if count >= number:
                     break
                 class_ids.append(class_id)
-                self.get_single_summary(class_id, count)
+                with self.metrics.stage("assemble"):
+                    self.get_single_summary(context, class_id, count)
+                yield count, context.all_class_summary.pop(count)
                 count += 1
-        return self.all_class_summary
 
-    def get_single_summary(self, class_id, count=0):
-        self.all_class_summary[count] = []
+    def get_single_summary(self, context, class_id, count=0):
+        context.all_class_summary[count] = []
         class_2_method_ids = self.get_method_id_from_class(class_id)
         class_2_sentence_ids = self.get_sentence_from_class_or_method(class_id)
-        class_node = self.graph_data.find_nodes_by_ids(class_id)
-        class_name = class_node[0]['properties']['qualified_name']
+        class_name = self.graph_index.get_qualified_name(class_id)
         class_name_need_2_split = class_name + '.'
         class_2_sentence = {class_name: {}}
-        class_2_sentence[class_name]['url'] = 'https://docs.oracle.com/javase/8/docs/api'
-        split_name = class_name.split('.')
-        split_num = 0
-        for key in split_name:
-            split_num += 1
-            if split_num <= 4:
-                class_2_sentence[class_name]['url'] += '/' + key
-            else:
-                class_2_sentence[class_name]['url'] += '.' + key
-        class_2_sentence[class_name]['url'] += '.html'
+        class_2_sentence[class_name]['url'] = self.get_class_urls(class_id, class_name)[1]
         class_2_sentence[class_name]['sentence'] = []
-        class_2_sentence = self.get_sentence_sort(class_2_sentence_ids, class_name, class_2_sentence)
-        self.all_class_summary[count].append(class_2_sentence)
-        class_method_dict_rank = {}
-        method_rank_list = []
-        for method_id in class_2_method_ids:
-            class_method_dict_rank[self.sort_method_ids.index(method_id)] = method_id
-            method_rank_list.append(self.sort_method_ids.index(method_id))
-        method_rank_list.sort()
-        if len(method_rank_list) > 3:
-            method_num = 3
-        else:
-            method_num = len(method_rank_list)
-        for method_num in range(method_num):
-            method_id = class_method_dict_rank[method_rank_list[method_num]]
-            method_node = self.graph_data.find_nodes_by_ids(method_id)
-            method_name = method_node[0]['properties']['qualified_name']
+        class_2_sentence = self.get_sentence_sort(context, class_2_sentence_ids, class_name, class_2_sentence)
+        context.all_class_summary[count].append(class_2_sentence)
+        for method_id in context.method_ranking.sort(class_2_method_ids, 3):
+            method_name = self.graph_index.get_qualified_name(method_id)
             method_name = method_name.split(class_name_need_2_split)[1]
             method_2_sentence = {method_name: {}}
             method_2_sentence[method_name]['url'] = ''
             method_2_sentence[method_name]['sentence'] = []
             method_2_sentence_ids = self.get_sentence_from_class_or_method(method_id)
-            method_2_sentence = self.get_sentence_sort(method_2_sentence_ids, method_name, method_2_sentence)
-            self.all_class_summary[count].append(method_2_sentence)
-
-    def get_sentence_sort(self, class_or_method_2_sentence_ids, class_or_method_name, class_or_method_2_sentence):
-        class_or_method_sentence_dict_rank = {}
-        sentence_rank_list = []
-        for sentence_id in class_or_method_2_sentence_ids:
-            class_or_method_sentence_dict_rank[self.sort_sentence_ids.index(sentence_id)] = sentence_id
-            sentence_rank_list.append(self.sort_sentence_ids.index(sentence_id))
-        sentence_rank_list.sort()
-        if len(sentence_rank_list) > 3:
-            sentence_num = 3
-        else:
-            sentence_num = len(sentence_rank_list)
-        for num in range(sentence_num):
-            sentence_name = \
-                self.graph_data.find_nodes_by_ids(class_or_method_sentence_dict_rank[sentence_rank_list[num]])[0][
-                    'properties']['sentence_name']
+            method_2_sentence = self.get_sentence_sort(context, method_2_sentence_ids, method_name, method_2_sentence)
+            context.all_class_summary[count].append(method_2_sentence)
+
+    def get_sentence_sort(self, context, class_or_method_2_sentence_ids, class_or_method_name,
+                          class_or_method_2_sentence):
+        for sentence_id in context.sentence_ranking.sort(class_or_method_2_sentence_ids, 3):
+            sentence_name = self.graph_index.get_sentence_name(sentence_id)
             class_or_method_2_sentence[class_or_method_name]['sentence'].append(sentence_name)
         return class_or_method_2_sentence
 
     def get_class_id_from_method(self, method_id):
-        try:
-            class_id = -1
-            relations = self.graph_data.get_all_out_relations(method_id)
-            method_relation_class = ["belong to"]
-            for re in relations:
-                if re[1] in method_relation_class:
-                    class_id = re[2]
-                    if method_id == class_id:
-                        class_id = re[0]
-                    node_dict = self.graph_data.get_node_info_dict(class_id)
-                    if "class" in node_dict["labels"]:
-                        return class_id
-            return class_id
-        except Exception as e:
-            print("exception:" + str(e))
-            return -1
+        return self.graph_index.get_class_id(method_id)
@@ -0,0 +1,258 @@
+import sys
+
+import numpy as np
+from sekg.graph.exporter.graph_data import GraphData
+
+from graph.csr_graph import CSRGraphData
+from util.mmap_util import MmapUtil, MmapStringArray
+
+
+class SummaryGraphIndex:
+    """
+    a read-only adjacency index over the graph data, built once and used for serving the summary.
+    it keeps class->methods (the construct method are already filtered out), method->class,
+    node->"has sentence" children and sentence->owners as integer arrays,
+    so the summary could get the neighbours of a node without scanning its relations.
+    it also keeps the node ids of the labels and the names of the nodes used by the summary,
+    so the summary could be served without the graph data.
+    it is built from the GraphData or its frozen view CSRGraphData, the relations of a type and the nodes of a
+    label are got from the arrays of the CSRGraphData instead of the networkx graph.
+    the index could be saved as flat files and loaded memory-mapped, see save() and load().
+    """
+    RELATION_HAS_SENTENCE = "has sentence"
+    RELATION_BELONG_TO = "belong to"
+
+    LABEL_CLASS = "class"
+    LABEL_METHOD = "method"
+    LABEL_BASE_OVERRIDE_METHOD = "base override method"
+    LABEL_CONSTRUCT_METHOD = "construct method"
+    LABEL_CLASS_TYPE = "class type"
+    LABEL_SENTENCE = "sentence"
+
+    PROPERTY_QUALIFIED_NAME = "qualified_name"
+    PROPERTY_SENTENCE_NAME = "sentence_name"
+
+    NOT_EXIST_ID = -1
+
+    ARRAY_NAMES = ["node_ids", "method_2_class",
+                   "class_2_method_offsets", "class_2_method_ids",
+                   "node_2_sentence_offsets", "node_2_sentence_ids",
+                   "sentence_2_owner_offsets", "sentence_2_owner_ids",
+                   "all_class_ids", "all_method_ids", "all_sentence_ids",
+                   "qualified_name_order"]
+    STRING_ARRAY_NAMES = ["qualified_names", "sentence_names"]
+
+    def __init__(self, graph_data: GraphData or CSRGraphData):
+        node_ids = sorted(graph_data.get_node_ids())
+        self.node_ids = np.array(node_ids, dtype=np.int64)
+        node_id_2_position = {node_id: position for position, node_id in enumerate(node_ids)}
+
+        valid_method_ids = set(graph_data.get_node_ids_by_label(self.LABEL_METHOD))
+        valid_method_ids.update(graph_data.get_node_ids_by_label(self.LABEL_BASE_OVERRIDE_METHOD))
+        valid_method_ids = valid_method_ids - graph_data.get_node_ids_by_label(self.LABEL_CONSTRUCT_METHOD)
+        class_ids = graph_data.get_node_ids_by_label(self.LABEL_CLASS)
+
+        class_2_method_pairs = []
+        method_2_class = np.full(len(node_ids), self.NOT_EXIST_ID, dtype=np.int64)
+        for start_id, relation_type, end_id in graph_data.get_relations(relation_type=self.RELATION_BELONG_TO):
+            if start_id in valid_method_ids:
+                class_2_method_pairs.append((end_id, start_id))
+            start_position = node_id_2_position[start_id]
+            # the class is preferred, otherwise any node the method belong to is kept
+            if end_id in class_ids or method_2_class[start_position] == self.NOT_EXIST_ID:
+                method_2_class[start_position] = end_id
+        self.method_2_class = method_2_class
+
+        node_2_sentence_pairs = []
+        sentence_2_owner_pairs = []
+        for start_id, relation_type, end_id in graph_data.get_relations(relation_type=self.RELATION_HAS_SENTENCE):
+            node_2_sentence_pairs.append((start_id, end_id))
+            sentence_2_owner_pairs.append((end_id, start_id))
+
+        self.class_2_method_offsets, self.class_2_method_ids = self.__build_adjacency(class_2_method_pairs,
+                                                                                     node_id_2_position)
+        self.node_2_sentence_offsets, self.node_2_sentence_ids = self.__build_adjacency(node_2_sentence_pairs,
+                                                                                       node_id_2_position)
+        self.sentence_2_owner_offsets, self.sentence_2_owner_ids = self.__build_adjacency(sentence_2_owner_pairs,
+                                                                                         node_id_2_position)
+
+        self.all_class_ids = self.__sorted_ids(
+            graph_data.get_node_ids_by_label(self.LABEL_CLASS) - graph_data.get_node_ids_by_label(self.LABEL_CLASS_TYPE))
+        self.all_method_ids = self.__sorted_ids(valid_method_ids)
+        self.all_sentence_ids = self.__sorted_ids(graph_data.get_node_ids_by_label(self.LABEL_SENTENCE))
+
+        self.qualified_names = []
+        self.sentence_names = []
+        for node_id in node_ids:
+            properties = graph_data.get_node_info_dict(node_id)["properties"]
+            self.qualified_names.append(str(properties.get(self.PROPERTY_QUALIFIED_NAME, "")))
+            self.sentence_names.append(str(properties.get(self.PROPERTY_SENTENCE_NAME, "")))
+        # the positions of the nodes having qualified name, sorted by the qualified name for binary search
+        qualified_name_positions = [position for position, name in enumerate(self.qualified_names) if name != ""]
+        qualified_name_positions.sort(key=lambda position: (self.qualified_names[position], position))
+        self.qualified_name_order = np.array(qualified_name_positions, dtype=np.int64)
+
+    @staticmethod
+    def __sorted_ids(node_ids):
+        return np.array(sorted(node_ids), dtype=np.int64)
+
+    def __build_adjacency(self, pairs, node_id_2_position):
+        """
+        build the adjacency for (node_id, neighbour_id) pairs.
+        the neighbours of the node at position p are neighbour_ids[offsets[p]:offsets[p + 1]].
+        :param pairs: list of (node_id, neighbour_id)
+        :param node_id_2_position: node id -> the position of the node in node_ids
+        :return: (offsets, neighbour_ids), both are integer numpy arrays
+        """
+        pairs = sorted(set(pairs), key=lambda pair: (node_id_2_position[pair[0]], pair[1]))
+        counts = np.zeros(len(self.node_ids), dtype=np.int64)
+        for node_id, neighbour_id in pairs:
+            counts[node_id_2_position[node_id]] += 1
+        offsets = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        neighbour_ids = np.array([neighbour_id for node_id, neighbour_id in pairs], dtype=np.int64)
+        return offsets, neighbour_ids
+
+    def save(self, dir_path):
+        """
+        save the index as flat files in the dir, they could be loaded memory-mapped by load().
+        :param dir_path: the dir of the files
+        """
+        for name in self.ARRAY_NAMES:
+            MmapUtil.save_array(dir_path, name, getattr(self, name))
+        for name in self.STRING_ARRAY_NAMES:
+            MmapUtil.save_strings(dir_path, name, getattr(self, name))
+
+    @staticmethod
+    def load(dir_path):
+        """
+        load the index saved by save(), all the arrays are memory-mapped and read-only,
+        so the processes loading the same index share one copy in the page cache.
+        :param dir_path: the dir of the files
+        :return: the SummaryGraphIndex
+        """
+        index = SummaryGraphIndex.__new__(SummaryGraphIndex)
+        for name in SummaryGraphIndex.ARRAY_NAMES:
+            setattr(index, name, MmapUtil.load_array(dir_path, name))
+        for name in SummaryGraphIndex.STRING_ARRAY_NAMES:
+            setattr(index, name, MmapUtil.load_strings(dir_path, name))
+        return index
+
+    def get_array_bytes(self):
+        """
+        :return: the bytes of the arrays and the names of the index, the memory-mapped ones are counted in full
+        """
+        array_bytes = sum(getattr(self, name).nbytes for name in self.ARRAY_NAMES)
+        for name in self.STRING_ARRAY_NAMES:
+            strings = getattr(self, name)
+            if isinstance(strings, MmapStringArray):
+                array_bytes += strings.offsets.nbytes + strings.data.nbytes
+            else:
+                array_bytes += sys.getsizeof(strings) + sum(sys.getsizeof(string) for string in strings)
+        return array_bytes
+
+    def __get_position(self, node_id):
+        """
+        :return: the position of the node in node_ids, None if the node is not exist
+        """
+        position = int(np.searchsorted(self.node_ids, node_id))
+        if position < len(self.node_ids) and self.node_ids[position] == node_id:
+            return position
+        return None
+
+    def __get_neighbours(self, node_id, offsets, neighbour_ids):
+        position = self.__get_position(node_id)
+        if position is None:
+            return []
+        return neighbour_ids[offsets[position]:offsets[position + 1]].tolist()
+
+    def get_method_ids(self, class_id):
+        """
+        get the methods belong to the class, the construct method are not included.
+        :param class_id: the node id of the class
+        :return: list of method id
+        """
+        return self.__get_neighbours(class_id, self.class_2_method_offsets, self.class_2_method_ids)
+
+    def get_sentence_ids(self, node_id):
+        """
+        get the sentences of the class or method, i.e. the end of its "has sentence" relations.
+        :param node_id: the node id of the class or method
+        :return: list of sentence id
+        """
+        return self.__get_neighbours(node_id, self.node_2_sentence_offsets, self.node_2_sentence_ids)
+
+    def get_sentence_owner_ids(self, sentence_id):
+        """
+        get the nodes having this sentence, i.e. the start of its "has sentence" relations.
+        :param sentence_id: the node id of the sentence
+        :return: list of node id
+        """
+        return self.__get_neighbours(sentence_id, self.sentence_2_owner_offsets, self.sentence_2_owner_ids)
+
+    def get_class_id(self, method_id):
+        """
+        get the class the method belong to.
+        :param method_id: the node id of the method
+        :return: the class id, -1 if the method doesn't belong to any node
+        """
+        position = self.__get_position(method_id)
+        if position is None:
+            return self.NOT_EXIST_ID
+        return int(self.method_2_class[position])
+
+    def get_all_class_ids(self):
+        """
+        :return: list of the id of all class, the "class type" nodes are not included
+        """
+        return self.all_class_ids.tolist()
+
+    def get_all_method_ids(self):
+        """
+        :return: list of the id of all method and base override method, the construct method are not included
+        """
+        return self.all_method_ids.tolist()
+
+    def get_all_sentence_ids(self):
+        """
+        :return: list of the id of all sentence
+        """
+        return self.all_sentence_ids.tolist()
+
+    def get_qualified_name(self, node_id):
+        """
+        :return: the qualified name of the class or method, None if the node is not exist
+        """
+        position = self.__get_position(node_id)
+        if position is None:
+            return None
+        return self.qualified_names[position]
+
+    def get_sentence_name(self, sentence_id):
+        """
+        :return: the text of the sentence, None if the node is not exist
+        """
+        position = self.__get_position(sentence_id)
+        if position is None:
+            return None
+        return self.sentence_names[position]
+
+    def find_node_id_by_qualified_name(self, qualified_name):
+        """
+        find the node by the qualified name with binary search, the node with smaller id is preferred.
+        :param qualified_name: the qualified name of the class or method
+        :return: the node id, None if no node has the qualified name
+        """
+        low = 0
+        high = len(self.qualified_name_order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.qualified_names[self.qualified_name_order[middle]] < qualified_name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.qualified_name_order):
+            position = self.qualified_name_order[low]
+            if self.qualified_names[position] == qualified_name:
+                return int(self.node_ids[position])
+        return None
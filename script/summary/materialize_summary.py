@@ -0,0 +1,159 @@
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+from script.summary.generate_summary import Summary
+from service.app import QUERY_ONLY_MODE_NAME, CLASS_NUMBER
+from service.summary_cache import SummaryResultCache
+from service.summary_store import SummaryStore
+from util.path_util import PathUtil
+
+"""
+materialize the summaries of the hot queries into the SummaryStore, run.py serves them from the store before
+computing a summary. the queries are replayed through the Summary by a process pool, each worker loads the summary
+by Summary.load() like run.py, so the summaries are keyed by the same graph and model version as the service.
+the query list is a text file with one query per line, each query is summarized by every mode of --modes,
+or a jsonl file of {"mode": ..., "query": ..., "class_name_or_number": ...} like the query set of
+script.benchmark.load_test. run it again after the graph data or the model is rebuilt.
+
+    python -m script.summary.materialize_summary --query-list hot_queries.txt --processes 8
+"""
+
+# the summary loaded by each worker process
+worker_summary = None
+
+
+def init_worker(load_summary):
+    global worker_summary
+    worker_summary = load_summary()
+
+
+def materialize_one(request):
+    """
+    :param request: (summary mode, query, class name or class number)
+    :return: (the key, the encoded summary or None if the class is not found, the seconds of the summary)
+    """
+    key = SummaryResultCache.make_key(worker_summary, *request)
+    start = time.perf_counter()
+    result = getattr(worker_summary, key[1])(key[2], key[3])
+    cost = time.perf_counter() - start
+    if result is None:
+        return key, None, cost
+    return key, SummaryStore.encode_summary(result), cost
+
+
+def load_requests(query_list_path, mode_names, class_number):
+    """
+    :return: list of (summary mode, normalized query, class name or class number), the duplicate ones are removed
+    """
+    requests = []
+    with open(str(query_list_path)) as f:
+        for line in f:
+            line = line.strip()
+            if line == "":
+                continue
+            if line.startswith("{"):
+                request = json.loads(line)
+                requests.append((request["mode"], request["query"], request["class_name_or_number"]))
+                continue
+            requests.extend((mode_name, line, class_number) for mode_name in mode_names)
+    unique_requests = []
+    request_set = set()
+    for mode_name, query, class_name_or_number in requests:
+        if isinstance(class_name_or_number, str):
+            class_name_or_number = class_name_or_number.strip()
+        request = (mode_name, SummaryResultCache.normalize_query(query), class_name_or_number)
+        if request[1] != "" and request not in request_set:
+            request_set.add(request)
+            unique_requests.append(request)
+    return unique_requests
+
+
+def materialize(load_summary, requests, store_path, process_num, chunk_size=8, commit_size=256):
+    """
+    replay the requests by a process pool and write their summaries into the store.
+    :param load_summary: the function loading the summary in each worker, it must be picklable
+    :param requests: list of (summary mode, query, class name or class number)
+    :param store_path: the path of the sqlite file of the SummaryStore
+    :param process_num: the number of the worker processes
+    :param chunk_size: the number of requests sent to a worker at a time
+    :param commit_size: the number of summaries written in one transaction
+    :return: the report of the throughput and the store
+    """
+    store = SummaryStore(store_path, read_only=False)
+    materialized_num = 0
+    missing_num = 0
+    summary_seconds = 0.0
+    key_data_list = []
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    with context.Pool(process_num, initializer=init_worker, initargs=(load_summary,)) as pool:
+        first_result_time = None
+        for key, data, cost in pool.imap_unordered(materialize_one, requests, chunksize=chunk_size):
+            if first_result_time is None:
+                first_result_time = time.perf_counter()
+            summary_seconds += cost
+            if data is None:
+                missing_num += 1
+                continue
+            key_data_list.append((key, data))
+            materialized_num += 1
+            if len(key_data_list) >= commit_size:
+                store.put_many(key_data_list)
+                key_data_list = []
+                print("materialized %d/%d summaries" % (materialized_num + missing_num, len(requests)))
+    store.put_many(key_data_list)
+    end = time.perf_counter()
+    serving_seconds = end - first_result_time if first_result_time is not None else 0.0
+    report = {
+        "request_num": len(requests),
+        "materialized_num": materialized_num,
+        # the class of get_summary is not found
+        "missing_num": missing_num,
+        "process_num": process_num,
+        "seconds": end - start,
+        "requests_per_second": len(requests) / (end - start),
+        # since the first summary, without loading the summary in the workers
+        "serving_requests_per_second": len(requests) / serving_seconds if serving_seconds > 0 else 0.0,
+        "avg_summary_ms": 1000 * summary_seconds / max(len(requests), 1),
+        "store": store.get_statistics(),
+    }
+    store.close()
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="materialize the summaries of the hot queries for run.py")
+    parser.add_argument("--query-list", required=True, help="the text file of queries or the jsonl file of requests")
+    parser.add_argument("--pro-name", default="jdk8")
+    parser.add_argument("--version", default="v3_1")
+    parser.add_argument("--model", default="compound_{base_model}+{extra_model}".format(base_model="avg_w2v",
+                                                                                        extra_model="svm"))
+    parser.add_argument("--modes", default=QUERY_ONLY_MODE_NAME,
+                        help="the query-only modes for the text query list, separated by comma: %s, the default "
+                             "is the mode of /createAPISummary/" % ",".join(Summary.QUERY_ONLY_MODE_NAMES))
+    parser.add_argument("--class-number", type=int, default=CLASS_NUMBER)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--store", default=None, help="the sqlite file, the default is the one read by run.py")
+    args = parser.parse_args()
+    args.mode_names = [mode.strip() for mode in args.modes.split(",")]
+    for mode_name in args.mode_names:
+        if mode_name not in Summary.QUERY_ONLY_MODE_NAMES:
+            parser.error("%s is not a query-only mode" % mode_name)
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    model_dir = PathUtil.sim_model(pro_name=args.pro_name, version=args.version, model_type=args.model)
+    store_path = args.store or PathUtil.summary_store(pro_name=args.pro_name, version=args.version,
+                                                      model_type=args.model)
+    requests = load_requests(Path(args.query_list), args.mode_names, args.class_number)
+    print("materialize %d summaries into %s by %d processes" % (len(requests), store_path, args.processes))
+    report = materialize(functools.partial(Summary.load, args.pro_name, args.version, model_dir), requests,
+                         store_path, args.processes)
+    print(json.dumps(report, indent=4))
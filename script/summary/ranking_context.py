@@ -0,0 +1,72 @@
+class RankingContext:
+    """
+    the ranking of the documents searched for one query.
+    each doc id is mapped to its ranking, so getting the ranking of a method or sentence is O(1)
+    instead of list.index() over the ranking of the whole corpus.
+    the doc not in the ranking (e.g. it is not in the document collection of the model) has no ranking,
+    and it is ignored when sorting.
+    """
+
+    def __init__(self, ranked_doc_ids=None):
+        """
+        :param ranked_doc_ids: the doc ids sorted by the score from high to low
+        """
+        self.ranked_doc_ids = []
+        self.doc_id_2_ranking = {}
+        if ranked_doc_ids is not None:
+            for doc_id in ranked_doc_ids:
+                self.append(doc_id)
+
+    @staticmethod
+    def from_retrieval_results(retrieval_results):
+        """
+        create the ranking context from the result of model.search()
+        :param retrieval_results: list of DocRetrievalResult sorted by score
+        :return: RankingContext
+        """
+        return RankingContext([item.doc_id for item in retrieval_results])
+
+    def append(self, doc_id):
+        """
+        add a doc after all ranked docs, the doc already ranked keeps its ranking.
+        :param doc_id: the doc id
+        :return: the ranking of this doc, start from 0
+        """
+        ranking = self.doc_id_2_ranking.get(doc_id, None)
+        if ranking is None:
+            ranking = len(self.ranked_doc_ids)
+            self.ranked_doc_ids.append(doc_id)
+            self.doc_id_2_ranking[doc_id] = ranking
+        return ranking
+
+    def get_ranking(self, doc_id):
+        """
+        :param doc_id: the doc id
+        :return: the ranking of the doc start from 0, None if the doc is not ranked
+        """
+        return self.doc_id_2_ranking.get(doc_id, None)
+
+    def sort(self, doc_ids, top_num=0):
+        """
+        sort the doc ids by their ranking, the doc not ranked are removed.
+        :param doc_ids: the doc ids need to sort
+        :param top_num: the max number of returned doc ids, if top_num=0, return all ranked doc ids
+        :return: list of doc id
+        """
+        ranked_doc_ids = [doc_id for doc_id in set(doc_ids) if doc_id in self.doc_id_2_ranking]
+        ranked_doc_ids.sort(key=self.doc_id_2_ranking.__getitem__)
+        if top_num > 0:
+            return ranked_doc_ids[:top_num]
+        return ranked_doc_ids
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_id_2_ranking
+
+    def __iter__(self):
+        return iter(self.ranked_doc_ids)
+
+    def __len__(self):
+        return len(self.ranked_doc_ids)
+
+    def __repr__(self):
+        return "<RankingContext num=%d>" % len(self.ranked_doc_ids)
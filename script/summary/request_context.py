@@ -0,0 +1,22 @@
+from script.summary.ranking_context import RankingContext
+
+
+class SummaryRequestContext:
+    """
+    the state of one summary request.
+    the Summary only keeps the graph and the search model, which are read-only and shared by all requests,
+    everything computed for a query is kept here, so the requests could be served by many threads at the same time.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        # class or method id -> the sentence ids of it
+        self.class_or_method_2_sentence_ids = {}
+        # the ranking of all the methods and all the sentences, used by the query-only summaries
+        self.method_ranking = RankingContext()
+        self.sentence_ranking = RankingContext()
+        # the index of class -> the summary of the class and its methods
+        self.all_class_summary = {}
+
+    def __repr__(self):
+        return "<SummaryRequestContext query=%r class_num=%d>" % (self.query, len(self.all_class_summary))
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+from sekg.ir.models.base import DocRetrievalResult
+
+from search.candidate_docs import CandidateDocs
+from search.ivf_index import IVFIndex
+
+logger = logging.getLogger(__name__)
+
+
+class AVGW2VAnnSearch:
+    """
+    search the AVGW2VFLModel by the IVFIndex of its document vectors instead of scoring all documents.
+    the index is built after training and saved in the model dir, so it is copied with the model, e.g. into the
+    model bundle. the results have the same score as model.search(), (cosine + 1) / 2, but some documents may be
+    missed, probe_num trades the recall for the latency.
+    the index records the fingerprint of the vectors it is built from, it is not loaded for other vectors, e.g. the
+    model is retrained with the same number of documents.
+    """
+    INDEX_DIR = "ann_index"
+    META_NAME = "meta.json"
+
+    def __init__(self, model, index: IVFIndex):
+        self.model = model
+        self.index = index
+
+    @staticmethod
+    def get_index_dir(model_dir_path):
+        return str(Path(model_dir_path) / AVGW2VAnnSearch.INDEX_DIR)
+
+    @staticmethod
+    def get_doc_vectors(model):
+        # the avg w2v of doc index i is the vector of the key str(i)
+        return np.asarray(model.avg_w2v_model.vectors)
+
+    @staticmethod
+    def fingerprint(vectors):
+        """
+        :return: the hex str of the content of the doc vectors
+        """
+        vectors = np.ascontiguousarray(vectors)
+        digest = hashlib.md5(("%s:%r;" % (vectors.dtype.str, vectors.shape)).encode("utf-8"))
+        digest.update(vectors)
+        return digest.hexdigest()
+
+    @staticmethod
+    def build(model, model_dir_path=None, **config):
+        """
+        build the index of the trained model and save it in the model dir.
+        :param model: the AVGW2VFLModel
+        :param model_dir_path: the model dir, the default is model.model_dir_path
+        :param config: the config of IVFIndex.build(), e.g. list_num and probe_num
+        :return: AVGW2VAnnSearch
+        """
+        model_dir_path = model_dir_path or model.model_dir_path
+        doc_vectors = AVGW2VAnnSearch.get_doc_vectors(model)
+        index = IVFIndex.build(doc_vectors, **config)
+        index_dir = AVGW2VAnnSearch.get_index_dir(model_dir_path)
+        index.save(index_dir)
+        with open(str(Path(index_dir) / AVGW2VAnnSearch.META_NAME), "w") as f:
+            json.dump({"vectors_fingerprint": AVGW2VAnnSearch.fingerprint(doc_vectors)}, f, indent=4)
+        logger.info("build the ann index %r for %s", index, model_dir_path)
+        return AVGW2VAnnSearch(model, index)
+
+    @staticmethod
+    def load(model, model_dir_path=None):
+        """
+        :param model: the AVGW2VFLModel
+        :param model_dir_path: the model dir, the default is model.model_dir_path
+        :return: AVGW2VAnnSearch, None if the index is not built or it is built for other vectors
+        """
+        index_dir = AVGW2VAnnSearch.get_index_dir(model_dir_path or model.model_dir_path)
+        meta_path = Path(index_dir) / AVGW2VAnnSearch.META_NAME
+        if not IVFIndex.exists(index_dir) or not meta_path.exists():
+            return None
+        with open(str(meta_path)) as f:
+            meta = json.load(f)
+        if meta.get("vectors_fingerprint", None) != AVGW2VAnnSearch.fingerprint(
+                AVGW2VAnnSearch.get_doc_vectors(model)):
+            logger.warning("the ann index in %s is built for other vectors, rebuild it after training", index_dir)
+            return None
+        return AVGW2VAnnSearch(model, IVFIndex.load(index_dir))
+
+    def search_by_vector(self, query_vector, top_num=10, valid_doc_indexes=None, probe_num=None):
+        """
+        :return: (doc indexes, scores), the score is (cosine + 1) / 2 like model.get_full_doc_score_vec()
+        """
+        doc_indexes, similarities = self.index.search(query_vector, top_num, valid_doc_indexes, probe_num)
+        return doc_indexes, (similarities + 1) / 2
+
+    def search(self, query, top_num=10, valid_doc_id_set=None, probe_num=None):
+        """
+        the same as model.search(), but only the documents found by the index are ranked, the rankings are 1, 2, ...
+        over the documents in the document collection.
+        :param query: the query
+        :param top_num: the number of results
+        :param valid_doc_id_set: the doc ids could be returned, e.g. a LabelPartition,
+        if it is None or empty, all docs could be returned
+        :param probe_num: the number of lists probed, more lists for higher recall
+        :return: list of DocRetrievalResult
+        """
+        valid_doc_indexes = None
+        if isinstance(valid_doc_id_set, CandidateDocs):
+            valid_doc_indexes = valid_doc_id_set.doc_indexes
+        elif valid_doc_id_set:
+            valid_doc_indexes = sorted(
+                self.model.preprocess_doc_collection.doc_id_set_2_doc_index_set(valid_doc_id_set))
+        doc_indexes, scores = self.search_by_vector(self.model.string2vector(query), top_num, valid_doc_indexes,
+                                                    probe_num)
+        retrieval_results = []
+        for doc_index, score in zip(doc_indexes.tolist(), scores.tolist()):
+            entity_document = self.model.doc_index2doc(doc_index)
+            if entity_document is None:
+                continue
+            retrieval_results.append(DocRetrievalResult(doc_id=entity_document.get_document_id(),
+                                                        ranking=len(retrieval_results) + 1,
+                                                        score=score, doc_name=entity_document.get_name(),
+                                                        entity_document=entity_document))
+        return retrieval_results
@@ -0,0 +1,58 @@
+import numpy as np
+
+from util.mmap_util import MmapUtil
+
+
+class CandidateDocs:
+    """
+    a fixed set of candidate documents for the rankings, e.g. all the methods, built once and shared by all queries.
+    the doc indexes and the doc ids are kept sorted by the doc index, so a LazyRanking on them
+    doesn't need to map and sort the doc ids for each query. the doc not in the document collection is removed.
+    """
+
+    def __init__(self, doc_indexes, doc_ids):
+        """
+        :param doc_indexes: the doc indexes sorted ascending
+        :param doc_ids: the doc id of each doc index
+        """
+        self.doc_indexes = doc_indexes
+        self.doc_ids = doc_ids
+        # the doc ids as python objects for iterating and checking, it is built once
+        self.doc_id_list = np.asarray(doc_ids).tolist()
+        self.doc_id_set = set(self.doc_id_list)
+        # doc id -> the position in doc_indexes, e.g. for getting the score of a doc from the scores of the candidates
+        self.doc_id_2_position = {doc_id: position for position, doc_id in enumerate(self.doc_id_list)}
+
+    @staticmethod
+    def create(model, doc_ids):
+        """
+        :param model: the search model
+        :param doc_ids: the candidate doc ids
+        :return: the CandidateDocs
+        """
+        doc_id_2_doc_index = model.get_preprocess_doc_collection().get_doc_id_2_doc_index_map()
+        index_doc_ids = sorted((doc_id_2_doc_index[doc_id], doc_id) for doc_id in doc_ids if
+                               doc_id in doc_id_2_doc_index)
+        doc_indexes = np.array([doc_index for doc_index, doc_id in index_doc_ids], dtype=np.int64)
+        return CandidateDocs(doc_indexes, [doc_id for doc_index, doc_id in index_doc_ids])
+
+    def save(self, dir_path, name):
+        MmapUtil.save_array(dir_path, "%s.doc_indexes" % name, self.doc_indexes)
+        MmapUtil.save_array(dir_path, "%s.doc_ids" % name, np.array(self.doc_id_list, dtype=np.int64))
+
+    @staticmethod
+    def load(dir_path, name):
+        return CandidateDocs(MmapUtil.load_array(dir_path, "%s.doc_indexes" % name),
+                             MmapUtil.load_array(dir_path, "%s.doc_ids" % name))
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_id_set
+
+    def __len__(self):
+        return len(self.doc_id_list)
+
+    def __iter__(self):
+        return iter(self.doc_id_list)
+
+    def __repr__(self):
+        return "<CandidateDocs num=%d>" % len(self)
@@ -0,0 +1,64 @@
+import numpy as np
+
+from search.candidate_docs import CandidateDocs
+
+
+class CandidateScorer:
+    """
+    score the candidate documents of one query together, e.g. the sentences and the methods of one class and the
+    sentences of all its methods. the union of the candidates is scored by one vectorized call
+    (LabelPartitionIndex.score_doc_indexes()) into a dense score array, then the candidates of each owner are
+    ranked on their slice of it, instead of one model.search() on the whole corpus for each owner.
+    the candidates are ranked by score from high to low and the tie is broken by the doc index, like LazyRanking.
+    """
+
+    def __init__(self, label_partitions, candidates: CandidateDocs, scores):
+        """
+        :param label_partitions: the LabelPartitionIndex of the search model
+        :param candidates: the candidate docs
+        :param scores: the scores of the candidates, in the order of candidates.doc_indexes
+        """
+        self.label_partitions = label_partitions
+        self.candidates = candidates
+        self.scores = scores
+
+    @staticmethod
+    def create(label_partitions, query, doc_ids, query_vectors=None):
+        """
+        :param label_partitions: the LabelPartitionIndex of the search model
+        :param query: the query
+        :param doc_ids: the union of the candidate doc ids
+        :param query_vectors: the query encoded by label_partitions.encode(), it is encoded if it is None
+        :return: CandidateScorer
+        """
+        candidates = CandidateDocs.create(label_partitions.model, doc_ids)
+        if len(candidates) == 0:
+            return CandidateScorer(label_partitions, candidates, np.zeros(0))
+        if query_vectors is None:
+            query_vectors = label_partitions.encode(query)
+        return CandidateScorer(label_partitions, candidates,
+                               label_partitions.score_doc_indexes(query_vectors, candidates.doc_indexes))
+
+    def top(self, doc_ids, top_num):
+        """
+        :param doc_ids: the candidate doc ids of one owner, e.g. the sentences of a method
+        :param top_num: the number of top documents
+        :return: list of (doc id, doc name) sorted by the ranking
+        """
+        doc_id_2_position = self.candidates.doc_id_2_position
+        positions = np.array(sorted({doc_id_2_position[doc_id] for doc_id in doc_ids if doc_id in doc_id_2_position}),
+                             dtype=np.int64)
+        if len(positions) == 0:
+            return []
+        # the positions are ascending with the doc index, so the tie is broken by the doc index
+        positions = positions[np.lexsort((positions, -self.scores[positions]))[:top_num]]
+        model = self.label_partitions.model
+        return [(self.candidates.doc_id_list[position],
+                 model.doc_index2doc(int(self.candidates.doc_indexes[position])).get_name())
+                for position in positions.tolist()]
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def __repr__(self):
+        return "<CandidateScorer num=%d>" % len(self)
@@ -0,0 +1,156 @@
+import bisect
+
+import numpy as np
+
+
+class ClassNameIndex:
+    """
+    the in-memory index of the class names for the autocomplete and the fuzzy resolution of the class name of
+    get_summary(). the names of a class are its qualified name, its simple name and the names found for it by the
+    KGNameSearcher (e.g. the aliases), all are lowered.
+    the prefix search is a binary search on the sorted names, which is a flat trie: the names with a prefix are a
+    range of the sorted names. the fuzzy search counts the common character trigrams of the name and each indexed
+    name on the trigram posting lists, and ranks them by the dice coefficient.
+    """
+    # the min dice coefficient of the trigrams for the fuzzy resolution
+    MIN_SIMILARITY = 0.5
+
+    def __init__(self, class_id_2_qualified_name, name_2_class_ids):
+        """
+        :param class_id_2_qualified_name: class id -> the qualified name
+        :param name_2_class_ids: the lowered name -> the sorted class ids having the name
+        """
+        self.class_id_2_qualified_name = class_id_2_qualified_name
+        self.name_2_class_ids = name_2_class_ids
+        self.names = sorted(name_2_class_ids.keys())
+        trigram_2_positions = {}
+        self.name_trigram_nums = np.zeros(len(self.names), dtype=np.int32)
+        for position, name in enumerate(self.names):
+            trigrams = self.get_trigrams(name)
+            self.name_trigram_nums[position] = len(trigrams)
+            for trigram in trigrams:
+                trigram_2_positions.setdefault(trigram, []).append(position)
+        self.trigram_2_positions = {trigram: np.array(positions, dtype=np.int32) for trigram, positions in
+                                    trigram_2_positions.items()}
+
+    @staticmethod
+    def get_simple_name(qualified_name):
+        return qualified_name.split(".")[-1]
+
+    @staticmethod
+    def get_trigrams(name):
+        """
+        :return: the set of the character trigrams of the name padded with "$"
+        """
+        padded_name = "$%s$" % name
+        return {padded_name[index:index + 3] for index in range(len(padded_name) - 2)}
+
+    @staticmethod
+    def build(class_id_2_qualified_name, name_searcher=None):
+        """
+        :param class_id_2_qualified_name: class id -> the qualified name, e.g. of all classes of the SummaryGraphIndex
+        :param name_searcher: the KGNameSearcher of the graph, e.g. the one of the svm model, its names of the classes
+        are added, if it is None, only the qualified names and the simple names are indexed
+        :return: ClassNameIndex
+        """
+        name_2_class_id_set = {}
+        for class_id, qualified_name in class_id_2_qualified_name.items():
+            names = {qualified_name, ClassNameIndex.get_simple_name(qualified_name)}
+            if name_searcher is not None:
+                names.update(name_searcher.get_full_names(class_id))
+            for name in names:
+                name = name.strip().lower()
+                if name != "":
+                    name_2_class_id_set.setdefault(name, set()).add(class_id)
+        name_2_class_ids = {name: sorted(class_id_set) for name, class_id_set in name_2_class_id_set.items()}
+        return ClassNameIndex(dict(class_id_2_qualified_name), name_2_class_ids)
+
+    def complete(self, prefix, top_num=10):
+        """
+        autocomplete the class name.
+        :param prefix: the prefix of the qualified name or any name of the class, e.g. "java.util.ha" or "hashm"
+        :param top_num: the max number of classes
+        :return: list of the qualified names of the classes, the shorter names are ranked first
+        """
+        prefix = prefix.strip().lower()
+        if prefix == "":
+            return []
+        position = bisect.bisect_left(self.names, prefix)
+        # only a few names of the range are ranked, the range of a short prefix could be very large
+        matched_names = []
+        while position < len(self.names) and len(matched_names) < top_num * 8 and \
+                self.names[position].startswith(prefix):
+            matched_names.append(self.names[position])
+            position += 1
+        matched_names.sort(key=lambda name: (len(name), name))
+        class_ids = []
+        for name in matched_names:
+            class_ids.extend(class_id for class_id in self.name_2_class_ids[name] if class_id not in class_ids)
+        return [self.class_id_2_qualified_name[class_id] for class_id in class_ids[:top_num]]
+
+    def __get_similarities(self, lowered_name):
+        """
+        :return: the dice coefficient of the trigrams of the name and each indexed name, None if no trigram is common
+        """
+        trigrams = self.get_trigrams(lowered_name)
+        posting_lists = [self.trigram_2_positions[trigram] for trigram in trigrams if
+                         trigram in self.trigram_2_positions]
+        if len(posting_lists) == 0:
+            return None
+        common_nums = np.bincount(np.concatenate(posting_lists), minlength=len(self.names))
+        return 2 * common_nums / (len(trigrams) + self.name_trigram_nums)
+
+    def search_fuzzy(self, name, top_num=10, min_similarity=MIN_SIMILARITY):
+        """
+        find the classes with the names similar to the name, e.g. with a typo.
+        :param name: the name
+        :param top_num: the max number of classes
+        :param min_similarity: the min dice coefficient of the trigrams
+        :return: list of (the qualified name, the similarity) sorted by the similarity
+        """
+        similarities = self.__get_similarities(name.strip().lower())
+        if similarities is None:
+            return []
+        positions = np.nonzero(similarities >= min_similarity)[0]
+        # the positions are ascending with the name, so the tie is broken by the name
+        positions = positions[np.lexsort((positions, -similarities[positions]))]
+        class_id_2_similarity = {}
+        for position in positions.tolist():
+            for class_id in self.name_2_class_ids[self.names[position]]:
+                if class_id not in class_id_2_similarity:
+                    class_id_2_similarity[class_id] = float(similarities[position])
+            if len(class_id_2_similarity) >= top_num:
+                break
+        return [(self.class_id_2_qualified_name[class_id], similarity) for class_id, similarity in
+                list(class_id_2_similarity.items())[:top_num]]
+
+    def resolve(self, name, min_similarity=MIN_SIMILARITY):
+        """
+        resolve the name to one class: the class with the name (case-insensitive), else the most similar class.
+        if many classes have the name, e.g. the simple name "List", the one with the same qualified name or the
+        smallest id is chosen.
+        :param name: the qualified name, the simple name or other name of the class, could be with a typo
+        :param min_similarity: the min dice coefficient of the trigrams for the fuzzy resolution
+        :return: (the class id, "exact" or "fuzzy"), (None, None) if no class is found
+        """
+        lowered_name = name.strip().lower()
+        class_ids = self.name_2_class_ids.get(lowered_name, None)
+        if class_ids is not None:
+            for class_id in class_ids:
+                if self.class_id_2_qualified_name[class_id].lower() == lowered_name:
+                    return class_id, "exact"
+            return class_ids[0], "exact"
+        similarities = self.__get_similarities(lowered_name)
+        if similarities is None:
+            return None, None
+        # the first max is the smallest name
+        position = int(np.argmax(similarities))
+        if similarities[position] < min_similarity:
+            return None, None
+        return self.name_2_class_ids[self.names[position]][0], "fuzzy"
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return "<ClassNameIndex class_num=%d name_num=%d>" % (len(self.class_id_2_qualified_name), len(self.names))
@@ -0,0 +1,187 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from util.mmap_util import MmapUtil
+
+
+class IVFIndex:
+    """
+    an approximate nearest-neighbour index of the cosine similarity, the inverted file (IVF) in numpy.
+    the vectors are clustered by k-means into lists, a query only scores the vectors in the probe_num lists whose
+    centroids are the most similar to it. probe_num is the knob of the recall and the latency, the recall is 1.0
+    when all lists are probed.
+
+    the vectors of each list are contiguous, so scoring a list is one matrix product on a block.
+    when the search is limited to a small set of valid docs, the valid docs are scored exactly instead.
+    """
+    META_NAME = "ivf_meta.json"
+    ARRAY_NAMES = ["centroids", "list_offsets", "list_doc_indexes", "list_vectors", "doc_index_2_position"]
+
+    def __init__(self, centroids, list_offsets, list_doc_indexes, list_vectors, doc_index_2_position, probe_num):
+        """
+        :param centroids: the normalized centroids of the lists, list_num x dim
+        :param list_offsets: the vectors of list i are list_vectors[list_offsets[i]:list_offsets[i + 1]]
+        :param list_doc_indexes: the doc index of each row of list_vectors
+        :param list_vectors: the normalized vectors sorted by their list
+        :param doc_index_2_position: the row of each doc index in list_vectors
+        :param probe_num: the default number of lists probed by a query
+        """
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_doc_indexes = list_doc_indexes
+        self.list_vectors = list_vectors
+        self.doc_index_2_position = doc_index_2_position
+        self.probe_num = probe_num
+
+    @staticmethod
+    def normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def kmeans(vectors, list_num, iteration_num, sample_num, seed):
+        """
+        the spherical k-means on a sample of the normalized vectors.
+        :return: the normalized centroids
+        """
+        rand = np.random.RandomState(seed)
+        if len(vectors) > sample_num:
+            vectors = vectors[rand.choice(len(vectors), sample_num, replace=False)]
+        centroids = vectors[rand.choice(len(vectors), list_num, replace=False)].copy()
+        for _ in range(iteration_num):
+            assignments = np.argmax(vectors.dot(centroids.T), axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            counts = np.bincount(assignments, minlength=list_num)
+            # the empty list keeps its centroid
+            centroids[counts > 0] = IVFIndex.normalize(sums[counts > 0])
+        return centroids
+
+    @staticmethod
+    def build(vectors, list_num=None, probe_num=None, iteration_num=10, sample_num_per_list=64, seed=0,
+              batch_size=65536):
+        """
+        :param vectors: the doc vectors, the row i is the vector of doc index i
+        :param list_num: the number of lists, the default is 4 * sqrt(the number of vectors)
+        :param probe_num: the default number of lists probed by a query, the default is list_num / 16
+        :param iteration_num: the iterations of k-means
+        :param sample_num_per_list: k-means is trained on list_num * sample_num_per_list vectors
+        :param seed: the random seed
+        :param batch_size: the vectors are assigned to the lists by batches
+        :return: IVFIndex
+        """
+        vectors = IVFIndex.normalize(vectors)
+        doc_num = len(vectors)
+        if list_num is None:
+            list_num = int(4 * np.sqrt(doc_num))
+        list_num = max(1, min(list_num, doc_num))
+        if probe_num is None:
+            probe_num = max(1, list_num // 16)
+        centroids = IVFIndex.kmeans(vectors, list_num, iteration_num, list_num * sample_num_per_list, seed)
+
+        assignments = np.zeros(doc_num, dtype=np.int64)
+        for start in range(0, doc_num, batch_size):
+            assignments[start:start + batch_size] = np.argmax(vectors[start:start + batch_size].dot(centroids.T),
+                                                              axis=1)
+        list_doc_indexes = np.argsort(assignments, kind="stable")
+        list_offsets = np.zeros(list_num + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=list_num), out=list_offsets[1:])
+        doc_index_2_position = np.empty(doc_num, dtype=np.int64)
+        doc_index_2_position[list_doc_indexes] = np.arange(doc_num)
+        return IVFIndex(centroids, list_offsets, list_doc_indexes, vectors[list_doc_indexes], doc_index_2_position,
+                        probe_num)
+
+    def get_list_num(self):
+        return len(self.centroids)
+
+    def get_doc_num(self):
+        return len(self.list_doc_indexes)
+
+    def __probed_positions(self, list_ids):
+        return np.concatenate([np.arange(self.list_offsets[list_id], self.list_offsets[list_id + 1])
+                               for list_id in list_ids])
+
+    @staticmethod
+    def __top(doc_indexes, scores, top_num):
+        """
+        :return: the top doc indexes and their scores, sorted by the score from high to low, tie by the doc index
+        """
+        if 0 < top_num < len(scores):
+            kth_score = np.partition(-scores, top_num - 1)[top_num - 1]
+            candidates = np.nonzero(-scores <= kth_score)[0]
+            doc_indexes = doc_indexes[candidates]
+            scores = scores[candidates]
+        order = np.lexsort((doc_indexes, -scores))
+        if top_num > 0:
+            order = order[:top_num]
+        return doc_indexes[order], scores[order]
+
+    def search(self, query_vector, top_num=10, valid_doc_indexes=None, probe_num=None):
+        """
+        :param query_vector: the query vector
+        :param top_num: the number of returned docs, if top_num=0, all docs in the probed lists are returned
+        :param valid_doc_indexes: the doc indexes could be returned, None means all docs
+        :param probe_num: the number of lists probed, the default is self.probe_num. if less than top_num valid docs
+        are in the probed lists, more lists are probed.
+        :return: (doc indexes, cosine similarities), sorted by the similarity from high to low
+        """
+        query_vector = self.normalize(query_vector)
+        probe_num = min(probe_num or self.probe_num, self.get_list_num())
+        valid_mask = None
+        if valid_doc_indexes is not None:
+            valid_doc_indexes = np.asarray(valid_doc_indexes, dtype=np.int64)
+            average_list_size = self.get_doc_num() / self.get_list_num()
+            if len(valid_doc_indexes) <= probe_num * average_list_size:
+                # scoring the valid docs exactly is cheaper than probing the lists
+                positions = self.doc_index_2_position[valid_doc_indexes]
+                scores = np.asarray(self.list_vectors[positions]).dot(query_vector)
+                return self.__top(valid_doc_indexes, scores, top_num)
+            valid_mask = np.zeros(self.get_doc_num(), dtype=bool)
+            valid_mask[valid_doc_indexes] = True
+
+        list_order = np.argsort(-np.asarray(self.centroids).dot(query_vector), kind="stable")
+        positions = np.zeros(0, dtype=np.int64)
+        probed_num = 0
+        while probed_num < len(list_order):
+            new_positions = self.__probed_positions(list_order[probed_num:probe_num])
+            if valid_mask is not None:
+                new_positions = new_positions[valid_mask[self.list_doc_indexes[new_positions]]]
+            positions = np.concatenate([positions, new_positions])
+            probed_num = probe_num
+            if len(positions) >= top_num:
+                break
+            probe_num = min(probe_num * 2, len(list_order))
+        scores = np.asarray(self.list_vectors[positions]).dot(query_vector)
+        return self.__top(np.asarray(self.list_doc_indexes[positions]), scores, top_num)
+
+    def save(self, index_dir):
+        index_dir = Path(index_dir)
+        for name in self.ARRAY_NAMES:
+            MmapUtil.save_array(index_dir, name, getattr(self, name))
+        meta = {"list_num": self.get_list_num(), "doc_num": self.get_doc_num(),
+                "dim": int(self.centroids.shape[1]), "probe_num": self.probe_num}
+        with open(str(index_dir / self.META_NAME), "w") as f:
+            json.dump(meta, f, indent=4)
+
+    @staticmethod
+    def exists(index_dir):
+        return (Path(index_dir) / IVFIndex.META_NAME).exists()
+
+    @staticmethod
+    def load(index_dir):
+        """
+        :return: the IVFIndex, the arrays are memory-mapped
+        """
+        index_dir = Path(index_dir)
+        with open(str(index_dir / IVFIndex.META_NAME)) as f:
+            meta = json.load(f)
+        arrays = [MmapUtil.load_array(index_dir, name) for name in IVFIndex.ARRAY_NAMES]
+        return IVFIndex(*arrays, probe_num=meta["probe_num"])
+
+    def __repr__(self):
+        return "<IVFIndex doc_num=%d list_num=%d probe_num=%d>" % (self.get_doc_num(), self.get_list_num(),
+                                                                    self.probe_num)
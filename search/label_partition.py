@@ -0,0 +1,444 @@
+import json
+from pathlib import Path
+
+import numpy as np
+from sekg.graph.exporter.graph_data import GraphData
+from sekg.ir.models.base import DocRetrievalResult
+from sekg.util.vector_util import VectorUtil
+
+from search.candidate_docs import CandidateDocs
+from search.model_vectors import ModelVectors
+from util.mmap_util import MmapUtil
+
+
+class LabelPartition(CandidateDocs):
+    """
+    the candidate documents of one type, e.g. all the classes, with the doc vectors of each vector sub-model
+    copied into a contiguous block, so a query is scored on the partition by one matrix-vector product.
+    """
+
+    def __init__(self, doc_indexes, doc_ids, blocks):
+        """
+        :param doc_indexes: the doc indexes sorted ascending
+        :param doc_ids: the doc id of each doc index
+        :param blocks: the doc vectors for each sub-model, the row i is the vector of doc_indexes[i],
+        None for the sub-model scored by slicing its full score vector
+        """
+        super().__init__(doc_indexes, doc_ids)
+        self.blocks = blocks
+
+    def __repr__(self):
+        return "<LabelPartition num=%d>" % len(self)
+
+
+class LabelPartitionIndex:
+    """
+    the documents of the search model partitioned by the candidate types of the summary: the classes
+    (without "class type"), the methods (with "base override method", without "construct method") and the sentences.
+    a search on a type only scores the documents of its partition, instead of scoring all documents and filtering
+    them by a valid doc id set. the score is the same as model.get_full_doc_score_vec(), for the compound model it is
+    the weighted mean of the scores of the sub-models.
+
+    the sub-models keeping doc vectors (see VECTOR_MODEL_ATTRIBUTES) are scored on the blocks of the partition,
+    the others, e.g. bm25, are scored by slicing their full score vector.
+    the query is encoded once by encode() and the encoded query could be scored on many partitions by score(),
+    or by cascade_score(), which only rescores the top docs of a first stage by the whole model.
+    the index is built after training and saved in the model dir, see build(), save() and load(). it is checked
+    against the full score vectors of the real model before saving, see check_scores(). the saved index records the
+    fingerprint of the model vectors, it is not loaded for a retrained model.
+    """
+    INDEX_DIR = "label_partitions"
+    META_NAME = "meta.json"
+    PARTITION_NAMES = ["class", "method", "sentence"]
+    # the number of the docs of each partition whose names are the queries of check_scores()
+    CHECK_QUERY_NUM = 5
+    # (the attribute keeping the doc vectors, the method encoding the query), the row i of the vectors is doc index i.
+    # the KeyedVectors are normalized like similar_by_vector(), the numpy array (of the synthetic model) is already
+    # normalized
+    VECTOR_MODEL_ATTRIBUTES = [("avg_w2v_model", "string2vector"), ("node2vec_model", "compute_query_graph_vec"),
+                               ("doc_vectors", "string2vector")]
+
+    def __init__(self, model, name_2_partition):
+        """
+        :param model: the search model, e.g. CompoundSearchModel
+        :param name_2_partition: the partition name -> LabelPartition
+        """
+        self.model = model
+        self.sub_models, self.weights = self.get_sub_models(model)
+        self.vector_attributes = [self.get_vector_attribute(sub_model) for sub_model in self.sub_models]
+        self.name_2_partition = name_2_partition
+
+    @staticmethod
+    def get_index_dir(model_dir_path):
+        return str(Path(model_dir_path) / LabelPartitionIndex.INDEX_DIR)
+
+    @staticmethod
+    def get_sub_models(model):
+        """
+        :return: (the sub-models, their weights), the weights is None if the model is not a compound model
+        """
+        if len(getattr(model, "model_list", [])) > 0:
+            return list(model.model_list), list(model.model_weight_list)
+        return [model], None
+
+    @staticmethod
+    def get_vector_attribute(sub_model):
+        """
+        :return: (the attribute keeping the doc vectors, the method encoding the query), None if the sub-model
+        doesn't keep doc vectors
+        """
+        for attribute_name, encode_method_name in LabelPartitionIndex.VECTOR_MODEL_ATTRIBUTES:
+            if getattr(sub_model, attribute_name, None) is not None and hasattr(sub_model, encode_method_name):
+                return attribute_name, encode_method_name
+        return None
+
+    @staticmethod
+    def normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.sqrt((vectors ** 2).sum(-1))[..., np.newaxis]
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    @staticmethod
+    def get_label_2_doc_ids(graph_data):
+        """
+        :return: the partition name -> the doc ids of the type, the same as the candidates of the summary
+        """
+        method_ids = set(graph_data.get_node_ids_by_label("method"))
+        method_ids.update(graph_data.get_node_ids_by_label("base override method"))
+        return {
+            "class": graph_data.get_node_ids_by_label("class") - graph_data.get_node_ids_by_label("class type"),
+            "method": method_ids - graph_data.get_node_ids_by_label("construct method"),
+            "sentence": set(graph_data.get_node_ids_by_label("sentence")),
+        }
+
+    @staticmethod
+    def build(model, label_2_doc_ids):
+        """
+        :param model: the search model
+        :param label_2_doc_ids: the partition name -> the doc ids, see get_label_2_doc_ids()
+        :return: LabelPartitionIndex
+        """
+        sub_models, weights = LabelPartitionIndex.get_sub_models(model)
+        name_2_partition = {}
+        for name in LabelPartitionIndex.PARTITION_NAMES:
+            candidates = CandidateDocs.create(model, label_2_doc_ids[name])
+            blocks = []
+            for sub_model in sub_models:
+                vector_attribute = LabelPartitionIndex.get_vector_attribute(sub_model)
+                if vector_attribute is None:
+                    blocks.append(None)
+                    continue
+                vectors = getattr(sub_model, vector_attribute[0])
+                if isinstance(vectors, np.ndarray):
+                    blocks.append(np.ascontiguousarray(vectors[candidates.doc_indexes]))
+                else:
+                    blocks.append(LabelPartitionIndex.normalize(np.asarray(vectors.vectors)[candidates.doc_indexes]))
+            name_2_partition[name] = LabelPartition(candidates.doc_indexes, candidates.doc_ids, blocks)
+        return LabelPartitionIndex(model, name_2_partition)
+
+    def get_array_bytes(self):
+        """
+        :return: the bytes of the doc indexes, doc ids and blocks of the partitions
+        """
+        array_bytes = 0
+        for partition in self.name_2_partition.values():
+            array_bytes += np.asarray(partition.doc_indexes).nbytes + np.asarray(partition.doc_ids).nbytes
+            array_bytes += sum(block.nbytes for block in partition.blocks if block is not None)
+        return array_bytes
+
+    def get_partition(self, name):
+        return self.name_2_partition[name]
+
+    def encode(self, query):
+        """
+        encode the query by each sub-model.
+        :return: list of the normalized query vector for the vector sub-model, the full score vector for the others
+        """
+        query_vectors = []
+        for sub_model, vector_attribute in zip(self.sub_models, self.vector_attributes):
+            if vector_attribute is None:
+                query_vectors.append(sub_model.get_full_doc_score_vec(query))
+                continue
+            query_vector = np.asarray(getattr(sub_model, vector_attribute[1])(query), dtype=np.float32)
+            norm = np.linalg.norm(query_vector)
+            if norm > 0:
+                query_vector = query_vector / norm
+            query_vectors.append(query_vector)
+        return query_vectors
+
+    def score(self, query_vectors, name, positions=None, sub_model_indexes=None):
+        """
+        :param query_vectors: the query encoded by encode()
+        :param name: the partition name
+        :param positions: the positions of the scored docs in the partition, None for all docs of the partition
+        :param sub_model_indexes: the indexes of the sub-models used, None for all sub-models, the scores are the
+        weighted mean of them
+        :return: the scores of the docs of the partition, in the order of partition.doc_indexes or the positions
+        """
+        partition = self.name_2_partition[name]
+        doc_indexes = partition.doc_indexes
+        if positions is not None:
+            doc_indexes = doc_indexes[positions]
+        if sub_model_indexes is None:
+            sub_model_indexes = range(len(self.sub_models))
+        score_vectors = []
+        for sub_model_index in sub_model_indexes:
+            block = partition.blocks[sub_model_index]
+            query_vector = query_vectors[sub_model_index]
+            if block is None:
+                score_vectors.append(query_vector[doc_indexes])
+                continue
+            if positions is not None:
+                block = block[positions]
+            score_vectors.append((np.dot(block, query_vector) + 1) / 2)
+        if self.weights is None or len(score_vectors) == 1:
+            return score_vectors[0]
+        return VectorUtil.get_weight_mean_vec(vector_list=score_vectors,
+                                              weight_list=[self.weights[index] for index in sub_model_indexes])
+
+    def score_doc_indexes(self, query_vectors, doc_indexes):
+        """
+        score any documents, e.g. the sentences and the methods of one class, by one matrix-vector product for each
+        sub-model on their doc vectors, the score is the same as score() for the docs in the partitions.
+        :param query_vectors: the query encoded by encode()
+        :param doc_indexes: the doc indexes
+        :return: the scores of the docs in the order of doc_indexes
+        """
+        score_vectors = []
+        for sub_model, vector_attribute, query_vector in zip(self.sub_models, self.vector_attributes, query_vectors):
+            if vector_attribute is None:
+                score_vectors.append(query_vector[doc_indexes])
+                continue
+            vectors = getattr(sub_model, vector_attribute[0])
+            if isinstance(vectors, np.ndarray):
+                block = vectors[doc_indexes]
+            else:
+                block = self.normalize(np.asarray(vectors.vectors)[doc_indexes])
+            score_vectors.append((np.dot(block, query_vector) + 1) / 2)
+        if self.weights is None:
+            return score_vectors[0]
+        return VectorUtil.get_weight_mean_vec(vector_list=score_vectors, weight_list=self.weights)
+
+    def cascade_score(self, query_vectors, name, top_num, first_stage_sub_model_index=0, first_stage_scores=None,
+                      first_stage_ann=None):
+        """
+        score the partition in two stages: a first stage picks the top_num docs, then only they are rescored by the
+        whole model. the rescored docs are ranked before the others. the first stage is one of:
+        - the first-stage sub-model, e.g. avg_w2v, by default. it scores all docs of the partition exactly, so it
+          only saves scoring the other sub-models on the docs out of the top_num, its cost is still linear to the
+          partition size. the others keep the order of their first-stage scores.
+        - first_stage_scores of the partition scored by another model, e.g. by the LabelPartitionIndex of bm25.
+        - first_stage_ann, the AVGW2VAnnSearch of the first-stage sub-model. the top_num docs are searched by its
+          IVF index, so only the docs in the probed lists are scored, but some top docs may be missed. the others
+          are not scored, they have the same score below the rescored docs.
+        :param query_vectors: the query encoded by encode()
+        :param name: the partition name
+        :param top_num: the number of docs rescored by the whole model
+        :param first_stage_sub_model_index: the index of the sub-model used as the first stage
+        :param first_stage_scores: the first-stage scores of the partition scored by another model
+        :param first_stage_ann: the AVGW2VAnnSearch of the first-stage sub-model, the ann index of its doc vectors
+        :return: the scores of the docs of the partition, in the order of partition.doc_indexes
+        """
+        partition = self.name_2_partition[name]
+        if top_num >= len(partition):
+            return self.score(query_vectors, name)
+        if first_stage_ann is not None:
+            doc_indexes, _ = first_stage_ann.search_by_vector(query_vectors[first_stage_sub_model_index], top_num,
+                                                              valid_doc_indexes=partition.doc_indexes)
+            top_positions = np.searchsorted(partition.doc_indexes, doc_indexes)
+            rescored_scores = self.score(query_vectors, name, positions=top_positions)
+            scores = np.full(len(partition), np.min(rescored_scores, initial=1.0) - 1, dtype=np.float64)
+            scores[top_positions] = rescored_scores
+            return scores
+        if first_stage_scores is None:
+            first_stage_scores = self.score(query_vectors, name, sub_model_indexes=[first_stage_sub_model_index])
+        top_positions = np.argpartition(-first_stage_scores, top_num - 1)[:top_num]
+        rescored_scores = self.score(query_vectors, name, positions=top_positions)
+        # the scores of the others are shifted below the lowest rescored score
+        scores = np.asarray(first_stage_scores, dtype=np.float64) - (
+                np.max(first_stage_scores) - np.min(rescored_scores) + 1)
+        scores[top_positions] = rescored_scores
+        return scores
+
+    def cascade_recall(self, queries, top_num, first_stage_ann=None, recall_num=10):
+        """
+        the recall@recall_num of cascade_score() to scoring all docs by the whole model, e.g. for checking the ann
+        first stage before serving by it.
+        :param queries: the queries
+        :param top_num: the number of docs rescored by the whole model
+        :param first_stage_ann: the AVGW2VAnnSearch of the first stage, see cascade_score()
+        :param recall_num: the number of top docs compared
+        :return: the mean recall of the queries on all partitions
+        """
+        recalls = []
+        for query in queries:
+            query_vectors = self.encode(query)
+            for name in self.PARTITION_NAMES:
+                full_doc_ids = {item.doc_id for item in self.search(query, name, recall_num,
+                                                                    query_vectors=query_vectors)}
+                cascade_scores = self.cascade_score(query_vectors, name, top_num, first_stage_ann=first_stage_ann)
+                cascade_doc_ids = {item.doc_id for item in self.search(query, name, recall_num,
+                                                                       scores=cascade_scores)}
+                recalls.append(len(full_doc_ids & cascade_doc_ids) / max(len(full_doc_ids), 1))
+        if len(recalls) == 0:
+            return 1.0
+        return float(np.mean(recalls))
+
+    def search(self, query, name, top_num=10, query_vectors=None, scores=None):
+        """
+        the same as model.search(query, top_num, valid_doc_id_set) with the doc ids of the partition.
+        :param query: the query
+        :param name: the partition name
+        :param top_num: the number of results, if top_num=0, all docs of the partition are returned
+        :param query_vectors: the query encoded by encode(), it is encoded if it is None
+        :param scores: the scores of the partition, e.g. by cascade_score(), if it is None, they are scored by score()
+        :return: list of DocRetrievalResult
+        """
+        partition = self.name_2_partition[name]
+        if scores is None:
+            if query_vectors is None:
+                query_vectors = self.encode(query)
+            scores = self.score(query_vectors, name)
+        negative_scores = -scores
+        positions = np.arange(len(scores))
+        if 0 < top_num < len(scores):
+            kth_negative_score = np.partition(negative_scores, top_num - 1)[top_num - 1]
+            positions = np.nonzero(negative_scores <= kth_negative_score)[0]
+        # the positions are ascending with the doc index, so the tie is broken by the doc index
+        positions = positions[np.lexsort((positions, negative_scores[positions]))]
+        if top_num > 0:
+            positions = positions[:top_num]
+        retrieval_results = []
+        for ranking, position in enumerate(positions.tolist(), start=1):
+            entity_document = self.model.doc_index2doc(int(partition.doc_indexes[position]))
+            retrieval_results.append(DocRetrievalResult(doc_id=partition.doc_id_list[position], ranking=ranking,
+                                                        score=float(scores[position]),
+                                                        doc_name=entity_document.get_name(),
+                                                        entity_document=entity_document))
+        return retrieval_results
+
+    def get_check_queries(self, query_num=CHECK_QUERY_NUM):
+        """
+        :return: the names of query_num docs spread over each partition, the queries of check_scores()
+        """
+        queries = []
+        for partition in self.name_2_partition.values():
+            for position in np.linspace(0, len(partition) - 1, num=min(query_num, len(partition)), dtype=np.int64):
+                queries.append(self.model.doc_index2doc(int(partition.doc_indexes[position])).get_name())
+        return queries
+
+    def check_scores(self, queries=None, rtol=1e-4, atol=1e-5):
+        """
+        check the partition scores of each sub-model and of the whole model are the same as the full score vector of
+        the real model sliced by the doc indexes. the blocks assume a sub-model scores a doc by the cosine of its
+        normalized doc vector, a sub-model scoring in another way would rank the summaries differently, so it fails
+        loudly after building instead.
+        :param queries: the queries checked, the docs of get_check_queries() if it is None
+        :raise Exception: if the scores of a sub-model or the whole model are different
+        """
+        if queries is None:
+            queries = self.get_check_queries()
+        for query in queries:
+            query_vectors = self.encode(query)
+            expected_score_vectors = [sub_model.get_full_doc_score_vec(query) for sub_model in self.sub_models]
+            if self.weights is not None:
+                expected_score_vectors.append(self.model.get_full_doc_score_vec(query))
+            for name, partition in self.name_2_partition.items():
+                for sub_model_index, expected_scores in enumerate(expected_score_vectors):
+                    sub_model_indexes = None if sub_model_index == len(self.sub_models) else [sub_model_index]
+                    scores = self.score(query_vectors, name, sub_model_indexes=sub_model_indexes)
+                    if not np.allclose(scores, np.asarray(expected_scores)[partition.doc_indexes], rtol=rtol,
+                                       atol=atol):
+                        scored_model = self.model if sub_model_indexes is None else self.sub_models[sub_model_index]
+                        raise Exception("the %s partition scores of %r are different from its full score vector for "
+                                        "the query %r, the label partitions can't be used for this model" % (
+                                            name, type(scored_model).__name__, query))
+
+    def save(self, index_dir, model_fingerprint=None):
+        """
+        save the partitions as flat files, they could be loaded memory-mapped by load().
+        :param index_dir: the dir of the files
+        :param model_fingerprint: the ModelVectors.fingerprint() of the model if it is computed already
+        """
+        if model_fingerprint is None:
+            model_fingerprint = ModelVectors.fingerprint(self.model)
+        for name, partition in self.name_2_partition.items():
+            partition.save(index_dir, name)
+            for sub_model_index, block in enumerate(partition.blocks):
+                if block is not None:
+                    MmapUtil.save_array(index_dir, "%s.block_%d" % (name, sub_model_index), block)
+        meta = {
+            "doc_num": self.model.get_preprocess_doc_collection().get_num(),
+            "vector_attributes": self.vector_attributes,
+            # the blocks are copied from the vectors of the model, they are stale if the model is retrained
+            "model_fingerprint": model_fingerprint,
+            "partition_sizes": {name: len(partition) for name, partition in self.name_2_partition.items()},
+        }
+        with open(str(Path(index_dir) / self.META_NAME), "w") as f:
+            json.dump(meta, f, indent=4)
+
+    @staticmethod
+    def exists(index_dir):
+        return (Path(index_dir) / LabelPartitionIndex.META_NAME).exists()
+
+    @staticmethod
+    def load(model, index_dir, model_fingerprint=None):
+        """
+        :param model: the search model the index is built for
+        :param index_dir: the dir saved by save()
+        :param model_fingerprint: the ModelVectors.fingerprint() of the model if it is computed already
+        :return: LabelPartitionIndex with the memory-mapped blocks, None if it is not saved or it is built for
+        another model, e.g. the model is retrained, then it should be rebuilt
+        """
+        if not LabelPartitionIndex.exists(index_dir):
+            return None
+        with open(str(Path(index_dir) / LabelPartitionIndex.META_NAME)) as f:
+            meta = json.load(f)
+        sub_models, weights = LabelPartitionIndex.get_sub_models(model)
+        vector_attributes = [LabelPartitionIndex.get_vector_attribute(sub_model) for sub_model in sub_models]
+        saved_vector_attributes = [tuple(attribute) if attribute is not None else None for attribute in
+                                   meta["vector_attributes"]]
+        if model_fingerprint is None:
+            model_fingerprint = ModelVectors.fingerprint(model)
+        if meta["doc_num"] != model.get_preprocess_doc_collection().get_num() or \
+                saved_vector_attributes != vector_attributes or \
+                meta.get("model_fingerprint", None) != model_fingerprint:
+            print("the label partitions in %s are built for another model, rebuild them" % index_dir)
+            return None
+        name_2_partition = {}
+        for name in LabelPartitionIndex.PARTITION_NAMES:
+            candidates = CandidateDocs.load(index_dir, name)
+            blocks = [None if vector_attribute is None else
+                      MmapUtil.load_array(index_dir, "%s.block_%d" % (name, sub_model_index))
+                      for sub_model_index, vector_attribute in enumerate(vector_attributes)]
+            name_2_partition[name] = LabelPartition(candidates.doc_indexes, candidates.doc_ids, blocks)
+        return LabelPartitionIndex(model, name_2_partition)
+
+    @staticmethod
+    def build_and_save(model, model_dir_path, graph_data_path):
+        """
+        build the index of the trained model by the labels of the graph and save it in the model dir.
+        :return: LabelPartitionIndex
+        """
+        graph_data = GraphData.load(str(graph_data_path))
+        index = LabelPartitionIndex.build(model, LabelPartitionIndex.get_label_2_doc_ids(graph_data))
+        index.check_scores()
+        index.save(LabelPartitionIndex.get_index_dir(model_dir_path))
+        print("build the label partitions %r for %s" % (index, model_dir_path))
+        return index
+
+    @staticmethod
+    def load_or_build(model, model_dir_path, graph_data):
+        """
+        load the index saved in the model dir, or build it from the graph data if it is not saved.
+        :return: LabelPartitionIndex
+        """
+        index = LabelPartitionIndex.load(model, LabelPartitionIndex.get_index_dir(model_dir_path))
+        if index is None:
+            index = LabelPartitionIndex.build(model, LabelPartitionIndex.get_label_2_doc_ids(graph_data))
+        return index
+
+    def __repr__(self):
+        return "<LabelPartitionIndex %s>" % " ".join(
+            "%s=%d" % (name, len(partition)) for name, partition in self.name_2_partition.items())
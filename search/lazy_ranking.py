@@ -0,0 +1,110 @@
+import numpy as np
+
+from search.candidate_docs import CandidateDocs
+
+
+class LazyRanking:
+    """
+    rank the valid documents for a query incrementally, instead of sorting the whole corpus like model.search().
+    the score of all documents is computed once by model.get_full_doc_score_vec(), or only the valid documents are
+    scored by a LabelPartitionIndex, then the top k documents are selected by argpartition and only they are sorted.
+    k is doubled when more documents are needed.
+
+    the documents are ranked by score from high to low, and the tie is broken by the doc index,
+    so the ranking is the same as the full ranking by model.search().
+    it has the same interface as RankingContext, so the summary could use both.
+    """
+    INIT_TOP_NUM = 256
+
+    def __init__(self, model, query, valid_doc_id_set, init_top_num=INIT_TOP_NUM, valid_scores=None):
+        """
+        :param model: the search model, e.g. CompoundSearchModel
+        :param query: the query
+        :param valid_doc_id_set: the doc ids could be ranked, a set or a CandidateDocs built before
+        :param init_top_num: the number of documents sorted at first
+        :param valid_scores: the scores of the valid docs in the order of valid_doc_id_set.doc_indexes, e.g. scored by
+        LabelPartitionIndex.score(), if it is None, they are sliced from model.get_full_doc_score_vec()
+        """
+        self.model = model
+        self.init_top_num = max(init_top_num, 1)
+        if not isinstance(valid_doc_id_set, CandidateDocs):
+            valid_doc_id_set = CandidateDocs.create(model, valid_doc_id_set)
+        # the doc ids not in the document collection are already removed
+        self.valid_doc_id_set = valid_doc_id_set.doc_id_set
+        self.valid_doc_indexes = valid_doc_id_set.doc_indexes
+        self.valid_doc_ids = valid_doc_id_set.doc_id_list
+        self.doc_id_2_position = valid_doc_id_set.doc_id_2_position
+
+        if valid_scores is None:
+            valid_scores = model.get_full_doc_score_vec(query)[self.valid_doc_indexes]
+        self.valid_scores = valid_scores
+        self.ranked_positions = np.zeros(0, dtype=np.int64)
+
+    def __top_positions(self, top_num):
+        """
+        get the positions in valid_doc_indexes of the top documents.
+        :param top_num: the number of top documents
+        :return: the positions sorted by the ranking
+        """
+        negative_scores = -self.valid_scores
+        if top_num >= len(negative_scores):
+            return np.lexsort((np.arange(len(negative_scores)), negative_scores))
+        kth_negative_score = np.partition(negative_scores, top_num - 1)[top_num - 1]
+        candidate_positions = np.nonzero(negative_scores <= kth_negative_score)[0]
+        # the positions are ascending with the doc index, so it breaks the tie as the doc index
+        order = np.lexsort((candidate_positions, negative_scores[candidate_positions]))
+        return candidate_positions[order][:top_num]
+
+    def __iter__(self):
+        """
+        yield the doc ids by ranking, the documents are sorted only when they are needed.
+        """
+        ranked_num = 0
+        top_num = max(self.init_top_num, len(self.ranked_positions))
+        while ranked_num < len(self.valid_doc_ids):
+            if len(self.ranked_positions) < min(top_num, len(self.valid_doc_ids)):
+                self.ranked_positions = self.__top_positions(top_num)
+            for position in self.ranked_positions[ranked_num:]:
+                yield self.valid_doc_ids[position]
+            ranked_num = len(self.ranked_positions)
+            top_num = top_num * 2
+
+    def __contains__(self, doc_id):
+        return doc_id in self.valid_doc_id_set
+
+    def __len__(self):
+        return len(self.valid_doc_ids)
+
+    def __ranking_key(self, doc_id):
+        position = self.doc_id_2_position[doc_id]
+        return -self.valid_scores[position], self.valid_doc_indexes[position]
+
+    def get_ranking(self, doc_id):
+        """
+        :param doc_id: the doc id
+        :return: the ranking of the doc start from 0, None if the doc is not ranked
+        """
+        if doc_id not in self:
+            return None
+        position = self.doc_id_2_position[doc_id]
+        doc_index = self.valid_doc_indexes[position]
+        score = self.valid_scores[position]
+        higher_num = np.count_nonzero(self.valid_scores > score)
+        tie_num = np.count_nonzero((self.valid_scores == score) & (self.valid_doc_indexes < doc_index))
+        return int(higher_num + tie_num)
+
+    def sort(self, doc_ids, top_num=0):
+        """
+        sort the doc ids by their ranking, the doc not ranked are removed.
+        :param doc_ids: the doc ids need to sort
+        :param top_num: the max number of returned doc ids, if top_num=0, return all ranked doc ids
+        :return: list of doc id
+        """
+        ranked_doc_ids = [doc_id for doc_id in set(doc_ids) if doc_id in self]
+        ranked_doc_ids.sort(key=self.__ranking_key)
+        if top_num > 0:
+            return ranked_doc_ids[:top_num]
+        return ranked_doc_ids
+
+    def __repr__(self):
+        return "<LazyRanking num=%d ranked=%d>" % (len(self.valid_doc_ids), len(self.ranked_positions))
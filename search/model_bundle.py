@@ -0,0 +1,235 @@
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sekg.ir.doc.wrapper import PreprocessMultiFieldDocumentCollection
+from sekg.ir.models.compound import CompoundSearchModel
+
+
+class ModelBundle:
+    """
+    a read-only and versioned bundle of the compound search model and its sub-models.
+    the bundle is a dir with a copy of the compound model dir and the sub-model dirs, and a manifest.json of
+    the relative paths, the classes and the weights of the sub-models and the sha256 of all files.
+    the version of the bundle is the checksum of its files, so a bundle is never changed after it is built,
+    a new bundle is built into another dir and the CURRENT file under the bundle root dir points to the latest one.
+
+    loading a bundle only reads files, the submodel.config of the compound model is not used,
+    and the sub-models are loaded by parallel threads.
+    """
+    MANIFEST_NAME = "manifest.json"
+    CURRENT_NAME = "CURRENT"
+    COMPOUND_DIR = "compound"
+    SUB_MODEL_DIR = "sub_models"
+    FORMAT_VERSION = 1
+    SUB_SEARCH_MODEL_CONFIG_NAME = "submodel.config"
+
+    @staticmethod
+    def class_path(model_class):
+        return "%s.%s" % (model_class.__module__, model_class.__qualname__)
+
+    @staticmethod
+    def import_class(class_path):
+        module_name, _, class_name = class_path.rpartition(".")
+        return getattr(importlib.import_module(module_name), class_name)
+
+    @staticmethod
+    def file_sha256(file_path):
+        digest = hashlib.sha256()
+        with open(str(file_path), "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def checksum(relative_path_2_sha256):
+        """
+        :param relative_path_2_sha256: the relative path of the files -> their sha256
+        :return: the checksum of the bundle
+        """
+        digest = hashlib.sha256()
+        for relative_path, file_sha256 in sorted(relative_path_2_sha256.items()):
+            digest.update(("%s:%s\n" % (relative_path, file_sha256)).encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_files(bundle_dir):
+        bundle_dir = Path(bundle_dir)
+        relative_path_2_sha256 = {}
+        for file_path in sorted(bundle_dir.rglob("*")):
+            if not file_path.is_file() or file_path.name == ModelBundle.MANIFEST_NAME:
+                continue
+            relative_path_2_sha256[file_path.relative_to(bundle_dir).as_posix()] = ModelBundle.file_sha256(file_path)
+        return relative_path_2_sha256
+
+    @staticmethod
+    def get_sub_model_dirs(model_dir):
+        """
+        :return: the dirs of the sub-models in the submodel.config of the compound model dir, [] if it is not exist
+        """
+        config_path = Path(model_dir) / ModelBundle.SUB_SEARCH_MODEL_CONFIG_NAME
+        if not config_path.exists():
+            return []
+        with open(str(config_path), "rb") as f:
+            sub_search_model_config = pickle.load(f)
+        return [sub_model_dir for sub_model_dir, model_class, weight, load_flag in sub_search_model_config]
+
+    @staticmethod
+    def build(model_dir, bundle_root_dir, sub_model_dirs=None):
+        """
+        build a bundle from the compound model dir.
+        :param model_dir: the dir of the compound model
+        :param bundle_root_dir: the dir of all bundles of the model, the new bundle is built in a sub dir of it
+        :param sub_model_dirs: the dirs of the sub-models, it replaces the dirs in the submodel.config of the
+        compound model if they are moved after training. if it is None, the dirs in the submodel.config are used.
+        :return: the dir of the bundle
+        """
+        model_dir = Path(model_dir)
+        bundle_root_dir = Path(bundle_root_dir)
+        bundle_root_dir.mkdir(exist_ok=True, parents=True)
+        with open(str(model_dir / ModelBundle.SUB_SEARCH_MODEL_CONFIG_NAME), "rb") as f:
+            sub_search_model_config = pickle.load(f)
+        if sub_model_dirs is None:
+            sub_model_dirs = [sub_model_dir for sub_model_dir, model_class, weight, load_flag in
+                              sub_search_model_config]
+        if len(sub_model_dirs) != len(sub_search_model_config):
+            raise Exception("the compound model has %d sub-models, but %d dirs are given" % (
+                len(sub_search_model_config), len(sub_model_dirs)))
+
+        # the bundle is built in a temp dir, and it is renamed to its version at last
+        building_dir = bundle_root_dir / (".building-%s" % uuid.uuid4().hex)
+        print("copy the compound model from %s" % model_dir)
+        shutil.copytree(str(model_dir), str(building_dir / ModelBundle.COMPOUND_DIR))
+        sub_models = []
+        for index, (sub_model_dir, (_, model_class, weight, load_flag)) in enumerate(
+                zip(sub_model_dirs, sub_search_model_config)):
+            relative_dir = "%s/%d_%s" % (ModelBundle.SUB_MODEL_DIR, index, Path(sub_model_dir).name)
+            print("copy the sub-model %s from %s" % (ModelBundle.class_path(model_class), sub_model_dir))
+            shutil.copytree(str(sub_model_dir), str(building_dir / relative_dir))
+            sub_models.append({"path": relative_dir, "class": ModelBundle.class_path(model_class),
+                               "weight": weight, "load_flag": load_flag})
+
+        relative_path_2_sha256 = ModelBundle.hash_files(building_dir)
+        checksum = ModelBundle.checksum(relative_path_2_sha256)
+        manifest = {
+            "format_version": ModelBundle.FORMAT_VERSION,
+            "bundle_version": checksum[:16],
+            "checksum": checksum,
+            "created_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "compound": {"path": ModelBundle.COMPOUND_DIR, "class": ModelBundle.class_path(CompoundSearchModel)},
+            "sub_models": sub_models,
+            "files": relative_path_2_sha256,
+        }
+        with open(str(building_dir / ModelBundle.MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=4)
+        for file_path in building_dir.rglob("*"):
+            if file_path.is_file():
+                file_path.chmod(0o444)
+
+        bundle_dir = bundle_root_dir / manifest["bundle_version"]
+        if bundle_dir.exists():
+            print("the bundle %s is already built" % bundle_dir)
+            shutil.rmtree(str(building_dir), onerror=ModelBundle.__remove_read_only)
+        else:
+            building_dir.rename(bundle_dir)
+        ModelBundle.__set_current(bundle_root_dir, manifest["bundle_version"])
+        print("build the model bundle %s" % bundle_dir)
+        return str(bundle_dir)
+
+    @staticmethod
+    def __remove_read_only(function, path, exc_info):
+        os.chmod(path, 0o644)
+        function(path)
+
+    @staticmethod
+    def __set_current(bundle_root_dir, bundle_version):
+        current_path = Path(bundle_root_dir) / ModelBundle.CURRENT_NAME
+        temp_path = Path(bundle_root_dir) / (".%s.%s" % (ModelBundle.CURRENT_NAME, uuid.uuid4().hex))
+        with open(str(temp_path), "w") as f:
+            f.write(bundle_version)
+        os.replace(str(temp_path), str(current_path))
+
+    @staticmethod
+    def get_current(bundle_root_dir):
+        """
+        :param bundle_root_dir: the dir of all bundles of the model
+        :return: the dir of the latest bundle, None if no bundle is built
+        """
+        current_path = Path(bundle_root_dir) / ModelBundle.CURRENT_NAME
+        if not current_path.exists():
+            return None
+        with open(str(current_path)) as f:
+            bundle_dir = Path(bundle_root_dir) / f.read().strip()
+        if not (bundle_dir / ModelBundle.MANIFEST_NAME).exists():
+            return None
+        return str(bundle_dir)
+
+    @staticmethod
+    def load_manifest(bundle_dir):
+        with open(str(Path(bundle_dir) / ModelBundle.MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        if manifest["format_version"] != ModelBundle.FORMAT_VERSION:
+            raise Exception("the format version %r of the bundle %s is not supported" % (
+                manifest["format_version"], bundle_dir))
+        return manifest
+
+    @staticmethod
+    def verify(bundle_dir, manifest):
+        """
+        check the sha256 of all files in the bundle, raise an exception if any file is missing, added or changed.
+        """
+        relative_path_2_sha256 = ModelBundle.hash_files(bundle_dir)
+        if relative_path_2_sha256 != manifest["files"] or \
+                ModelBundle.checksum(relative_path_2_sha256) != manifest["checksum"]:
+            changed_paths = set(relative_path_2_sha256.items()) ^ set(manifest["files"].items())
+            raise Exception("the bundle %s is broken, the changed files: %r" % (
+                bundle_dir, sorted({relative_path for relative_path, file_sha256 in changed_paths})))
+
+    @staticmethod
+    def load(bundle_dir, verify=True, max_workers=None):
+        """
+        load the compound search model from the bundle.
+        :param bundle_dir: the dir of the bundle
+        :param verify: check the sha256 of the files before loading
+        :param max_workers: the number of threads loading the sub-models, the default is one thread for each
+        :return: the compound search model
+        """
+        bundle_dir = Path(bundle_dir)
+        manifest = ModelBundle.load_manifest(bundle_dir)
+        if verify:
+            ModelBundle.verify(bundle_dir, manifest)
+        print("load the model bundle %s" % bundle_dir)
+
+        sub_model_configs = []
+        for sub_model in manifest["sub_models"]:
+            sub_model_configs.append((str(bundle_dir / sub_model["path"]), ModelBundle.import_class(sub_model["class"]),
+                                      sub_model["weight"], sub_model["load_flag"]))
+
+        def load_sub_model(sub_model_config):
+            sub_model_dir, model_class, weight, load_flag = sub_model_config
+            if load_flag:
+                return model_class.load(sub_model_dir)
+            return model_class.load_as_submodel(sub_model_dir)
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(sub_model_configs) or 1) as executor:
+            sub_model_list = list(executor.map(load_sub_model, sub_model_configs))
+
+        # the same as CompoundSearchModel.init_model, but the sub-models are not read from the submodel.config
+        compound_class = ModelBundle.import_class(manifest["compound"]["class"])
+        model = compound_class(compound_class.__name__, str(bundle_dir / manifest["compound"]["path"]))
+        model.sub_search_model_config = sub_model_configs
+        for (sub_model_dir, model_class, weight, load_flag), sub_model in zip(sub_model_configs, sub_model_list):
+            model.model_list.append(sub_model)
+            model.model_weight_list.append(weight)
+            if load_flag:
+                model.preprocess_doc_collection = sub_model.preprocess_doc_collection
+        if model.preprocess_doc_collection is None:
+            model.preprocess_doc_collection = PreprocessMultiFieldDocumentCollection.load(model.entity_collection_path)
+        return model
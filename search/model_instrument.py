@@ -0,0 +1,75 @@
+from sekg.ir.models.compound import CompoundSearchModel
+from sekg.util.vector_util import VectorUtil
+
+
+class ModelInstrument:
+    """
+    time the stages of the search model into the SummaryMetrics: the query preprocessing of the sub-models
+    ("preprocess"), the scoring of each sub-model ("score/<model class>") and the merging of the sub-model scores
+    by the compound model ("merge"). the stages are nested, the preprocessing is a part of the scoring.
+
+    the methods are wrapped on the model instances, the model classes are not changed. the wrapped model can't be
+    pickled, so remove() the instrument before dumping the model, e.g. by Summary.build_snapshot().
+    """
+    PREPROCESS_METHOD_NAMES = ["clean", "extract_words_for_query"]
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        # (object, method name) of the wrapped methods
+        self.wrapped_methods = []
+
+    def __wrap(self, obj, method_name, stage_name):
+        if obj is None or method_name in vars(obj) or not hasattr(obj, method_name):
+            return
+        method = getattr(obj, method_name)
+        metrics = self.metrics
+
+        def timed_method(*args, **kwargs):
+            with metrics.stage(stage_name):
+                return method(*args, **kwargs)
+
+        setattr(obj, method_name, timed_method)
+        self.wrapped_methods.append((obj, method_name))
+
+    def __wrap_compound(self, model):
+        metrics = self.metrics
+
+        # the same as CompoundSearchModel.get_full_doc_score_vec, but the merging is timed
+        def get_full_doc_score_vec(query):
+            full_entity_score_vec = model.get_cache_score_vector(query)
+            if full_entity_score_vec is not None:
+                return full_entity_score_vec
+            submodel_full_entity_score_vec_list = [sub_model.get_full_doc_score_vec(query) for sub_model in
+                                                   model.model_list]
+            with metrics.stage("merge"):
+                full_entity_score_vec = VectorUtil.get_weight_mean_vec(vector_list=submodel_full_entity_score_vec_list,
+                                                                       weight_list=model.model_weight_list)
+            model.cache_entity_score_vector(query, full_entity_score_vec)
+            return full_entity_score_vec
+
+        model.get_full_doc_score_vec = get_full_doc_score_vec
+        self.wrapped_methods.append((model, "get_full_doc_score_vec"))
+
+    def instrument(self, model):
+        """
+        :param model: the search model, e.g. CompoundSearchModel
+        :return: the model
+        """
+        if not self.metrics.enabled:
+            return model
+        sub_models = model.model_list if isinstance(model, CompoundSearchModel) else [model]
+        for sub_model in sub_models:
+            for method_name in self.PREPROCESS_METHOD_NAMES:
+                self.__wrap(getattr(sub_model, "preprocessor", None), method_name, "preprocess")
+            self.__wrap(sub_model, "get_full_doc_score_vec", "score/%s" % sub_model.__class__.__name__)
+        if isinstance(model, CompoundSearchModel) and "get_full_doc_score_vec" not in vars(model):
+            self.__wrap_compound(model)
+        return model
+
+    def remove(self):
+        """
+        remove the wrapped methods, the models are the same as before instrumented.
+        """
+        for obj, method_name in reversed(self.wrapped_methods):
+            delattr(obj, method_name)
+        self.wrapped_methods = []
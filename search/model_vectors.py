@@ -0,0 +1,250 @@
+import gc
+import hashlib
+import json
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+from util.mmap_util import MmapUtil
+
+
+class ModelVectorPickler(pickle.Pickler):
+    """
+    pickle the model, the arrays in array_id_2_name are saved as the reference to their files.
+    """
+
+    def __init__(self, file, array_id_2_name):
+        super().__init__(file, protocol=4)
+        self.array_id_2_name = array_id_2_name
+
+    def persistent_id(self, obj):
+        if isinstance(obj, np.ndarray):
+            return self.array_id_2_name.get(id(obj), None)
+        return None
+
+
+class ModelVectorUnpickler(pickle.Unpickler):
+    """
+    unpickle the model pickled by ModelVectorPickler, the referenced arrays are memory-mapped from their files.
+    """
+
+    def __init__(self, file, dir_path):
+        super().__init__(file)
+        self.dir_path = dir_path
+        self.name_2_mapped_array = {}
+
+    def persistent_load(self, name):
+        if name not in self.name_2_mapped_array:
+            self.name_2_mapped_array[name] = MmapUtil.load_array(self.dir_path, name)
+        return self.name_2_mapped_array[name]
+
+
+class ModelVectors:
+    """
+    export the large vector matrices of a search model and its sub-models as flat files, and replace them
+    in a loaded model by the read-only memory-mapped ones, so the worker processes share one copy of them.
+    the matrices are the numpy arrays kept by the model, and the vectors (and the normalized vectors)
+    of the gensim KeyedVectors kept by the model, e.g. the w2v_model and avg_w2v_model of AVGW2VFLModel and
+    the node2vec_model of FilterSemanticTFIDFNode2VectorModel.
+    the sub-models are found by the model_list of CompoundSearchModel and the doc_sim_model of the svm model,
+    the sub-models loaded from the same dir share the same files.
+    """
+    # the smaller arrays are kept in the heap
+    MIN_ARRAY_BYTES = 1024 * 1024
+    KEYED_VECTORS_ARRAY_NAMES = ["vectors", "vectors_norm"]
+    # the fingerprint of the model and the names of the saved arrays, written by export()
+    META_NAME = "meta.json"
+
+    @staticmethod
+    def get_model_key(model):
+        model_dir_path = getattr(model, "model_dir_path", None)
+        if model_dir_path:
+            return Path(model_dir_path).name
+        return model.name
+
+    @staticmethod
+    def iter_models(model):
+        """
+        :return: iterator of the model and all its sub-models
+        """
+        yield model
+        for sub_model in getattr(model, "model_list", []):
+            yield from ModelVectors.iter_models(sub_model)
+        doc_sim_model = getattr(model, "doc_sim_model", None)
+        if doc_sim_model is not None:
+            yield from ModelVectors.iter_models(doc_sim_model)
+
+    @staticmethod
+    def iter_arrays(model):
+        """
+        :return: iterator of (array name, the object keeping the array, attribute name) for the large arrays,
+        the normalized vectors of the KeyedVectors are included even if they are not computed yet(None)
+        """
+        for attribute_name, value in sorted(vars(model).items()):
+            if isinstance(value, np.ndarray):
+                if value.nbytes >= ModelVectors.MIN_ARRAY_BYTES:
+                    yield attribute_name, model, attribute_name
+                continue
+            vectors = getattr(value, "vectors", None)
+            if not isinstance(vectors, np.ndarray) or vectors.nbytes < ModelVectors.MIN_ARRAY_BYTES:
+                continue
+            for keyed_vectors_array_name in ModelVectors.KEYED_VECTORS_ARRAY_NAMES:
+                yield "%s.%s" % (attribute_name, keyed_vectors_array_name), value, keyed_vectors_array_name
+
+    @staticmethod
+    def get_array_bytes(model):
+        """
+        :return: the bytes of the vectors of the model and its sub-models (the numpy arrays and the vectors and
+        normalized vectors of the KeyedVectors) of any size, the arrays shared by the sub-models are counted once
+        """
+        array_id_2_bytes = {}
+        for sub_model in ModelVectors.iter_models(model):
+            for value in vars(sub_model).values():
+                arrays = [value] if isinstance(value, np.ndarray) else [
+                    getattr(value, name, None) for name in ModelVectors.KEYED_VECTORS_ARRAY_NAMES]
+                for array in arrays:
+                    if isinstance(array, np.ndarray):
+                        array_id_2_bytes[id(array)] = array.nbytes
+        return sum(array_id_2_bytes.values())
+
+    @staticmethod
+    def fingerprint(model):
+        """
+        the fingerprint of the vectors of the model and its sub-models by their content, of any size, so it is the
+        same for the model loaded from a copy of its files, and it is changed by retraining.
+        the normalized vectors are not included, they are computed from the vectors.
+        :param model: the loaded search model
+        :return: a hex str
+        """
+        digest = hashlib.md5()
+        hashed_names = set()
+        for sub_model in ModelVectors.iter_models(model):
+            model_key = ModelVectors.get_model_key(sub_model)
+            for attribute_name, value in sorted(vars(sub_model).items()):
+                array = value if isinstance(value, np.ndarray) else getattr(value, "vectors", None)
+                name = "%s.%s" % (model_key, attribute_name)
+                if not isinstance(array, np.ndarray) or array.dtype.hasobject or name in hashed_names:
+                    continue
+                hashed_names.add(name)
+                digest.update(("%s:%s:%r;" % (name, array.dtype.str, array.shape)).encode("utf-8"))
+                digest.update(np.ascontiguousarray(array))
+        return digest.hexdigest()
+
+    @staticmethod
+    def export(model, dir_path, model_fingerprint=None):
+        """
+        save the large arrays of the model and its sub-models as .npy files.
+        the normalized vectors of the KeyedVectors are computed before saving,
+        so they are shared too instead of being computed by each worker on the first query.
+        :param model: the loaded search model
+        :param dir_path: the dir to save the arrays
+        :param model_fingerprint: the fingerprint() of the model if it is computed already
+        :return: list of the saved array names
+        """
+        if model_fingerprint is None:
+            model_fingerprint = ModelVectors.fingerprint(model)
+        saved_names = []
+        for sub_model in ModelVectors.iter_models(model):
+            for value in vars(sub_model).values():
+                if isinstance(getattr(value, "vectors", None), np.ndarray) and hasattr(value, "init_sims"):
+                    value.init_sims()
+            model_key = ModelVectors.get_model_key(sub_model)
+            for array_name, holder, attribute_name in ModelVectors.iter_arrays(sub_model):
+                name = "%s.%s" % (model_key, array_name)
+                array = getattr(holder, attribute_name, None)
+                if array is None or name in saved_names:
+                    continue
+                MmapUtil.save_array(dir_path, name, array)
+                saved_names.append(name)
+                print("save %s to %s" % (name, MmapUtil.array_path(dir_path, name)))
+        Path(dir_path).mkdir(exist_ok=True, parents=True)
+        with open(str(Path(dir_path) / ModelVectors.META_NAME), "w") as f:
+            json.dump({"model_fingerprint": model_fingerprint, "names": saved_names}, f, indent=4)
+        return saved_names
+
+    @staticmethod
+    def get_exported_fingerprint(dir_path):
+        """
+        :return: the fingerprint of the model the arrays in the dir are exported from, None if it is not recorded
+        """
+        meta_path = Path(dir_path) / ModelVectors.META_NAME
+        if not meta_path.exists():
+            return None
+        with open(str(meta_path)) as f:
+            return json.load(f)["model_fingerprint"]
+
+    @staticmethod
+    def map(model, dir_path, model_fingerprint=None):
+        """
+        replace the large arrays of the loaded model and its sub-models by the memory-mapped ones saved by export().
+        the arrays not saved are kept in the heap.
+        :param model: the loaded search model, it must be the same model exported, it is checked by fingerprint()
+        :param dir_path: the dir of the saved arrays
+        :param model_fingerprint: the fingerprint() of the model if it is computed already
+        :return: the number of bytes memory-mapped
+        """
+        if model_fingerprint is None:
+            model_fingerprint = ModelVectors.fingerprint(model)
+        if ModelVectors.get_exported_fingerprint(dir_path) != model_fingerprint:
+            raise Exception("the vectors in %s are not exported from the loaded model, export the vectors again" %
+                            dir_path)
+        name_2_mapped_array = {}
+        mapped_bytes = 0
+        for sub_model in ModelVectors.iter_models(model):
+            model_key = ModelVectors.get_model_key(sub_model)
+            for array_name, holder, attribute_name in list(ModelVectors.iter_arrays(sub_model)):
+                name = "%s.%s" % (model_key, array_name)
+                if name not in name_2_mapped_array:
+                    if not Path(MmapUtil.array_path(dir_path, name)).exists():
+                        continue
+                    name_2_mapped_array[name] = MmapUtil.load_array(dir_path, name)
+                    mapped_bytes += name_2_mapped_array[name].nbytes
+                mapped_array = name_2_mapped_array[name]
+                array = getattr(holder, attribute_name, None)
+                if array is None:
+                    # the normalized vectors are not computed yet, they have the same shape as the vectors
+                    array = holder.vectors
+                if mapped_array.shape != array.shape or mapped_array.dtype != array.dtype:
+                    raise Exception("the saved %s %r%s is not the loaded %r%s, export the vectors again" % (
+                        name, mapped_array.dtype, mapped_array.shape, array.dtype, array.shape))
+                setattr(holder, attribute_name, mapped_array)
+        return mapped_bytes
+
+    @staticmethod
+    def dump(model, model_path, dir_path):
+        """
+        pickle the whole loaded model into one file, the arrays saved by export() are not pickled again,
+        they are referenced by name, so the model could be loaded by load() much faster than loading its sub-models.
+        :param model: the loaded search model
+        :param model_path: the path of the pickled model
+        :param dir_path: the dir of the arrays saved by export()
+        """
+        array_id_2_name = {}
+        for sub_model in ModelVectors.iter_models(model):
+            model_key = ModelVectors.get_model_key(sub_model)
+            for array_name, holder, attribute_name in ModelVectors.iter_arrays(sub_model):
+                name = "%s.%s" % (model_key, array_name)
+                array = getattr(holder, attribute_name, None)
+                if array is not None and Path(MmapUtil.array_path(dir_path, name)).exists():
+                    array_id_2_name[id(array)] = name
+        with open(model_path, "wb") as f:
+            ModelVectorPickler(f, array_id_2_name).dump(model)
+
+    @staticmethod
+    def load(model_path, dir_path):
+        """
+        load the model pickled by dump(), the arrays are memory-mapped and read-only.
+        :param model_path: the path of the pickled model
+        :param dir_path: the dir of the arrays saved by export()
+        :return: the search model
+        """
+        # the model has millions of small objects, the gc is disabled while they are created, or it runs many times
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(model_path, "rb") as f:
+                return ModelVectorUnpickler(f, dir_path).load()
+        finally:
+            if gc_enabled:
+                gc.enable()
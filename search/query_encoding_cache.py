@@ -0,0 +1,142 @@
+import threading
+from collections import OrderedDict
+
+
+class QueryEncodingCache:
+    """
+    the bounded cache of the query encodings of the sub-models, e.g. the averaged word vector of the avg_w2v model
+    and the graph vector of the svm model, which are the costly part of scoring a query.
+    the encoding methods (ENCODE_METHOD_NAMES) are wrapped on the sub-model instances by install(), so every caller
+    reuses the cached encoding: model.search() of get_summary(), LabelPartitionIndex.encode() of the query-only
+    summaries and the ann search, within a request and across the requests.
+
+    the key is (the sub-model, the encoding method, the normalized query), the size is bounded by LRU eviction and
+    the cache could be used by many threads at the same time. the cached vectors are shared, they must not be changed.
+    the number of the encodings computed and saved is counted in total and for the request of each thread,
+    see start_request() and get_request_statistics().
+    like ModelInstrument, the wrapped model can't be pickled, so remove() the cache before dumping the model.
+    """
+    ENCODE_METHOD_NAMES = ["string2vector", "compute_query_graph_vec"]
+
+    def __init__(self, max_size=4096):
+        """
+        :param max_size: the max number of cached encodings, one query has an encoding for each vector sub-model
+        """
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # key -> encoding, the least recently used is at the beginning
+        self.key_2_encoding = OrderedDict()
+        # (object, method name) of the wrapped methods
+        self.wrapped_methods = []
+        # the counts of the request served by the thread
+        self.request_local = threading.local()
+
+        self.encode_num = 0
+        self.saved_num = 0
+        self.eviction_num = 0
+
+    @staticmethod
+    def normalize_query(query):
+        """
+        the spaces of the query are stripped and merged, the words are not changed, e.g. not lowered,
+        because the preprocessors of the models split the camel case words.
+        """
+        return " ".join(query.split())
+
+    @staticmethod
+    def get_sub_models(model):
+        if len(getattr(model, "model_list", [])) > 0:
+            return list(model.model_list)
+        return [model]
+
+    def __count(self, saved):
+        request_counts = getattr(self.request_local, "counts", None)
+        if request_counts is not None:
+            request_counts[saved] += 1
+
+    def get_or_encode(self, sub_model, method_name, encode, query):
+        """
+        :param sub_model: the sub-model encoding the query
+        :param method_name: the name of the encoding method
+        :param encode: the encoding method not wrapped
+        :param query: the query
+        :return: the cached encoding, the query is encoded and cached if it is not cached
+        """
+        key = (id(sub_model), method_name, self.normalize_query(query))
+        with self.lock:
+            encoding = self.key_2_encoding.get(key, None)
+            if encoding is not None:
+                self.key_2_encoding.move_to_end(key)
+                self.saved_num += 1
+        if encoding is not None:
+            self.__count(True)
+            return encoding
+        # encoded out of the lock, the same query may be encoded by two threads at the same time
+        encoding = encode(query)
+        with self.lock:
+            self.encode_num += 1
+            self.key_2_encoding[key] = encoding
+            self.key_2_encoding.move_to_end(key)
+            while len(self.key_2_encoding) > self.max_size:
+                self.key_2_encoding.popitem(last=False)
+                self.eviction_num += 1
+        self.__count(False)
+        return encoding
+
+    def __wrap(self, sub_model, method_name):
+        if method_name in vars(sub_model) or not hasattr(sub_model, method_name):
+            return
+        encode = getattr(sub_model, method_name)
+        cache = self
+
+        def cached_encode(query):
+            return cache.get_or_encode(sub_model, method_name, encode, query)
+
+        setattr(sub_model, method_name, cached_encode)
+        self.wrapped_methods.append((sub_model, method_name))
+
+    def install(self, model):
+        """
+        wrap the encoding methods of the sub-models by the cache.
+        :param model: the search model, e.g. CompoundSearchModel
+        :return: the model
+        """
+        for sub_model in self.get_sub_models(model):
+            for method_name in self.ENCODE_METHOD_NAMES:
+                self.__wrap(sub_model, method_name)
+        return model
+
+    def remove(self):
+        """
+        remove the wrapped methods, the models are the same as before installed. the cached encodings are kept.
+        """
+        for obj, method_name in reversed(self.wrapped_methods):
+            delattr(obj, method_name)
+        self.wrapped_methods = []
+
+    def start_request(self):
+        """
+        start counting the encodings of the request served by the current thread.
+        """
+        self.request_local.counts = {False: 0, True: 0}
+
+    def get_request_statistics(self):
+        """
+        :return: the number of the encodings computed and saved by the cache since start_request() in the thread
+        """
+        request_counts = getattr(self.request_local, "counts", None) or {False: 0, True: 0}
+        return {"encoded": request_counts[False], "saved": request_counts[True]}
+
+    def clear(self):
+        with self.lock:
+            self.key_2_encoding.clear()
+
+    def get_statistics(self):
+        with self.lock:
+            return {
+                "size": len(self.key_2_encoding),
+                "max_size": self.max_size,
+                "encoded": self.encode_num,
+                "saved": self.saved_num,
+                "eviction": self.eviction_num,
+            }
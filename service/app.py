@@ -0,0 +1,366 @@
+import json
+import threading
+import time
+
+from flask import Flask, request, jsonify, Response, stream_with_context, g
+from flask_cors import CORS
+
+from service.async_server import DEADLINE_ENVIRON_KEY, PARTIAL_HEADER
+from service.summary_cache import SummaryResultCache
+from util.metrics_util import SummaryMetrics
+
+# the summary mode of /createAPISummary/ with a class number
+QUERY_ONLY_MODE_NAME = "get_summary_only_query_by_method"
+# the number of classes summarized for the query-only modes
+CLASS_NUMBER = 66
+# the endpoints not using the summary of the request, they never load a summary of the registry
+ENDPOINTS_WITHOUT_SUMMARY = {"cache_statistics", "registry_statistics", "metrics_text", "reload_summary",
+                             "reload_statuses"}
+# the request header of the token of the admin endpoints
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def create_app(summary=None, summary_cache=None, metrics=None, slow_query_log=None, admission_control=None,
+               registry=None, admin_token=None):
+    """
+    create the flask app serving the summary, run.py creates it for the summaries of the SummaryRegistry,
+    and the benchmarks create it for a synthetic summary.
+    with a registry, the summary of a request is chosen by the optional "pro_name", "version" and "model" of the body
+    (or the args of the GET endpoints), the default ones of the registry are used for the missing ones, the request
+    for a project not supported or not built is responded with 404.
+    :param summary: the Summary, None if the registry is given
+    :param summary_cache: the SummaryResultCache, a new one is created if it is None
+    :param metrics: the SummaryMetrics exposed by /metrics, a new one is created if it is None
+    :param slow_query_log: the SlowQueryLog, the slow requests are not logged if it is None
+    :param admission_control: the AdmissionControl of the AsyncSummaryServer serving the app, its statistics are
+    exported by /metrics, None if the app is served by a wsgi server
+    :param registry: the SummaryRegistry of the summaries served by the app, None if only the summary is served
+    :param admin_token: the token of the admin endpoints (e.g. /admin/reload/) in the "X-Admin-Token" header,
+    if it is None, the admin endpoints are not protected
+    :return: the flask app
+    """
+    if summary_cache is None:
+        summary_cache = SummaryResultCache(max_size=4096, ttl=24 * 3600)
+    if metrics is None:
+        metrics = SummaryMetrics(enabled=True)
+    if summary is not None:
+        summary.set_metrics(metrics)
+    set_metrics_lock = threading.Lock()
+
+    app = Flask(__name__)
+    CORS(app)
+
+    def find_request_summary():
+        """
+        :return: (the summary of the request, the SummaryBundle acquired from the registry), the summary is None if
+        it is not found, and the bundle is None if there is no registry
+        """
+        if registry is None:
+            return summary, None
+        if request.method == "POST":
+            fields = request.get_json(silent=True)
+            fields = fields if isinstance(fields, dict) else {}
+        else:
+            fields = request.args
+        try:
+            bundle = registry.acquire(fields.get("pro_name", None), fields.get("version", None),
+                                      fields.get("model", None))
+        except (KeyError, FileNotFoundError) as e:
+            print("the summary of the request is not found: %r" % e)
+            return None, None
+        request_summary = bundle.summary
+        if request_summary.metrics is not metrics:
+            with set_metrics_lock:
+                if request_summary.metrics is not metrics:
+                    request_summary.set_metrics(metrics)
+        return request_summary, bundle
+
+    def get_loaded_summaries():
+        if registry is None:
+            return [summary]
+        return [bundle.summary for bundle in registry.get_bundles()]
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_start = time.perf_counter()
+        g.trace_scope = None
+        metrics.start_request()
+        g.summary = None
+        g.bundle = None
+        if request.endpoint in ENDPOINTS_WITHOUT_SUMMARY:
+            return None
+        g.summary, g.bundle = find_request_summary()
+        if g.summary is None:
+            return Response(status=404)
+        g.summary.tracer.reset()
+        g.trace_scope = g.summary.tracer.trace(request.endpoint or "unknown").start()
+        g.summary.query_encoding_cache.start_request()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        endpoint = request.endpoint or "unknown"
+        request_start = g.request_start
+        request_summary = g.summary
+        bundle = g.bundle
+        trace_scope = g.trace_scope
+
+        def finish_request():
+            if bundle is not None:
+                registry.release(bundle)
+            if trace_scope is not None:
+                encoding_statistics = request_summary.query_encoding_cache.get_request_statistics()
+                trace_scope.set(status=response.status_code, query_encoded=encoding_statistics["encoded"],
+                                query_encoding_saved=encoding_statistics["saved"])
+                root_span = trace_scope.finish()
+                if slow_query_log is not None:
+                    slow_query_log.record(root_span)
+            metrics.finish_request(endpoint, response.status_code, time.perf_counter() - request_start)
+
+        if response.is_streamed:
+            # the streamed response is finished when it is closed
+            response.call_on_close(finish_request)
+        else:
+            finish_request()
+        return response
+
+    def encode_json(result):
+        with metrics.stage("json_encode"):
+            return jsonify(result)
+
+    @app.route('/createAPISummary/', methods=['POST'])
+    def create_api_summary():
+        """
+        the body is {"query": ..., "class_name_or_number": ...}. if class_name_or_number is a number,
+        the classes are found by the query and summarized by get_summary_only_query_by_method().
+        when the app is served by the AsyncSummaryServer, the request has a deadline, the classes summarized before
+        it are returned with the "X-Summary-Partial" header.
+        """
+        request_body = request.json
+        query = SummaryResultCache.normalize_query(request_body['query'])
+        class_name_or_number = request_body['class_name_or_number'].strip()
+        g.trace_scope.set(query=query, class_name_or_number=class_name_or_number)
+        if query != '' and query is not None and class_name_or_number != '' and class_name_or_number is not None:
+            if class_name_or_number.isdigit():
+                deadline = request.environ.get(DEADLINE_ENVIRON_KEY, None)
+                if deadline is not None:
+                    result, complete = summary_cache.get_summary_before(g.summary, QUERY_ONLY_MODE_NAME, query,
+                                                                        CLASS_NUMBER, deadline)
+                    class_or_method_2_sentence = encode_json(result)
+                    if not complete:
+                        g.trace_scope.set(partial_class_num=len(result))
+                        class_or_method_2_sentence.headers[PARTIAL_HEADER] = "1"
+                else:
+                    class_or_method_2_sentence = encode_json(
+                        summary_cache.get_summary(g.summary, QUERY_ONLY_MODE_NAME, query, CLASS_NUMBER))
+            else:
+                a = {0: summary_cache.get_summary(g.summary, "get_summary", query, class_name_or_number)}
+                class_or_method_2_sentence = encode_json(a)
+            return class_or_method_2_sentence
+
+    @app.route('/createAPISummary/stream', methods=['POST'])
+    def create_api_summary_stream():
+        """
+        the streaming version of /createAPISummary/, the body is the same.
+        the response is newline-delimited json sent by chunks, one line {"index": ..., "summary": ...} for each
+        class, each line is sent as soon as the class is summarized. the stream ends at the deadline of the request
+        when the app is served by the AsyncSummaryServer.
+        """
+        request_body = request.json
+        query = SummaryResultCache.normalize_query(request_body['query'])
+        class_name_or_number = request_body['class_name_or_number'].strip()
+        g.trace_scope.set(query=query, class_name_or_number=class_name_or_number)
+        if query == '' or class_name_or_number == '':
+            return Response(status=400)
+        if class_name_or_number.isdigit():
+            class_summaries = summary_cache.iter_summary(g.summary, QUERY_ONLY_MODE_NAME, query, CLASS_NUMBER)
+        else:
+            class_summaries = [(0, summary_cache.get_summary(g.summary, "get_summary", query, class_name_or_number))]
+
+        deadline = request.environ.get(DEADLINE_ENVIRON_KEY, None)
+
+        def generate_lines():
+            for index, class_summary in class_summaries:
+                with metrics.stage("json_encode"):
+                    line = json.dumps({"index": index, "summary": class_summary}) + "\n"
+                yield line
+                if deadline is not None and time.monotonic() >= deadline:
+                    # the partial summary is not cached by iter_summary()
+                    break
+
+        return Response(stream_with_context(generate_lines()), mimetype="application/x-ndjson")
+
+    @app.route('/createAPISummaries/', methods=['POST'])
+    def create_api_summaries():
+        """
+        the batch version of /createAPISummary/ with class name, the body is
+        {"items": [{"query": ..., "class_name": ...}, ...]},
+        the summaries are returned as a list in the order of the items, the summary of an invalid item is null.
+        """
+        items = request.json['items']
+        batch = []
+        valid_positions = []
+        for position, item in enumerate(items):
+            query = SummaryResultCache.normalize_query(item.get('query', ''))
+            class_name = item.get('class_name', '').strip()
+            if query != '' and class_name != '':
+                batch.append((query, class_name))
+                valid_positions.append(position)
+        g.trace_scope.set(batch=batch)
+        summaries = [None] * len(items)
+        for position, class_or_method_2_sentence in zip(valid_positions,
+                                                        summary_cache.get_summaries(g.summary, batch)):
+            summaries[position] = class_or_method_2_sentence
+        return encode_json(summaries)
+
+    @app.route('/completeClassName/', methods=['GET'])
+    def complete_class_name():
+        """
+        autocomplete the class name, the args are "prefix" and the optional "top_num" (10 by default),
+        the prefix could be of the qualified name or the simple name, e.g. "java.util.has" or "hashm".
+        the qualified names of the classes are returned as a list.
+        """
+        prefix = request.args.get('prefix', '')
+        top_num = request.args.get('top_num', '10')
+        if not top_num.isdigit():
+            return Response(status=400)
+        g.trace_scope.set(prefix=prefix)
+        return jsonify(g.summary.get_class_name_index().complete(prefix, int(top_num)))
+
+    @app.route('/resolveClassName/', methods=['GET'])
+    def resolve_class_name():
+        """
+        resolve the "name" arg to a class like /createAPISummary/ does, the name could be the simple name or with
+        a typo. the result is {"qualified_name": ..., "candidates": [...]}, the candidates are the qualified names of
+        the similar classes, the qualified_name is null if no class is found.
+        """
+        name = request.args.get('name', '').strip()
+        g.trace_scope.set(name=name)
+        if name == '':
+            return Response(status=400)
+        class_id, qualified_name = g.summary.find_class(name)
+        return jsonify({
+            "qualified_name": qualified_name if class_id is not None else None,
+            "candidates": [candidate_name for candidate_name, similarity in
+                           g.summary.get_class_name_index().search_fuzzy(name)],
+        })
+
+    @app.route('/cacheStatistics/', methods=['GET'])
+    def cache_statistics():
+        return jsonify(summary_cache.get_statistics())
+
+    @app.route('/registryStatistics/', methods=['GET'])
+    def registry_statistics():
+        """
+        the loaded summaries of the registry with their memory, and the counts of the loads and evictions.
+        """
+        if registry is None:
+            return Response(status=404)
+        return jsonify(registry.get_statistics())
+
+    def check_admin():
+        """
+        :return: the error response if the request is not allowed to call the admin endpoints, else None
+        """
+        if registry is None:
+            return Response(status=404)
+        if admin_token is not None and request.headers.get(ADMIN_TOKEN_HEADER, None) != admin_token:
+            return Response(status=403)
+        return None
+
+    @app.route('/admin/reload/', methods=['POST'])
+    def reload_summary():
+        """
+        reload a summary of the registry in the background without stopping the service, e.g. the graph data is
+        rebuilt or the model is retrained. the body is {"pro_name": ..., "version": ..., "model": ...,
+        "make_default": ...}, all are optional, the default summary is reloaded by default. if "make_default" is
+        true, the summary becomes the default one after it is loaded, e.g. a new graph version.
+        the status of the reload is returned with 202, see GET /admin/reload/.
+        """
+        error_response = check_admin()
+        if error_response is not None:
+            return error_response
+        request_body = request.get_json(silent=True)
+        request_body = request_body if isinstance(request_body, dict) else {}
+        status = registry.start_reload(request_body.get("pro_name", None), request_body.get("version", None),
+                                       request_body.get("model", None), bool(request_body.get("make_default", False)))
+        return jsonify(status), 202
+
+    @app.route('/admin/reload/', methods=['GET'])
+    def reload_statuses():
+        """
+        the statuses of the recent reloads, "state" is "waiting", "loading", "draining", "done" or "failed".
+        """
+        error_response = check_admin()
+        if error_response is not None:
+            return error_response
+        return jsonify(registry.get_reload_statuses())
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_text():
+        """
+        the metrics in the prometheus text format: the latency histograms of the requests and the stages,
+        the request counts, the in-flight requests and the statistics of the result cache, the query encoding cache
+        and the admission control of the AsyncSummaryServer.
+        """
+        cache_statistics = summary_cache.get_statistics()
+        encoding_statistics_list = [loaded_summary.query_encoding_cache.get_statistics() for loaded_summary in
+                                    get_loaded_summaries()]
+        encoding_statistics = {name: sum(statistics[name] for statistics in encoding_statistics_list) for name in
+                               ["size", "encoded", "saved"]}
+        gauges = {
+            "cache_size": ("the number of cached summary results", cache_statistics["size"]),
+            "cache_hits": ("the number of cache hits", cache_statistics["hit"]),
+            "cache_misses": ("the number of cache misses", cache_statistics["miss"]),
+            "cache_hit_ratio": ("the ratio of cache hits", cache_statistics["hit_ratio"]),
+            "cache_evictions": ("the number of evicted cache results", cache_statistics["eviction"]),
+            "cache_store_hits": ("the number of results read from the materialized summary store",
+                                 cache_statistics["store_hit"]),
+            "cache_computed": ("the number of summaries computed for the requests not cached",
+                               cache_statistics["computed"]),
+            "cache_coalesced": ("the number of requests sharing the summary computed for an identical request in "
+                                "flight", cache_statistics["coalesced"]),
+            "cache_in_flight": ("the number of summaries being computed", cache_statistics["in_flight"]),
+            "query_encoding_cache_size": ("the number of cached query encodings", encoding_statistics["size"]),
+            "query_encodings": ("the number of query encodings computed by the sub-models",
+                                encoding_statistics["encoded"]),
+            "query_encodings_saved": ("the number of query encodings reused from the cache",
+                                      encoding_statistics["saved"]),
+        }
+        if admission_control is not None:
+            admission_statistics = admission_control.get_statistics()
+            gauges.update({
+                "admission_queued": ("the number of requests waiting for a worker", admission_statistics["queued"]),
+                "admission_rejected": ("the number of requests rejected with 503 by the admission control",
+                                       admission_statistics["rejected"]),
+                "admission_expired": ("the number of requests dropped in the queue at the deadline",
+                                      admission_statistics["expired"]),
+                "admission_timeouts": ("the number of requests responded with 504 at the deadline",
+                                       admission_statistics["timeout"]),
+                "admission_partials": ("the number of partial summaries returned at the deadline",
+                                       admission_statistics["partial"]),
+            })
+        if registry is not None:
+            registry_statistics = registry.get_statistics()
+            bundle_labels = [{"pro_name": bundle["pro_name"], "version": bundle["version"],
+                              "model": bundle["model_name"]} for bundle in registry_statistics["bundles"]]
+            gauges.update({
+                "registry_loaded": ("the number of loaded summaries", registry_statistics["loaded"]),
+                "registry_memory_bytes": ("the memory of the loaded summaries",
+                                          registry_statistics["memory_mb"] * 1024 * 1024),
+                "registry_memory_budget_bytes": ("the memory budget of the loaded summaries, 0 if no limit",
+                                                 (registry_statistics["memory_budget_mb"] or 0) * 1024 * 1024),
+                "registry_loads": ("the number of summaries loaded", registry_statistics["load"]),
+                "registry_load_failures": ("the number of summaries failed to load",
+                                           registry_statistics["load_failure"]),
+                "registry_evictions": ("the number of summaries evicted", registry_statistics["eviction"]),
+                "registry_reloads": ("the number of summaries reloaded", registry_statistics["reload"]),
+                "registry_bundle_memory_bytes": ("the memory of each loaded summary", [
+                    (labels, bundle["memory_mb"] * 1024 * 1024) for labels, bundle in
+                    zip(bundle_labels, registry_statistics["bundles"])]),
+                "registry_bundle_load_seconds": ("the seconds of loading each loaded summary", [
+                    (labels, bundle["load_seconds"]) for labels, bundle in
+                    zip(bundle_labels, registry_statistics["bundles"])]),
+            })
+        return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
+
+    return app
@@ -0,0 +1,312 @@
+import asyncio
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# the key of the wsgi environ holding the deadline of the request, by time.monotonic()
+DEADLINE_ENVIRON_KEY = "apisummary.deadline"
+# the response header set by the flask app when the summary is partial because of the deadline
+PARTIAL_HEADER = "X-Summary-Partial"
+# the request header overriding the default timeout of the request, in seconds
+TIMEOUT_HEADER = "x-request-timeout"
+# the paths served without the admission control and the deadline, the monitoring and the reloading must work when
+# the server is overloaded
+EXEMPT_PATHS = ("/metrics", "/admin/reload/")
+
+
+class AdmissionControl:
+    """
+    the bounded pool running the summary work of the AsyncSummaryServer.
+    at most worker_num requests are computed at the same time and at most queue_size requests wait for a worker,
+    the request arriving when the pool is full is rejected at once (503) instead of queued without bound.
+    it also counts the outcomes of the requests, they are exported by /metrics of the flask app, see
+    create_app(admission_control=).
+    """
+
+    def __init__(self, worker_num=8, queue_size=32):
+        """
+        :param worker_num: the number of the worker threads
+        :param queue_size: the max number of the admitted requests waiting for a worker
+        """
+        self.worker_num = worker_num
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=worker_num, thread_name_prefix="summary-worker")
+        self.lock = threading.Lock()
+        # the admitted requests being computed or waiting for a worker
+        self.admitted_num = 0
+
+        self.accepted_num = 0
+        self.rejected_num = 0
+        # the requests waiting in the queue until their deadline, they are not computed
+        self.expired_num = 0
+        # the requests not responded before the deadline (504)
+        self.timeout_num = 0
+        # the requests responded with a partial summary
+        self.partial_num = 0
+
+    def try_admit(self):
+        """
+        :return: True if the request is admitted, it must be released by release() after its work is done
+        """
+        with self.lock:
+            if self.admitted_num >= self.worker_num + self.queue_size:
+                self.rejected_num += 1
+                return False
+            self.admitted_num += 1
+            self.accepted_num += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.admitted_num -= 1
+
+    def submit(self, function, *args):
+        return self.executor.submit(function, *args)
+
+    def record(self, outcome):
+        """
+        :param outcome: "expired", "timeout" or "partial"
+        """
+        with self.lock:
+            setattr(self, outcome + "_num", getattr(self, outcome + "_num") + 1)
+
+    def get_statistics(self):
+        with self.lock:
+            return {
+                "worker_num": self.worker_num,
+                "queue_size": self.queue_size,
+                "admitted": self.admitted_num,
+                "queued": max(self.admitted_num - self.worker_num, 0),
+                "accepted": self.accepted_num,
+                "rejected": self.rejected_num,
+                "expired": self.expired_num,
+                "timeout": self.timeout_num,
+                "partial": self.partial_num,
+            }
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+class AsyncSummaryServer:
+    """
+    the asgi front end of the flask app of service.app, served by an asgi server, e.g.
+    "uvicorn run:asgi_app", see run.py.
+    the event loop only receives and sends the requests, the flask app is called in the bounded pool of the
+    AdmissionControl, so a slow query never blocks the other requests in the event loop and the queue is bounded:
+    - the request arriving when the pool is full is rejected with 503 and Retry-After.
+    - each request has a deadline, the default timeout or the "X-Request-Timeout" header (capped by max_timeout).
+      the deadline is passed to the flask app by the wsgi environ (DEADLINE_ENVIRON_KEY), the query-only summary
+      by method returns the classes summarized before the deadline with the "X-Summary-Partial" header.
+    - the request still waiting for a worker at its deadline is dropped, and the request whose response is not
+      started at its deadline is responded with 504, its work is stopped at its first chunk of the response.
+    the streamed response of the flask app is sent chunk by chunk, the stream of /createAPISummary/stream ends at
+    the deadline.
+    the requests of the exempt paths (EXEMPT_PATHS), e.g. /metrics, are never rejected and have no deadline, they
+    are run out of the bounded pool by the default executor of the event loop.
+    """
+    # the seconds the response could be later than the deadline, e.g. for encoding a partial summary
+    RESPONSE_GRACE = 0.1
+
+    def __init__(self, app, admission_control: AdmissionControl, timeout=5.0, max_timeout=30.0,
+                 exempt_paths=EXEMPT_PATHS):
+        """
+        :param app: the wsgi app, the flask app created by create_app()
+        :param admission_control: the AdmissionControl running the requests
+        :param timeout: the default seconds of the deadline of a request
+        :param max_timeout: the max seconds of the deadline given by the request header
+        :param exempt_paths: the paths served without the admission control and the deadline
+        """
+        self.app = app
+        self.admission_control = admission_control
+        self.timeout = timeout
+        self.max_timeout = max_timeout
+        self.exempt_paths = set(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.__serve_lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.__serve_http(scope, receive, send)
+
+    async def __serve_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.admission_control.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def get_timeout(self, scope):
+        for name, value in scope["headers"]:
+            if name.decode("latin-1").lower() == TIMEOUT_HEADER:
+                try:
+                    return min(max(float(value), 0.0), self.max_timeout)
+                except ValueError:
+                    break
+        return self.timeout
+
+    @staticmethod
+    async def send_error(send, status, message, headers=()):
+        body = json.dumps({"error": message}).encode("utf-8")
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode("latin-1"))] + list(headers)})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    @staticmethod
+    def create_environ(scope, body, deadline):
+        """
+        :return: the wsgi environ of the asgi http scope
+        """
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope["query_string"].decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+            "REMOTE_ADDR": client[0],
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+            DEADLINE_ENVIRON_KEY: deadline,
+        }
+        for name, value in scope["headers"]:
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if name == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+            elif name != "CONTENT_LENGTH":
+                key = "HTTP_" + name
+                environ[key] = environ[key] + "," + value if key in environ else value
+        return environ
+
+    def __run_app(self, environ, deadline, cancelled, emit, admitted=True):
+        """
+        call the wsgi app in a worker thread, the response is emitted as ("start", (status, headers)),
+        ("body", chunk), ("end", None), or ("expired", None) and ("error", exception).
+        the deadline is None for the exempt paths, and they are not admitted by the admission control.
+        """
+        try:
+            if cancelled.is_set() or (deadline is not None and time.monotonic() >= deadline):
+                self.admission_control.record("expired")
+                emit(("expired", None))
+                return
+            status_headers = []
+
+            def start_response(status, headers, exc_info=None):
+                status_headers[:] = [status, headers]
+
+            result = self.app(environ, start_response)
+            started = False
+            try:
+                for chunk in result:
+                    if cancelled.is_set():
+                        return
+                    if not started:
+                        emit(("start", status_headers))
+                        started = True
+                    if chunk:
+                        emit(("body", chunk))
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+            if not started:
+                emit(("start", status_headers))
+            emit(("end", None))
+        except Exception as e:
+            emit(("error", e))
+        finally:
+            if admitted:
+                self.admission_control.release()
+
+    async def __serve_http(self, scope, receive, send):
+        exempt = scope["path"] in self.exempt_paths
+        if not exempt and not self.admission_control.try_admit():
+            await self.send_error(send, 503, "the server is overloaded", [(b"retry-after", b"1")])
+            return
+        try:
+            body = await self.read_body(receive)
+            deadline = None if exempt else time.monotonic() + self.get_timeout(scope)
+            if body is None:
+                if not exempt:
+                    self.admission_control.release()
+                return
+            environ = self.create_environ(scope, body, deadline)
+            loop = asyncio.get_running_loop()
+            messages = asyncio.Queue()
+            cancelled = threading.Event()
+
+            def emit(message):
+                loop.call_soon_threadsafe(messages.put_nowait, message)
+
+            if exempt:
+                loop.run_in_executor(None, self.__run_app, environ, deadline, cancelled, emit, False)
+            else:
+                self.admission_control.submit(self.__run_app, environ, deadline, cancelled, emit)
+        except Exception:
+            if not exempt:
+                self.admission_control.release()
+            raise
+        started = False
+        try:
+            while True:
+                # the started response is sent until its end, the streamed response stops itself at the deadline
+                timeout = None if started or deadline is None else max(
+                    deadline + self.RESPONSE_GRACE - time.monotonic(), 0)
+                try:
+                    kind, value = await asyncio.wait_for(messages.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    cancelled.set()
+                    self.admission_control.record("timeout")
+                    await self.send_error(send, 504, "the deadline of the request is exceeded")
+                    return
+                if kind == "start":
+                    status, headers = value
+                    if any(name.lower() == PARTIAL_HEADER.lower() for name, header_value in headers):
+                        self.admission_control.record("partial")
+                    await send({"type": "http.response.start", "status": int(status.split(" ", 1)[0]),
+                                "headers": [(name.lower().encode("latin-1"), header_value.encode("latin-1"))
+                                            for name, header_value in headers]})
+                    started = True
+                elif kind == "body":
+                    await send({"type": "http.response.body", "body": value, "more_body": True})
+                elif kind == "end":
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+                elif kind == "expired":
+                    await self.send_error(send, 504, "the deadline of the request is exceeded in the queue")
+                    return
+                else:
+                    if started:
+                        await send({"type": "http.response.body", "body": b""})
+                        return
+                    raise value
+        except BaseException:
+            cancelled.set()
+            raise
@@ -0,0 +1,319 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SummaryFlight:
+    """
+    the computation of a summary shared by the identical requests in flight, see SummaryResultCache.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        # (the summary result, False if it is partial) when the computation is done
+        self.result = None
+        self.exception = None
+
+    def wait(self, timeout=None):
+        """
+        :param timeout: the max seconds to wait, None to wait until the computation is done
+        :return: (the summary result, False if it is partial), None if the computation is not done in time
+        """
+        if not self.event.wait(timeout):
+            return None
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+class SummaryResultCache:
+    """
+    the cache of the summary results in front of Summary.
+    the key is (the loaded artifacts of the summary, summary mode, normalized query, class name or class number).
+    the size is bounded by LRU eviction, and each result is expired after ttl seconds.
+    the results of the summaries of many projects and versions could be cached together (see SummaryRegistry),
+    when a summary of the same project, version and model name with different artifacts (the graph data or the sim
+    model is rebuilt) is used, all results cached for the old artifacts are removed, and the results of the old
+    artifacts are not cached any more, e.g. for the requests still using the old summary during a reload.
+    when a SummaryStore is given, the result not cached is read from the summaries materialized in the store before
+    it is computed.
+    the identical requests (the same key) in flight at the same time are coalesced: the first one computes the summary
+    and the others wait for it and share its result, even if the cache is disabled by max_size=0.
+    """
+    # the number of the old artifact keys kept, the older ones are forgotten, their summaries are freed long before
+    MAX_OLD_ARTIFACT_KEY_NUM = 64
+
+    def __init__(self, max_size=1024, ttl=3600, store=None, coalesce=True):
+        """
+        :param max_size: the max number of cached results
+        :param ttl: the seconds a result is kept, if ttl<=0, the result is never expired
+        :param store: the SummaryStore of the materialized summaries, None if there is no store
+        :param coalesce: if False, each identical request in flight computes the summary itself
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.store = store
+        self.coalesce = coalesce
+        self.lock = threading.Lock()
+        # key -> (expire time, result), the least recently used is at the beginning
+        self.key_2_entry = OrderedDict()
+        # (project name, version, model name) -> the artifact key of the summary used last
+        self.summary_key_2_artifact_key = {}
+        # the artifact keys replaced by the new ones, e.g. the old summary still used by the requests of a reload,
+        # the most recently replaced is at the end
+        self.old_artifact_keys = OrderedDict()
+
+        self.hit_num = 0
+        self.miss_num = 0
+        self.eviction_num = 0
+        self.expiration_num = 0
+        self.invalidation_num = 0
+        self.store_hit_num = 0
+        # key -> the SummaryFlight computing it
+        self.key_2_flight = {}
+        # the summaries computed for the requests not cached
+        self.computed_num = 0
+        # the requests sharing the summary computed for an identical request in flight
+        self.coalesced_num = 0
+
+    @staticmethod
+    def normalize_query(query):
+        """
+        normalize the query, the query is stripped and its spaces are merged.
+        the words are not lowered, because the preprocessors of the models split the camel case words before lowering
+        them, e.g. "getInputStream" is "get input stream" but "getinputstream" is one word, so the queries differ
+        only in case could have different summaries and are cached by different keys.
+        the summary should be computed with the normalized query too, so the cached result is the same.
+        :param query: the query
+        :return: the normalized query
+        """
+        return " ".join(query.split())
+
+    @staticmethod
+    def make_key(summary, mode_name, query, class_name_or_number):
+        if isinstance(class_name_or_number, str):
+            class_name_or_number = class_name_or_number.strip()
+        return (summary.artifact_key, mode_name, SummaryResultCache.normalize_query(query), class_name_or_number)
+
+    def __check_artifact_key(self, artifact_key):
+        """
+        :return: False if the artifact key is replaced by a new one, its results are not cached
+        """
+        if artifact_key in self.old_artifact_keys:
+            return False
+        summary_key = artifact_key[:3]
+        old_artifact_key = self.summary_key_2_artifact_key.get(summary_key, None)
+        if old_artifact_key == artifact_key:
+            return True
+        if old_artifact_key is not None:
+            self.old_artifact_keys[old_artifact_key] = True
+            while len(self.old_artifact_keys) > self.MAX_OLD_ARTIFACT_KEY_NUM:
+                self.old_artifact_keys.popitem(last=False)
+            print("the summary artifacts changed to %r, clear the cached results" % (artifact_key,))
+            old_keys = [key for key in self.key_2_entry.keys() if key[0] == old_artifact_key]
+            for key in old_keys:
+                del self.key_2_entry[key]
+            self.invalidation_num += len(old_keys)
+        self.summary_key_2_artifact_key[summary_key] = artifact_key
+        return True
+
+    def get(self, key):
+        """
+        :param key: the key made by make_key
+        :return: the cached result, None if the result is not cached or expired
+        """
+        with self.lock:
+            self.__check_artifact_key(key[0])
+            entry = self.key_2_entry.get(key, None)
+            if entry is not None and self.ttl > 0 and entry[0] < time.monotonic():
+                del self.key_2_entry[key]
+                self.expiration_num += 1
+                entry = None
+            if entry is None:
+                self.miss_num += 1
+                return None
+            self.key_2_entry.move_to_end(key)
+            self.hit_num += 1
+            return entry[1]
+
+    def put(self, key, result):
+        with self.lock:
+            if not self.__check_artifact_key(key[0]):
+                return
+            self.key_2_entry[key] = (time.monotonic() + self.ttl, result)
+            self.key_2_entry.move_to_end(key)
+            while len(self.key_2_entry) > self.max_size:
+                self.key_2_entry.popitem(last=False)
+                self.eviction_num += 1
+
+    def get_or_load(self, key):
+        """
+        :param key: the key made by make_key
+        :return: the cached result, or the result materialized in the store, None if it is neither cached nor
+        materialized
+        """
+        result = self.get(key)
+        if result is None and self.store is not None:
+            result = self.store.get(key)
+            if result is not None:
+                with self.lock:
+                    self.store_hit_num += 1
+                self.put(key, result)
+        return result
+
+    def compute_once(self, key, compute, timeout=None):
+        """
+        compute the summary of the key, or wait for the identical request in flight computing it.
+        :param key: the key made by make_key
+        :param compute: the function computing (the summary result, False if it is partial)
+        :param timeout: the max seconds to wait for the identical request, None to wait until it is done
+        :return: (the summary result, False if it is partial), None if the identical request is not done in time
+        """
+        if not self.coalesce:
+            with self.lock:
+                self.computed_num += 1
+            return compute()
+        with self.lock:
+            flight = self.key_2_flight.get(key, None)
+            if flight is None:
+                flight = SummaryFlight()
+                self.key_2_flight[key] = flight
+                self.computed_num += 1
+                leader = True
+            else:
+                self.coalesced_num += 1
+                leader = False
+        if not leader:
+            return flight.wait(timeout)
+        try:
+            flight.result = compute()
+        except Exception as e:
+            flight.exception = e
+            raise
+        finally:
+            with self.lock:
+                del self.key_2_flight[key]
+            flight.event.set()
+        return flight.result
+
+    def get_summary(self, summary, mode_name, query, class_name_or_number):
+        """
+        get the summary from cache, compute and cache it if it is not cached.
+        :param summary: the Summary
+        :param mode_name: the summary method, e.g. "get_summary" or "get_summary_only_query_by_method"
+        :param query: the query
+        :param class_name_or_number: the class name for get_summary, or the class number for the query-only modes
+        :return: the summary result
+        """
+        key = self.make_key(summary, mode_name, query, class_name_or_number)
+        result = self.get_or_load(key)
+        if result is not None:
+            return result
+
+        def compute():
+            computed_result = getattr(summary, mode_name)(key[2], key[3])
+            self.put(key, computed_result)
+            return computed_result, True
+
+        result, complete = self.compute_once(key, compute)
+        if not complete:
+            # the identical request in flight stopped at its deadline
+            result, complete = compute()
+        return result
+
+    def iter_summary(self, summary, mode_name, query, class_number):
+        """
+        the streaming version of get_summary for the query-only modes. the cached result is yielded at once,
+        otherwise the summary is iterated by summary.iter_<mode> (e.g. iter_summary_only_query_by_method for
+        get_summary_only_query_by_method), and the result is cached after all classes are yielded.
+        :return: generator of (index of the class, the summary of the class)
+        """
+        key = self.make_key(summary, mode_name, query, class_number)
+        result = self.get_or_load(key)
+        if result is not None:
+            yield from result.items()
+            return
+        result = {}
+        for index, class_summary in getattr(summary, "iter_" + mode_name[len("get_"):])(key[2], key[3]):
+            result[index] = class_summary
+            yield index, class_summary
+        self.put(key, result)
+
+    def get_summary_before(self, summary, mode_name, query, class_number, deadline):
+        """
+        get the summary of a query-only mode with an iter_<mode> like iter_summary, but stop near the deadline:
+        when the next class is expected to be summarized after the deadline (by the seconds of the last class),
+        the classes summarized are returned. the partial result is not cached.
+        the identical requests in flight share the result, the partial one too, the request waiting for it until
+        its own deadline returns an empty partial result.
+        :param deadline: the deadline by time.monotonic()
+        :return: (the summary result, False if it is partial)
+        """
+        key = self.make_key(summary, mode_name, query, class_number)
+        result = self.get_or_load(key)
+        if result is not None:
+            return result, True
+
+        def compute():
+            partial_result = {}
+            class_summaries = getattr(summary, "iter_" + mode_name[len("get_"):])(key[2], key[3])
+            last_time = time.monotonic()
+            try:
+                for index, class_summary in class_summaries:
+                    partial_result[index] = class_summary
+                    now = time.monotonic()
+                    if len(partial_result) < class_number and now + (now - last_time) >= deadline:
+                        return partial_result, False
+                    last_time = now
+            finally:
+                class_summaries.close()
+            self.put(key, partial_result)
+            return partial_result, True
+
+        shared_result = self.compute_once(key, compute, timeout=max(deadline - time.monotonic(), 0))
+        if shared_result is None:
+            return {}, False
+        return shared_result
+
+    def get_summaries(self, summary, batch):
+        """
+        get the summaries of a batch of (query, class_name) from cache, the uncached ones are computed together
+        by summary.get_summaries() and cached.
+        :param summary: the Summary
+        :param batch: list of (query, class_name)
+        :return: list of summary result in the order of the batch
+        """
+        keys = [self.make_key(summary, "get_summary", query, class_name) for query, class_name in batch]
+        results = [self.get_or_load(key) for key in keys]
+        miss_positions = [position for position, result in enumerate(results) if result is None]
+        if len(miss_positions) == 0:
+            return results
+        miss_results = summary.get_summaries([keys[position][2:] for position in miss_positions])
+        for position, result in zip(miss_positions, miss_results):
+            results[position] = result
+            if result is not None:
+                self.put(keys[position], result)
+        return results
+
+    def clear(self):
+        with self.lock:
+            self.key_2_entry.clear()
+
+    def get_statistics(self):
+        with self.lock:
+            request_num = self.hit_num + self.miss_num
+            return {
+                "size": len(self.key_2_entry),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hit": self.hit_num,
+                "miss": self.miss_num,
+                "hit_ratio": self.hit_num / request_num if request_num > 0 else 0.0,
+                "eviction": self.eviction_num,
+                "expiration": self.expiration_num,
+                "invalidation": self.invalidation_num,
+                "store_hit": self.store_hit_num,
+                "in_flight": len(self.key_2_flight),
+                "computed": self.computed_num,
+                "coalesced": self.coalesced_num,
+            }
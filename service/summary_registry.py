@@ -0,0 +1,385 @@
+import threading
+import time
+from collections import OrderedDict
+
+from definitions import SUPPORT_PROJECT_LIST
+from script.summary.generate_summary import Summary
+from util.artifact_util import ArtifactUtil
+from util.path_util import PathUtil
+
+
+def load_summary(pro_name, version, model_name):
+    """
+    the default loader of the SummaryRegistry, load the summary like run.py by Summary.load().
+    """
+    return Summary.load(pro_name, version, PathUtil.sim_model(pro_name=pro_name, version=version,
+                                                              model_type=model_name))
+
+
+def get_load_paths(pro_name, version, model_name):
+    """
+    the default paths watched by the SummaryReloadWatcher, the files and dirs read by Summary.load().
+    """
+    return Summary.get_load_paths(pro_name, version, PathUtil.sim_model(pro_name=pro_name, version=version,
+                                                                        model_type=model_name))
+
+
+def estimate_memory_kb(summary):
+    """
+    the default memory estimate of the summaries of the SummaryRegistry, by the bytes of their arrays, see
+    Summary.get_memory_bytes().
+    """
+    return summary.get_memory_bytes() / 1024
+
+
+class SummaryBundle:
+    """
+    a summary loaded by the SummaryRegistry with the memory and the time of its loading.
+    """
+
+    def __init__(self, key, summary, memory_kb, load_seconds):
+        self.key = key
+        self.summary = summary
+        # the memory estimated by the arrays of the summary, it doesn't depend on the other summaries loaded meanwhile
+        self.memory_kb = memory_kb
+        self.load_seconds = load_seconds
+        self.loaded_time = time.time()
+        # the requests using the summary, see SummaryRegistry.acquire()
+        self.in_flight_num = 0
+
+    def __repr__(self):
+        return "<SummaryBundle %s memory=%.1fMB>" % ("/".join(self.key), self.memory_kb / 1024)
+
+
+class SummaryRegistry:
+    """
+    the summaries of many (project, version, model name) served by one service, e.g. the jdk8 summary of several
+    graph versions. a summary is loaded at its first use, the requests for the same summary wait for one loading by
+    the lock of its key, the requests for the other summaries are not blocked.
+    the summaries are kept in the order of their last use, when the memory of the loaded summaries is over the
+    memory budget, the least recently used ones are evicted (the one just loaded is always kept). an evicted summary
+    is freed when the requests using it are finished.
+    the memory of a summary is estimated by the bytes of its arrays (see Summary.get_memory_bytes()), the memory-mapped
+    arrays are counted in full. it is not measured by the rss of the process, which is changed by the summaries loaded
+    at the same time.
+    a loaded summary is reloaded by reload() without stopping the service: the new one is loaded while the old one
+    keeps serving, then they are swapped at once, and the old one is freed after the requests using it (counted by
+    acquire() and release()) are finished.
+    """
+    # the number of the reload statuses kept
+    MAX_RELOAD_STATUS_NUM = 20
+
+    def __init__(self, default_key, memory_budget_mb=None, load=load_summary, pro_names=None,
+                 estimate_memory=estimate_memory_kb):
+        """
+        :param default_key: the default (project name, version, model name) of the requests
+        :param memory_budget_mb: the max memory of the loaded summaries in mb, None if there is no limit
+        :param load: the function (project name, version, model name) -> Summary
+        :param pro_names: the supported projects, definitions.SUPPORT_PROJECT_LIST by default
+        :param estimate_memory: the function Summary -> its memory in kb
+        """
+        self.default_key = tuple(default_key)
+        self.memory_budget_mb = memory_budget_mb
+        self.load = load
+        self.estimate_memory = estimate_memory
+        self.pro_names = set(SUPPORT_PROJECT_LIST if pro_names is None else pro_names)
+        # the condition is notified when a request releases its bundle
+        self.lock = threading.Condition(threading.Lock())
+        # key -> SummaryBundle, the least recently used is at the beginning
+        self.key_2_bundle = OrderedDict()
+        # key -> the lock of loading the summary of the key
+        self.key_2_load_lock = {}
+
+        self.hit_num = 0
+        self.load_num = 0
+        self.load_failure_num = 0
+        self.eviction_num = 0
+        self.reload_num = 0
+        self.reload_statuses = []
+
+    @staticmethod
+    def make_key(pro_name, version, model_name):
+        return pro_name, version, model_name
+
+    def resolve_key(self, pro_name=None, version=None, model_name=None):
+        """
+        :return: the key of the summary, the default ones are used for the None or empty ones
+        """
+        return self.make_key(*[value or default_value for value, default_value in
+                               zip([pro_name, version, model_name], self.default_key)])
+
+    def __get_bundle(self, key, acquire):
+        with self.lock:
+            bundle = self.key_2_bundle.get(key, None)
+            if bundle is not None:
+                self.key_2_bundle.move_to_end(key)
+                self.hit_num += 1
+                if acquire:
+                    bundle.in_flight_num += 1
+            return bundle
+
+    def __get_load_lock(self, key):
+        with self.lock:
+            return self.key_2_load_lock.setdefault(key, threading.Lock())
+
+    def __get_or_load_bundle(self, key, acquire):
+        if key[0] not in self.pro_names:
+            raise KeyError("the project %s is not supported" % key[0])
+        bundle = self.__get_bundle(key, acquire)
+        if bundle is not None:
+            return bundle
+        with self.__get_load_lock(key):
+            # it could be loaded by another request waiting for the same lock
+            bundle = self.__get_bundle(key, acquire)
+            if bundle is not None:
+                return bundle
+            bundle = self.__load(key)
+            with self.lock:
+                self.key_2_bundle[key] = bundle
+                if acquire:
+                    bundle.in_flight_num += 1
+                self.__evict()
+            return bundle
+
+    def get(self, pro_name, version, model_name):
+        """
+        :return: the Summary of the project, version and model name, it is loaded if it is not loaded
+        :raise KeyError: if the project is not supported
+        """
+        return self.__get_or_load_bundle(self.make_key(pro_name, version, model_name), acquire=False).summary
+
+    def acquire(self, pro_name=None, version=None, model_name=None):
+        """
+        get the bundle of the summary for a request, like get(), the None ones are the default ones.
+        a reload frees the old summary after all its bundles acquired are released by release().
+        :return: the SummaryBundle
+        :raise KeyError: if the project is not supported
+        """
+        return self.__get_or_load_bundle(self.resolve_key(pro_name, version, model_name), acquire=True)
+
+    def release(self, bundle):
+        with self.lock:
+            bundle.in_flight_num -= 1
+            if bundle.in_flight_num == 0:
+                self.lock.notify_all()
+
+    def __load(self, key):
+        print("load the summary of %s" % "/".join(key))
+        start = time.perf_counter()
+        try:
+            summary = self.load(*key)
+        except Exception:
+            with self.lock:
+                self.load_failure_num += 1
+            raise
+        load_seconds = time.perf_counter() - start
+        with self.lock:
+            self.load_num += 1
+        return SummaryBundle(key, summary, self.estimate_memory(summary), load_seconds)
+
+    def start_reload(self, pro_name=None, version=None, model_name=None, make_default=False, drain_timeout=60.0):
+        """
+        reload the summary by reload() in a background thread.
+        :return: the reload status when it is started, see get_reload_statuses() for the current one
+        """
+        status = self.__create_reload_status(self.resolve_key(pro_name, version, model_name), make_default)
+        started_status = dict(status)
+        thread = threading.Thread(target=self.reload, args=(pro_name, version, model_name, make_default,
+                                                            drain_timeout, status), daemon=True)
+        thread.start()
+        return started_status
+
+    def __create_reload_status(self, key, make_default):
+        status = {"pro_name": key[0], "version": key[1], "model_name": key[2], "make_default": make_default,
+                  "state": "waiting", "start_time": time.time()}
+        with self.lock:
+            self.reload_statuses.append(status)
+            del self.reload_statuses[:-self.MAX_RELOAD_STATUS_NUM]
+        return status
+
+    def reload(self, pro_name=None, version=None, model_name=None, make_default=False, drain_timeout=60.0,
+               status=None):
+        """
+        load the summary again while the old one keeps serving, e.g. the graph data is rebuilt or the model is
+        retrained, then swap them at once and free the old one after the requests using it are finished.
+        the reloads of the same summary are run one by one. the None ones are the default ones.
+        :param make_default: if True, the summary becomes the default one of the requests after it is loaded,
+        e.g. a new version of the graph, the old default one is freed too
+        :param drain_timeout: the max seconds waiting for the requests using the old summary, it is freed after that
+        :param status: the reload status created by start_reload()
+        :return: the reload status: "state" is "done" or "failed", and the seconds of loading and draining
+        """
+        key = self.resolve_key(pro_name, version, model_name)
+        if status is None:
+            status = self.__create_reload_status(key, make_default)
+        if key[0] not in self.pro_names:
+            status.update(state="failed", error="the project %s is not supported" % key[0], end_time=time.time())
+            return status
+        try:
+            with self.__get_load_lock(key):
+                status["state"] = "loading"
+                bundle = self.__load(key)
+                retired_bundles = []
+                with self.lock:
+                    retired_bundles.append(self.key_2_bundle.pop(key, None))
+                    self.key_2_bundle[key] = bundle
+                    if make_default and self.default_key != key:
+                        retired_bundles.append(self.key_2_bundle.pop(self.default_key, None))
+                        self.default_key = key
+                    self.reload_num += 1
+                    self.__evict()
+            status.update(state="draining", load_seconds=bundle.load_seconds)
+            print("swap the summary of %s" % "/".join(key))
+            start = time.perf_counter()
+            drained = all([self.__drain(retired_bundle, drain_timeout) for retired_bundle in retired_bundles
+                           if retired_bundle is not None])
+            status.update(state="done", drain_seconds=time.perf_counter() - start, drained=drained,
+                          end_time=time.time())
+        except Exception as e:
+            print("fail to reload the summary of %s: %r" % ("/".join(key), e))
+            status.update(state="failed", error=repr(e), end_time=time.time())
+        return status
+
+    def __drain(self, bundle, timeout):
+        """
+        wait for the requests using the bundle removed from the registry, then free its summary.
+        :return: False if the requests are not finished in time
+        """
+        with self.lock:
+            drained = self.lock.wait_for(lambda: bundle.in_flight_num == 0, timeout)
+        if not drained:
+            print("the summary of %s is freed with %d requests using it" % ("/".join(bundle.key),
+                                                                            bundle.in_flight_num))
+        bundle.summary.query_encoding_cache.clear()
+        bundle.summary = None
+        return drained
+
+    def get_reload_statuses(self):
+        with self.lock:
+            return [dict(status) for status in self.reload_statuses]
+
+    def __evict(self):
+        """
+        evict the least recently used summaries until the memory is in the budget, the lock must be held.
+        """
+        if self.memory_budget_mb is None:
+            return
+        while len(self.key_2_bundle) > 1 and self.get_memory_kb() > self.memory_budget_mb * 1024:
+            key, bundle = self.key_2_bundle.popitem(last=False)
+            self.eviction_num += 1
+            print("evict the summary of %s (%.1fMB)" % ("/".join(key), bundle.memory_kb / 1024))
+
+    def evict(self, pro_name, version, model_name):
+        """
+        evict the summary, e.g. it is not served any more.
+        :return: True if it was loaded
+        """
+        with self.lock:
+            bundle = self.key_2_bundle.pop(self.make_key(pro_name, version, model_name), None)
+            if bundle is not None:
+                self.eviction_num += 1
+            return bundle is not None
+
+    def get_memory_kb(self):
+        return sum(bundle.memory_kb for bundle in self.key_2_bundle.values())
+
+    def get_bundles(self):
+        """
+        :return: the loaded SummaryBundles from the least recently used
+        """
+        with self.lock:
+            return list(self.key_2_bundle.values())
+
+    def get_statistics(self):
+        with self.lock:
+            return {
+                "loaded": len(self.key_2_bundle),
+                "memory_mb": self.get_memory_kb() / 1024,
+                "memory_budget_mb": self.memory_budget_mb,
+                "hit": self.hit_num,
+                "load": self.load_num,
+                "load_failure": self.load_failure_num,
+                "eviction": self.eviction_num,
+                "reload": self.reload_num,
+                "default": {"pro_name": self.default_key[0], "version": self.default_key[1],
+                            "model_name": self.default_key[2]},
+                "bundles": [{"pro_name": key[0], "version": key[1], "model_name": key[2],
+                             "memory_mb": bundle.memory_kb / 1024, "load_seconds": bundle.load_seconds,
+                             "in_flight": bundle.in_flight_num}
+                            for key, bundle in self.key_2_bundle.items()],
+            }
+
+    def __len__(self):
+        return len(self.key_2_bundle)
+
+    def __repr__(self):
+        return "<SummaryRegistry loaded=%d memory=%.1fMB>" % (len(self), self.get_memory_kb() / 1024)
+
+
+class SummaryReloadWatcher:
+    """
+    reload the summaries loaded by the SummaryRegistry when their files are changed, e.g. a new snapshot is built or
+    the model is retrained. the files of each loaded summary are polled by their fingerprint (the path, size and
+    modify time of the files), a summary is reloaded after its fingerprint is changed and then unchanged for one
+    poll, so the files being written are not loaded.
+    """
+
+    def __init__(self, registry: SummaryRegistry, interval=30.0, get_paths=get_load_paths):
+        """
+        :param registry: the SummaryRegistry
+        :param interval: the seconds between the polls
+        :param get_paths: the function (project name, version, model name) -> the files and dirs of the summary
+        """
+        self.registry = registry
+        self.interval = interval
+        self.get_paths = get_paths
+        # key -> the fingerprint of the files of the summary loaded
+        self.key_2_fingerprint = {}
+        # key -> the changed fingerprint waiting for one more poll
+        self.key_2_pending_fingerprint = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def check(self):
+        """
+        poll the files of the loaded summaries once, and reload the changed ones.
+        :return: the keys of the summaries reloaded
+        """
+        reloaded_keys = []
+        for bundle in self.registry.get_bundles():
+            key = bundle.key
+            fingerprint = ArtifactUtil.fingerprint(*self.get_paths(*key))
+            if key not in self.key_2_fingerprint:
+                self.key_2_fingerprint[key] = fingerprint
+                continue
+            if fingerprint == self.key_2_fingerprint[key]:
+                self.key_2_pending_fingerprint.pop(key, None)
+                continue
+            if self.key_2_pending_fingerprint.get(key, None) != fingerprint:
+                self.key_2_pending_fingerprint[key] = fingerprint
+                continue
+            print("the files of the summary of %s are changed, reload it" % "/".join(key))
+            status = self.registry.reload(*key)
+            if status["state"] == "done":
+                self.key_2_fingerprint[key] = fingerprint
+                del self.key_2_pending_fingerprint[key]
+                reloaded_keys.append(key)
+        return reloaded_keys
+
+    def __run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print("fail to check the files of the summaries: %r" % e)
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
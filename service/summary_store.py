@@ -0,0 +1,108 @@
+import json
+import pickle
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+
+
+class SummaryStore:
+    """
+    the summaries materialized offline for the hot queries, kept in a sqlite file.
+    it is written by script.summary.materialize_summary and read by the SummaryResultCache before a summary is
+    computed, see SummaryResultCache(store=).
+    the key is the key of the SummaryResultCache: (the artifact key of the summary, summary mode, normalized query,
+    class name or class number), so the summaries materialized for another graph or model version are never served.
+    the summary is pickled and compressed by zlib, so the indexes of the classes are still int when it is read.
+    the connection is opened for each thread, the store could be read by many threads at the same time.
+    """
+    TABLE_NAME = "summary"
+
+    def __init__(self, store_path, read_only=True):
+        """
+        :param store_path: the path of the sqlite file
+        :param read_only: if True, the file must exist and it is opened read-only
+        """
+        self.store_path = str(store_path)
+        self.read_only = read_only
+        self.local = threading.local()
+
+    @staticmethod
+    def exists(store_path):
+        return Path(store_path).is_file()
+
+    def __get_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            return connection
+        if self.read_only:
+            connection = sqlite3.connect(Path(self.store_path).resolve().as_uri() + "?mode=ro", uri=True)
+        else:
+            connection = sqlite3.connect(self.store_path)
+            connection.execute("CREATE TABLE IF NOT EXISTS %s (artifact_key TEXT, mode TEXT, query TEXT, "
+                               "argument TEXT, summary BLOB, PRIMARY KEY (artifact_key, mode, query, argument)) "
+                               "WITHOUT ROWID" % self.TABLE_NAME)
+            connection.commit()
+        self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def encode_key(key):
+        """
+        :param key: the key made by SummaryResultCache.make_key()
+        :return: the columns of the key
+        """
+        artifact_key, mode_name, query, class_name_or_number = key
+        return json.dumps(list(artifact_key)), mode_name, query, json.dumps(class_name_or_number)
+
+    @staticmethod
+    def encode_summary(result):
+        return zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def decode_summary(data):
+        return pickle.loads(zlib.decompress(data))
+
+    def get(self, key):
+        """
+        :param key: the key made by SummaryResultCache.make_key()
+        :return: the materialized summary, None if it is not materialized
+        """
+        row = self.__get_connection().execute(
+            "SELECT summary FROM %s WHERE artifact_key=? AND mode=? AND query=? AND argument=?" % self.TABLE_NAME,
+            self.encode_key(key)).fetchone()
+        if row is None:
+            return None
+        return self.decode_summary(row[0])
+
+    def put_many(self, key_data_list):
+        """
+        write the summaries in one transaction.
+        :param key_data_list: list of (key, the summary encoded by encode_summary())
+        """
+        connection = self.__get_connection()
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO %s VALUES (?, ?, ?, ?, ?)" % self.TABLE_NAME,
+                                   [self.encode_key(key) + (data,) for key, data in key_data_list])
+
+    def get_statistics(self):
+        """
+        :return: the number of summaries for each artifact key and the size of the file
+        """
+        rows = self.__get_connection().execute(
+            "SELECT artifact_key, COUNT(*) FROM %s GROUP BY artifact_key" % self.TABLE_NAME).fetchall()
+        return {
+            "path": self.store_path,
+            "size_bytes": Path(self.store_path).stat().st_size,
+            "summary_num": sum(count for artifact_key, count in rows),
+            "artifact_key_2_summary_num": {artifact_key: count for artifact_key, count in rows},
+        }
+
+    def close(self):
+        """
+        close the connection of the current thread.
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
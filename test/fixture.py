@@ -0,0 +1,87 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from sekg.graph.exporter.graph_data import GraphData
+
+from script.benchmark.synthetic import build_synthetic_graph_data, SyntheticSearchModel
+from script.summary.generate_summary import Summary
+from util.path_util import PathUtil
+
+"""
+the small synthetic graph data, search model and summary shared by the tests.
+"""
+
+TEST_CLASS_NUM = 100
+# the file in the model dir of SummaryFilesTestCase, it keeps the seed of the synthetic model
+SYNTHETIC_MODEL_CONFIG_NAME = "synthetic.json"
+
+
+def create_test_summary(class_num=TEST_CLASS_NUM, preprocessor=None, seed=0):
+    """
+    :param class_num: the number of classes of the synthetic graph
+    :param preprocessor: the preprocessor of the search model, the SimplePreprocessor if it is None
+    :return: the Summary of the synthetic graph and search model
+    """
+    graph_data = build_synthetic_graph_data(class_num=class_num, seed=seed)
+    model = SyntheticSearchModel.create(graph_data, seed=seed)
+    if preprocessor is not None:
+        model.set_preprocessor(preprocessor)
+    return Summary.create(graph_data, model)
+
+
+def load_synthetic_model(pro_name, version, model_dir):
+    """
+    load the synthetic model of the saved graph data with the seed saved in the model dir,
+    it replaces Summary.create_search_model in SummaryFilesTestCase.
+    """
+    with open(str(Path(model_dir) / SYNTHETIC_MODEL_CONFIG_NAME)) as f:
+        seed = json.load(f)["seed"]
+    graph_data = GraphData.load(PathUtil.graph_data(pro_name=pro_name, version=version))
+    return SyntheticSearchModel.create(graph_data, seed=seed)
+
+
+class SummaryFilesTestCase(unittest.TestCase):
+    """
+    the test case of the summary loaded from files, the output dir is a temp dir and the search model of the model
+    dir is the synthetic model of the saved graph data, see save_graph_data() and save_model().
+    """
+    PRO_NAME = "test"
+    VERSION = "v1"
+    MODEL_NAME = "synthetic"
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.patches = [mock.patch("util.path_util.OUTPUT_DIR", self.output_dir),
+                        mock.patch.object(Summary, "create_search_model", staticmethod(load_synthetic_model))]
+        for patch in self.patches:
+            patch.start()
+        self.model_dir = PathUtil.sim_model(self.PRO_NAME, self.VERSION, self.MODEL_NAME)
+        self.serving_artifacts_dir = PathUtil.serving_artifacts(pro_name=self.PRO_NAME, version=self.VERSION,
+                                                                model_type=self.MODEL_NAME)
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.output_dir)
+
+    def save_graph_data(self, class_num=TEST_CLASS_NUM, seed=0):
+        """
+        save the synthetic graph data as the graph data of the project, e.g. again to rebuild the graph
+        """
+        graph_data = build_synthetic_graph_data(class_num=class_num, seed=seed)
+        graph_data.save(PathUtil.graph_data(pro_name=self.PRO_NAME, version=self.VERSION))
+        return graph_data
+
+    def save_model(self, seed=0):
+        """
+        save the seed of the synthetic model in the model dir, e.g. another seed to retrain the model
+        """
+        with open(str(Path(self.model_dir) / SYNTHETIC_MODEL_CONFIG_NAME), "w") as f:
+            json.dump({"seed": seed}, f)
+
+    def load_summary(self, serving_artifacts_dir=None):
+        return Summary(self.PRO_NAME, self.VERSION, self.model_dir, serving_artifacts_dir=serving_artifacts_dir)
@@ -0,0 +1,76 @@
+import asyncio
+import time
+import unittest
+
+from service.async_server import AdmissionControl, AsyncSummaryServer, DEADLINE_ENVIRON_KEY
+
+
+def slow_app(environ, start_response):
+    # the wsgi app answering after 0.3 seconds with its deadline
+    time.sleep(0.3)
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [repr(environ[DEADLINE_ENVIRON_KEY]).encode("utf-8")]
+
+
+async def request(server, path, method="GET", headers=()):
+    """
+    :return: (the status, the body) of the request served by the asgi server
+    """
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"", "headers": list(headers)}
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await server(scope, receive, send)
+    return sent[0]["status"], b"".join(message.get("body", b"") for message in sent[1:])
+
+
+class AsyncSummaryServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.admission_control = AdmissionControl(worker_num=1, queue_size=0)
+        self.server = AsyncSummaryServer(slow_app, self.admission_control, timeout=0.1)
+
+    def tearDown(self):
+        self.admission_control.shutdown()
+
+    def test_reject_when_overloaded(self):
+        # the pool is full
+        self.assertTrue(self.admission_control.try_admit())
+        self.assertEqual(asyncio.run(request(self.server, "/createAPISummary/", "POST"))[0], 503)
+        self.admission_control.release()
+        self.assertEqual(self.admission_control.get_statistics()["rejected"], 1)
+
+    def test_timeout(self):
+        # the app is slower than the timeout
+        self.assertEqual(asyncio.run(request(self.server, "/createAPISummary/", "POST"))[0], 504)
+        self.assertEqual(self.admission_control.get_statistics()["timeout"], 1)
+
+    def test_timeout_header(self):
+        # the timeout of the request header is long enough, the deadline is passed to the app
+        start_time = time.monotonic()
+        status, body = asyncio.run(request(self.server, "/createAPISummary/", "POST",
+                                           [(b"x-request-timeout", b"2")]))
+        self.assertEqual(status, 200)
+        self.assertAlmostEqual(float(body), start_time + 2, delta=0.5)
+
+    def test_exempt_path_not_rejected(self):
+        self.assertTrue(self.admission_control.try_admit())
+        self.assertEqual(asyncio.run(request(self.server, "/metrics")), (200, b"None"))
+        self.assertEqual(asyncio.run(request(self.server, "/admin/reload/", "POST")), (200, b"None"))
+        self.admission_control.release()
+        self.assertEqual(self.admission_control.get_statistics()["rejected"], 0)
+
+    def test_exempt_path_no_deadline(self):
+        # the app is slower than the timeout, but /metrics has no deadline
+        self.assertEqual(asyncio.run(request(self.server, "/metrics"))[0], 200)
+        self.assertEqual(self.admission_control.get_statistics()["timeout"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from script.benchmark.synthetic import build_synthetic_graph_data, build_synthetic_queries, \
+    create_synthetic_compound_model
+from script.summary.generate_summary import Summary
+from search.candidate_scorer import CandidateScorer
+from test.fixture import TEST_CLASS_NUM
+
+
+class CandidateScorerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        graph_data = build_synthetic_graph_data(class_num=TEST_CLASS_NUM)
+        cls.model = create_synthetic_compound_model(graph_data)
+        cls.summary = Summary.create(graph_data, cls.model)
+        cls.queries = build_synthetic_queries(5)
+
+    def test_top(self):
+        graph_index = self.summary.graph_index
+        class_id = graph_index.get_all_class_ids()[0]
+        method_ids = list(graph_index.get_method_ids(class_id))
+        owner_ids = [class_id] + method_ids
+        doc_ids = set(method_ids)
+        for owner_id in owner_ids:
+            doc_ids.update(graph_index.get_sentence_ids(owner_id))
+        for query in self.queries:
+            scorer = CandidateScorer.create(self.summary.label_partitions, query, doc_ids)
+            self.assertEqual(len(scorer), len(doc_ids))
+            # each owner is ranked on its slice as if model.search() is called with its candidates only
+            for owner_doc_ids in [method_ids] + [graph_index.get_sentence_ids(owner_id) for owner_id in owner_ids]:
+                if len(owner_doc_ids) == 0:
+                    # model.search() doesn't filter the docs by an empty valid doc id set
+                    self.assertEqual(scorer.top(owner_doc_ids, 3), [])
+                    continue
+                results = self.model.search(query, 3, set(owner_doc_ids))
+                self.assertEqual(scorer.top(owner_doc_ids, 3),
+                                 [(result.doc_id, result.doc_name) for result in results])
+
+    def test_no_candidates(self):
+        scorer = CandidateScorer.create(self.summary.label_partitions, self.queries[0], [])
+        self.assertEqual(len(scorer), 0)
+        self.assertEqual(scorer.top([1, 2, 3], 3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
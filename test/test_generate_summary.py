@@ -0,0 +1,119 @@
+import unittest
+
+from script.benchmark.synthetic import build_synthetic_graph_data, build_synthetic_queries, \
+    create_synthetic_compound_model
+from script.summary.generate_summary import Summary
+from test.fixture import SummaryFilesTestCase, TEST_CLASS_NUM
+from util.path_util import PathUtil
+
+
+class SavedSummaryTestCase(SummaryFilesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.save_graph_data()
+        self.save_model()
+
+    def assert_same_summaries(self, summary, other_summary):
+        class_ids = summary.graph_index.get_all_class_ids()[:5]
+        class_names = [summary.graph_index.get_qualified_name(class_id) for class_id in class_ids]
+        for query, class_name in zip(build_synthetic_queries(5), class_names):
+            self.assertEqual(summary.get_summary(query, class_name), other_summary.get_summary(query, class_name))
+            self.assertEqual(summary.get_summary_only_query_by_method(query, 5),
+                             other_summary.get_summary_only_query_by_method(query, 5))
+
+
+class ServingArtifactsTest(SavedSummaryTestCase):
+
+    def test_same_summary(self):
+        summary = self.load_summary()
+        summary.export_serving_artifacts(self.serving_artifacts_dir)
+        served_summary = self.load_summary(self.serving_artifacts_dir)
+        self.assertIsNone(served_summary.graph_data)
+        self.assertEqual(served_summary.artifact_key, summary.artifact_key)
+        self.assert_same_summaries(summary, served_summary)
+
+    def test_refuse_stale_artifacts(self):
+        self.load_summary().export_serving_artifacts(self.serving_artifacts_dir)
+        # the graph is rebuilt
+        self.save_graph_data(class_num=TEST_CLASS_NUM + 10)
+        with self.assertRaises(Exception):
+            self.load_summary(self.serving_artifacts_dir)
+        summary = self.load_summary()
+        summary.export_serving_artifacts(self.serving_artifacts_dir)
+        self.load_summary(self.serving_artifacts_dir)
+        # the model is retrained
+        self.save_model(seed=42)
+        with self.assertRaises(Exception):
+            self.load_summary(self.serving_artifacts_dir)
+        self.assertNotEqual(self.load_summary().artifact_key, summary.artifact_key)
+
+
+class SnapshotTest(SavedSummaryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.snapshot_dir = PathUtil.summary_snapshot(pro_name=self.PRO_NAME, version=self.VERSION,
+                                                      model_type=self.MODEL_NAME)
+
+    def test_same_summary(self):
+        summary = self.load_summary()
+        summary.build_snapshot(self.snapshot_dir)
+        self.assertTrue(Summary.snapshot_exists(self.snapshot_dir))
+        snapshot_summary = Summary.from_snapshot(self.snapshot_dir, summary.source_fingerprints)
+        self.assertIsNone(snapshot_summary.graph_data)
+        self.assertEqual(snapshot_summary.artifact_key, summary.artifact_key)
+        self.assert_same_summaries(summary, snapshot_summary)
+
+    def test_refuse_stale_snapshot(self):
+        self.load_summary().build_snapshot(self.snapshot_dir)
+        self.save_graph_data(class_num=TEST_CLASS_NUM + 10)
+        source_fingerprints = Summary.get_source_fingerprints(self.PRO_NAME, self.VERSION, self.model_dir)
+        with self.assertRaises(Exception):
+            Summary.from_snapshot(self.snapshot_dir, source_fingerprints)
+        # the snapshot is not checked without the fingerprints
+        self.assertIsNotNone(Summary.from_snapshot(self.snapshot_dir))
+
+
+class LoadTest(SavedSummaryTestCase):
+
+    def load(self):
+        return Summary.load(self.PRO_NAME, self.VERSION, self.model_dir)
+
+    def test_skip_stale(self):
+        summary = self.load()
+        self.assertIsNotNone(summary.graph_data)
+        summary.build_snapshot(PathUtil.summary_snapshot(pro_name=self.PRO_NAME, version=self.VERSION,
+                                                         model_type=self.MODEL_NAME))
+        summary.export_serving_artifacts(self.serving_artifacts_dir)
+        # the snapshot is loaded
+        snapshot_summary = self.load()
+        self.assertIsNone(snapshot_summary.graph_data)
+        self.assertEqual(snapshot_summary.artifact_key, summary.artifact_key)
+        # the snapshot and the serving artifacts are stale after the graph is rebuilt
+        self.save_graph_data(class_num=TEST_CLASS_NUM + 10)
+        rebuilt_summary = self.load()
+        self.assertIsNotNone(rebuilt_summary.graph_data)
+        self.assertEqual(len(rebuilt_summary.graph_index.get_all_class_ids()),
+                         len(summary.graph_index.get_all_class_ids()) + 10)
+        self.assertNotEqual(rebuilt_summary.artifact_key, summary.artifact_key)
+
+
+class GetSummariesTest(unittest.TestCase):
+
+    def test_same_as_get_summary(self):
+        graph_data = build_synthetic_graph_data(class_num=TEST_CLASS_NUM)
+        summary = Summary.create(graph_data, create_synthetic_compound_model(graph_data))
+        class_names = [summary.graph_index.get_qualified_name(class_id)
+                       for class_id in summary.graph_index.get_all_class_ids()[:3]]
+        queries = build_synthetic_queries(3)
+        # the queries and the classes are repeated in the batch
+        batch = [(query, class_name) for query in queries for class_name in class_names]
+        batch.append(batch[0])
+        self.assertEqual(summary.get_summaries(batch), [summary.get_summary(query, class_name)
+                                                        for query, class_name in batch])
+        self.assertEqual(summary.get_summaries([(queries[0], "no.such.Class")]), [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
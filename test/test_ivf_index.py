@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from search.avg_w2v_ann import AVGW2VAnnSearch
+from search.ivf_index import IVFIndex
+
+
+class IVFIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        rand = np.random.RandomState(0)
+        self.vectors = rand.randn(2000, 32).astype(np.float32)
+        self.query_vectors = rand.randn(10, 32).astype(np.float32)
+        self.index = IVFIndex.build(self.vectors, list_num=64, probe_num=4)
+
+    def brute_force_search(self, query_vector, top_num, valid_doc_indexes=None):
+        scores = IVFIndex.normalize(self.vectors).dot(IVFIndex.normalize(query_vector))
+        doc_indexes = np.arange(len(self.vectors)) if valid_doc_indexes is None else np.asarray(valid_doc_indexes)
+        order = np.lexsort((doc_indexes, -scores[doc_indexes]))[:top_num]
+        return doc_indexes[order], scores[doc_indexes][order]
+
+    def assert_same_results(self, results, expected_results):
+        np.testing.assert_array_equal(results[0], expected_results[0])
+        np.testing.assert_allclose(results[1], expected_results[1], rtol=1e-5)
+
+    def test_exact_when_all_lists_probed(self):
+        for query_vector in self.query_vectors:
+            self.assert_same_results(self.index.search(query_vector, 10, probe_num=self.index.get_list_num()),
+                                     self.brute_force_search(query_vector, 10))
+
+    def test_valid_docs(self):
+        # the small valid doc set is scored exactly whatever the probe_num is
+        valid_doc_indexes = np.arange(0, 2000, 50)
+        for query_vector in self.query_vectors:
+            self.assert_same_results(self.index.search(query_vector, 5, valid_doc_indexes),
+                                     self.brute_force_search(query_vector, 5, valid_doc_indexes))
+        # the large valid doc set probes the lists, only the valid docs are returned
+        valid_doc_indexes = np.arange(0, 2000, 2)
+        doc_indexes, scores = self.index.search(self.query_vectors[0], 10, valid_doc_indexes)
+        self.assertEqual(len(doc_indexes), 10)
+        self.assertTrue(np.all(doc_indexes % 2 == 0))
+
+    def test_save_load(self):
+        index_dir = tempfile.mkdtemp()
+        try:
+            self.index.save(index_dir)
+            self.assertTrue(IVFIndex.exists(index_dir))
+            loaded_index = IVFIndex.load(index_dir)
+            self.assertIsInstance(loaded_index.list_vectors, np.memmap)
+            self.assertEqual(loaded_index.probe_num, self.index.probe_num)
+            for query_vector in self.query_vectors:
+                self.assert_same_results(loaded_index.search(query_vector, 10), self.index.search(query_vector, 10))
+        finally:
+            shutil.rmtree(index_dir)
+
+
+class AVGW2VAnnSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.model_dir)
+
+    def create_model(self, seed, missing_doc_indexes=()):
+        # the parts of the AVGW2VFLModel used by the AVGW2VAnnSearch, the doc i is "doc i" and the query is its vector
+        vectors = np.random.RandomState(seed).randn(500, 16).astype(np.float32)
+
+        def doc_index2doc(doc_index):
+            if doc_index in missing_doc_indexes:
+                return None
+            return SimpleNamespace(get_document_id=lambda: doc_index, get_name=lambda: "doc %d" % doc_index)
+
+        return SimpleNamespace(avg_w2v_model=SimpleNamespace(vectors=vectors), model_dir_path=self.model_dir,
+                               string2vector=lambda query: vectors[int(query.split()[1])],
+                               doc_index2doc=doc_index2doc)
+
+    def test_load(self):
+        model = self.create_model(seed=0)
+        self.assertIsNone(AVGW2VAnnSearch.load(model))
+        AVGW2VAnnSearch.build(model, list_num=16)
+        self.assertIsNotNone(AVGW2VAnnSearch.load(model))
+
+    def test_refuse_other_vectors(self):
+        AVGW2VAnnSearch.build(self.create_model(seed=0), list_num=16)
+        # the model is retrained with the same number of documents
+        with self.assertLogs("search.avg_w2v_ann", level="WARNING"):
+            self.assertIsNone(AVGW2VAnnSearch.load(self.create_model(seed=1)))
+
+    def test_rank_found_docs(self):
+        model = self.create_model(seed=0)
+        index = IVFIndex.build(model.avg_w2v_model.vectors, list_num=16)
+        index.probe_num = index.get_list_num()
+        doc_ids = [result.doc_id for result in AVGW2VAnnSearch(model, index).search("doc 7", 5)]
+        self.assertEqual(doc_ids[0], 7)
+        # the docs not in the document collection are skipped without leaving a gap in the rankings
+        model = self.create_model(seed=0, missing_doc_indexes=doc_ids[1:3])
+        results = AVGW2VAnnSearch(model, index).search("doc 7", 5)
+        self.assertEqual([result.doc_id for result in results], [doc_ids[0]] + doc_ids[3:])
+        self.assertEqual([result.ranking for result in results], [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
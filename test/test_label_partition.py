@@ -0,0 +1,179 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from script.benchmark.synthetic import build_synthetic_graph_data, build_synthetic_queries, SyntheticSearchModel, \
+    create_synthetic_compound_model
+from script.summary.generate_summary import Summary
+from search.avg_w2v_ann import AVGW2VAnnSearch
+from search.ivf_index import IVFIndex
+from search.label_partition import LabelPartitionIndex
+from test.fixture import TEST_CLASS_NUM
+
+
+class LabelPartitionIndexTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph_data = build_synthetic_graph_data(class_num=TEST_CLASS_NUM)
+        cls.model = SyntheticSearchModel.create(cls.graph_data)
+        cls.label_partitions = LabelPartitionIndex.build(cls.model,
+                                                         LabelPartitionIndex.get_label_2_doc_ids(cls.graph_data))
+        cls.queries = build_synthetic_queries(5)
+
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.index_dir)
+
+    def test_score(self):
+        for query in self.queries:
+            query_vectors = self.label_partitions.encode(query)
+            full_doc_score_vec = self.model.get_full_doc_score_vec(query)
+            for name in LabelPartitionIndex.PARTITION_NAMES:
+                partition = self.label_partitions.get_partition(name)
+                np.testing.assert_allclose(self.label_partitions.score(query_vectors, name),
+                                           full_doc_score_vec[partition.doc_indexes], rtol=1e-5)
+
+    def test_search(self):
+        method_ids = set(self.label_partitions.get_partition("method").doc_id_list)
+        for query in self.queries:
+            self.assertEqual([result.doc_id for result in self.label_partitions.search(query, "method", 10)],
+                             [result.doc_id for result in self.model.search(query, 10, method_ids)])
+
+    def test_save_load(self):
+        self.label_partitions.save(self.index_dir)
+        loaded_label_partitions = LabelPartitionIndex.load(self.model, self.index_dir)
+        self.assertIsInstance(loaded_label_partitions.get_partition("sentence").blocks[0], np.memmap)
+        query_vectors = self.label_partitions.encode(self.queries[0])
+        for name in LabelPartitionIndex.PARTITION_NAMES:
+            np.testing.assert_array_equal(loaded_label_partitions.score(query_vectors, name),
+                                          self.label_partitions.score(query_vectors, name))
+
+    def test_check_scores(self):
+        self.label_partitions.check_scores()
+        # the partition of other vectors is scored differently from the model
+        retrained_model = SyntheticSearchModel.create(self.graph_data, seed=1)
+        retrained_label_partitions = LabelPartitionIndex.build(
+            retrained_model, LabelPartitionIndex.get_label_2_doc_ids(self.graph_data))
+        other_label_partitions = LabelPartitionIndex(self.model, retrained_label_partitions.name_2_partition)
+        with self.assertRaises(Exception):
+            other_label_partitions.check_scores(self.queries)
+
+    def test_check_compound_scores(self):
+        graph_data = build_synthetic_graph_data(class_num=TEST_CLASS_NUM)
+        model = create_synthetic_compound_model(graph_data)
+        LabelPartitionIndex.build(model, LabelPartitionIndex.get_label_2_doc_ids(graph_data)).check_scores()
+
+    def test_refuse_retrained_model(self):
+        self.label_partitions.save(self.index_dir)
+        # the same documents with other vectors
+        retrained_model = SyntheticSearchModel.create(self.graph_data, seed=1)
+        self.assertIsNone(LabelPartitionIndex.load(retrained_model, self.index_dir))
+
+
+class CascadeScoreTest(unittest.TestCase):
+    TOP_NUM = 300
+
+    @classmethod
+    def setUpClass(cls):
+        graph_data = build_synthetic_graph_data(class_num=200)
+        model = create_synthetic_compound_model(graph_data)
+        cls.summary = Summary.create(graph_data, model)
+        cls.label_partitions = cls.summary.label_partitions
+        first_sub_model = model.model_list[0]
+        # all lists are probed, so the ann search finds the same top docs as the exact first stage
+        index = IVFIndex.build(first_sub_model.doc_vectors, list_num=32)
+        index.probe_num = index.get_list_num()
+        cls.first_stage_ann = AVGW2VAnnSearch(first_sub_model, index)
+        cls.queries = build_synthetic_queries(5)
+
+    def test_rescored_docs(self):
+        for query in self.queries:
+            query_vectors = self.label_partitions.encode(query)
+            for name in ["method", "sentence"]:
+                scores = self.label_partitions.score(query_vectors, name)
+                cascade_scores = self.label_partitions.cascade_score(query_vectors, name, self.TOP_NUM)
+                first_stage_scores = self.label_partitions.score(query_vectors, name, sub_model_indexes=[0])
+                rescored_positions = np.argsort(-first_stage_scores, kind="stable")[:self.TOP_NUM]
+                # the top docs of the first stage have the scores of the whole model, and the others are below them
+                np.testing.assert_allclose(cascade_scores[rescored_positions], scores[rescored_positions], rtol=1e-6)
+                self.assertLess(np.delete(cascade_scores, rescored_positions).max(),
+                                cascade_scores[rescored_positions].min())
+
+    def test_ann_first_stage(self):
+        for query in self.queries:
+            query_vectors = self.label_partitions.encode(query)
+            for name in ["method", "sentence"]:
+                exact_scores = self.label_partitions.cascade_score(query_vectors, name, self.TOP_NUM)
+                ann_scores = self.label_partitions.cascade_score(query_vectors, name, self.TOP_NUM,
+                                                                 first_stage_ann=self.first_stage_ann)
+                rescored_positions = np.argsort(-exact_scores, kind="stable")[:self.TOP_NUM]
+                np.testing.assert_allclose(ann_scores[rescored_positions], exact_scores[rescored_positions],
+                                           rtol=1e-6)
+                # the docs not found by the ann search are ranked below the rescored docs
+                self.assertLess(np.delete(ann_scores, rescored_positions).max(),
+                                ann_scores[rescored_positions].min())
+
+    def test_small_partition(self):
+        query_vectors = self.label_partitions.encode(self.queries[0])
+        partition_size = len(self.label_partitions.get_partition("class"))
+        scores = self.label_partitions.score(query_vectors, "class")
+        np.testing.assert_array_equal(self.label_partitions.cascade_score(query_vectors, "class", partition_size),
+                                      scores)
+        np.testing.assert_array_equal(
+            self.label_partitions.cascade_score(query_vectors, "class", partition_size,
+                                                first_stage_ann=self.first_stage_ann), scores)
+
+    def test_set_cascade(self):
+        mode_name = "get_summary_only_query_by_method"
+        summaries = [self.summary.get_summary_only_query_by_method(query, 5) for query in self.queries]
+        # all candidates are rescored, so the summaries are not changed
+        self.summary.set_cascade({mode_name: len(self.label_partitions.get_partition("sentence"))})
+        try:
+            self.assertEqual([self.summary.get_summary_only_query_by_method(query, 5) for query in self.queries],
+                             summaries)
+        finally:
+            self.summary.set_cascade({})
+
+
+class AnnCascadeTest(unittest.TestCase):
+    MODE_NAME_2_TOP_NUM = {"get_summary_only_query_by_method": 300}
+
+    def setUp(self):
+        graph_data = build_synthetic_graph_data(class_num=200)
+        model = create_synthetic_compound_model(graph_data)
+        self.summary = Summary.create(graph_data, model)
+        self.index = IVFIndex.build(model.model_list[0].doc_vectors, list_num=32)
+        self.first_stage_ann = AVGW2VAnnSearch(model.model_list[0], self.index)
+        self.queries = build_synthetic_queries(5)
+
+    def test_used_by_recall(self):
+        self.index.probe_num = self.index.get_list_num()
+        top_num_2_recall = self.summary.set_ann_cascade(self.MODE_NAME_2_TOP_NUM, self.queries,
+                                                        first_stage_ann=self.first_stage_ann)
+        # all lists are probed, so the recall is the same as the exact first stage
+        self.assertEqual(top_num_2_recall, {300: self.summary.label_partitions.cascade_recall(self.queries, 300)})
+        self.assertGreaterEqual(top_num_2_recall[300], 0.9)
+        self.assertIs(self.summary.cascade_first_stage, self.first_stage_ann)
+        self.assertEqual(self.summary.cascade_top_nums, self.MODE_NAME_2_TOP_NUM)
+
+    def test_not_used_by_low_recall(self):
+        self.index.probe_num = 1
+        top_num_2_recall = self.summary.set_ann_cascade(self.MODE_NAME_2_TOP_NUM, self.queries, min_recall=0.99,
+                                                        first_stage_ann=self.first_stage_ann)
+        self.assertLess(top_num_2_recall[300], 0.99)
+        self.assertIsNone(self.summary.cascade_first_stage)
+        self.assertEqual(self.summary.cascade_top_nums, {})
+
+    def test_index_not_built(self):
+        # the synthetic model has no avg_w2v model dir
+        self.assertIsNone(self.summary.set_ann_cascade(self.MODE_NAME_2_TOP_NUM, self.queries))
+        self.assertEqual(self.summary.cascade_top_nums, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from script.benchmark.synthetic import build_synthetic_graph_data, build_synthetic_queries, SyntheticSearchModel
+from search.model_vectors import ModelVectors
+from test.fixture import TEST_CLASS_NUM
+
+
+class ModelVectorsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.graph_data = build_synthetic_graph_data(class_num=TEST_CLASS_NUM)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_path)
+
+    def test_map(self):
+        model = SyntheticSearchModel.create(self.graph_data)
+        saved_names = ModelVectors.export(model, self.dir_path)
+        self.assertIn("synthetic.word_vectors", saved_names)
+        # the model loaded again in another worker
+        mapped_model = SyntheticSearchModel.create(self.graph_data)
+        self.assertGreater(ModelVectors.map(mapped_model, self.dir_path), 0)
+        self.assertIsInstance(mapped_model.word_vectors, np.memmap)
+        self.assertFalse(mapped_model.word_vectors.flags.writeable)
+        self.assertEqual(ModelVectors.fingerprint(mapped_model), ModelVectors.fingerprint(model))
+        for query in build_synthetic_queries(5):
+            np.testing.assert_array_equal(mapped_model.get_full_doc_score_vec(query),
+                                          model.get_full_doc_score_vec(query))
+
+    def test_refuse_other_model(self):
+        ModelVectors.export(SyntheticSearchModel.create(self.graph_data), self.dir_path)
+        # the vectors of the same shape from the retrained model
+        retrained_model = SyntheticSearchModel.create(self.graph_data, seed=1)
+        with self.assertRaises(Exception):
+            ModelVectors.map(retrained_model, self.dir_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
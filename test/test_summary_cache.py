@@ -0,0 +1,109 @@
+import re
+import unittest
+from unittest import mock
+
+from sekg.ir.preprocessor.base import SimplePreprocessor
+
+from script.benchmark.util import clear_model_cache
+from service.app import CLASS_NUMBER
+from service.summary_cache import SummaryResultCache
+from test.fixture import create_test_summary
+
+
+class CamelCasePreprocessor(SimplePreprocessor):
+    """
+    split the camel case words before lowering them, like the CodeDocPreprocessor of the real models.
+    """
+    CAMEL_CASE_PATTERN = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+    def clean(self, text):
+        return super().clean(self.CAMEL_CASE_PATTERN.sub(" ", text))
+
+
+class SummaryResultCacheTest(unittest.TestCase):
+    ARTIFACT_KEY = ("synthetic", "memory", "synthetic", "v1")
+
+    def make_key(self, query, artifact_key=ARTIFACT_KEY):
+        return artifact_key, "get_summary_only_query_by_method", query, 10
+
+    def test_lru_eviction(self):
+        summary_cache = SummaryResultCache(max_size=2)
+        summary_cache.put(self.make_key("a"), "result a")
+        summary_cache.put(self.make_key("b"), "result b")
+        # "a" is used after "b", so "b" is evicted
+        self.assertEqual(summary_cache.get(self.make_key("a")), "result a")
+        summary_cache.put(self.make_key("c"), "result c")
+        self.assertIsNone(summary_cache.get(self.make_key("b")))
+        self.assertEqual(summary_cache.get(self.make_key("c")), "result c")
+        self.assertEqual(summary_cache.get_statistics()["eviction"], 1)
+
+    def test_ttl_expiration(self):
+        summary_cache = SummaryResultCache(ttl=10)
+        with mock.patch("service.summary_cache.time.monotonic", return_value=100.0):
+            summary_cache.put(self.make_key("a"), "result a")
+        with mock.patch("service.summary_cache.time.monotonic", return_value=105.0):
+            self.assertEqual(summary_cache.get(self.make_key("a")), "result a")
+        with mock.patch("service.summary_cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(summary_cache.get(self.make_key("a")))
+        self.assertEqual(summary_cache.get_statistics()["expiration"], 1)
+
+    def test_artifact_change(self):
+        summary_cache = SummaryResultCache()
+        summary_cache.put(self.make_key("a"), "result a")
+        other_artifact_key = self.ARTIFACT_KEY[:3] + ("v2",)
+        self.assertIsNone(summary_cache.get(self.make_key("a", other_artifact_key)))
+        # the results of the old artifacts are removed
+        self.assertIsNone(summary_cache.get(self.make_key("a")))
+        self.assertEqual(summary_cache.get_statistics()["invalidation"], 1)
+
+    def test_old_artifact_keys_bounded(self):
+        summary_cache = SummaryResultCache()
+        summary_cache.MAX_OLD_ARTIFACT_KEY_NUM = 2
+        artifact_keys = [self.ARTIFACT_KEY[:3] + ("v%d" % version,) for version in range(5)]
+        for artifact_key in artifact_keys:
+            summary_cache.put(self.make_key("a", artifact_key), "result a")
+        # only the last replaced ones are kept
+        self.assertEqual(list(summary_cache.old_artifact_keys), artifact_keys[2:4])
+        summary_cache.put(self.make_key("b", artifact_keys[3]), "result b")
+        self.assertIsNone(summary_cache.get(self.make_key("b", artifact_keys[3])))
+        self.assertEqual(summary_cache.get(self.make_key("a", artifact_keys[4])), "result a")
+
+    def test_get_summary(self):
+        summary = create_test_summary()
+        summary_cache = SummaryResultCache()
+        query = "word12 word34"
+        expected_summary = summary.get_summary_only_query_by_method(query, 5)
+        self.assertEqual(summary_cache.get_summary(summary, "get_summary_only_query_by_method", query, 5),
+                         expected_summary)
+        self.assertEqual(summary_cache.get_summary(summary, "get_summary_only_query_by_method", " word12  word34 ", 5),
+                         expected_summary)
+        self.assertEqual(summary_cache.get_statistics()["hit"], 1)
+
+    def test_camel_case_query(self):
+        summary = create_test_summary(preprocessor=CamelCasePreprocessor())
+        mode_name = "get_summary_only_query_by_method"
+
+        def get_uncached_summary(query):
+            clear_model_cache(summary.model, summary.query_encoding_cache)
+            return getattr(summary, mode_name)(query, CLASS_NUMBER)
+
+        camel_case_query = "word12Word34 word56"
+        lowered_query = camel_case_query.lower()
+        camel_case_summary = get_uncached_summary(camel_case_query)
+        lowered_summary = get_uncached_summary(lowered_query)
+        # "word12word34" is not a word of the model, so the summaries are different
+        self.assertNotEqual(camel_case_summary, lowered_summary)
+
+        summary_cache = SummaryResultCache()
+        clear_model_cache(summary.model, summary.query_encoding_cache)
+        self.assertEqual(summary_cache.get_summary(summary, mode_name, "  word12Word34   word56 ", CLASS_NUMBER),
+                         camel_case_summary)
+        # the query differs only in case is not served by the cached result of the camel case query
+        self.assertEqual(summary_cache.get_summary(summary, mode_name, lowered_query, CLASS_NUMBER), lowered_summary)
+        self.assertEqual(summary_cache.get_summary(summary, mode_name, camel_case_query, CLASS_NUMBER),
+                         camel_case_summary)
+        self.assertEqual(summary_cache.get_statistics()["hit"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
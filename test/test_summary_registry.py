@@ -0,0 +1,87 @@
+import threading
+import unittest
+
+from search.model_vectors import ModelVectors
+from service.summary_registry import SummaryRegistry, estimate_memory_kb
+from test.fixture import create_test_summary, TEST_CLASS_NUM
+
+
+class SummaryRegistryTest(unittest.TestCase):
+    DEFAULT_KEY = ("synthetic", "v1", "synthetic")
+
+    def setUp(self):
+        self.loaded_keys = []
+
+    def load_synthetic_summary(self, pro_name, version, model_name):
+        self.loaded_keys.append((pro_name, version, model_name))
+        return create_test_summary(class_num=TEST_CLASS_NUM if version == "v1" else TEST_CLASS_NUM * 2)
+
+    def create_registry(self, memory_budget_mb=None, estimate_memory=estimate_memory_kb):
+        return SummaryRegistry(self.DEFAULT_KEY, memory_budget_mb=memory_budget_mb,
+                               load=self.load_synthetic_summary, pro_names=["synthetic"],
+                               estimate_memory=estimate_memory)
+
+    def load_concurrently(self, registry, keys):
+        threads = [threading.Thread(target=registry.get, args=key) for key in keys]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_lazy_load(self):
+        registry = self.create_registry()
+        self.assertEqual(len(registry), 0)
+        self.load_concurrently(registry, [self.DEFAULT_KEY] * 4)
+        # the concurrent requests wait for one loading
+        self.assertEqual(self.loaded_keys, [self.DEFAULT_KEY])
+        summary = registry.get(*self.DEFAULT_KEY)
+        self.assertIs(registry.get(*registry.resolve_key(version="")), summary)
+        self.assertEqual(registry.get_statistics()["load"], 1)
+        with self.assertRaises(KeyError):
+            registry.get("other", "v1", "synthetic")
+
+    def test_evict_least_recently_used(self):
+        # each summary is 512kb, so the two summaries are over the budget
+        registry = self.create_registry(memory_budget_mb=0.75, estimate_memory=lambda summary: 512)
+        registry.get("synthetic", "v1", "synthetic")
+        registry.get("synthetic", "v2", "synthetic")
+        self.assertEqual([bundle.key for bundle in registry.get_bundles()], [("synthetic", "v2", "synthetic")])
+        self.assertEqual(registry.get_statistics()["eviction"], 1)
+        # the evicted summary is loaded again at its next use
+        registry.get("synthetic", "v1", "synthetic")
+        self.assertEqual(self.loaded_keys.count(("synthetic", "v1", "synthetic")), 2)
+
+    def test_memory_of_concurrent_loads(self):
+        registry = self.create_registry()
+        self.load_concurrently(registry, [("synthetic", version, "synthetic") for version in ["v1", "v2"]])
+        bundles = registry.get_bundles()
+        self.assertEqual(len(bundles), 2)
+        for bundle in bundles:
+            summary = bundle.summary
+            # the estimate of each summary doesn't depend on the other one loaded at the same time
+            self.assertEqual(bundle.memory_kb * 1024, summary.get_memory_bytes())
+            self.assertGreaterEqual(summary.get_memory_bytes(), summary.model.doc_vectors.nbytes +
+                                    summary.model.word_vectors.nbytes + summary.graph_data.get_array_bytes())
+            self.assertEqual(ModelVectors.get_array_bytes(summary.model),
+                             summary.model.doc_vectors.nbytes + summary.model.word_vectors.nbytes)
+        v1_kb, v2_kb = [bundle.memory_kb for bundle in sorted(bundles, key=lambda bundle: bundle.key)]
+        self.assertLess(v1_kb, v2_kb)
+
+    def test_evict_by_estimate(self):
+        summary_kb = estimate_memory_kb(self.load_synthetic_summary(*self.DEFAULT_KEY))
+        registry = self.create_registry(memory_budget_mb=1.5 * summary_kb / 1024)
+        registry.get("synthetic", "v1", "synthetic")
+        registry.get("synthetic", "v1", "other")
+        self.assertEqual([bundle.key for bundle in registry.get_bundles()], [("synthetic", "v1", "other")])
+        self.assertEqual(registry.get_statistics()["eviction"], 1)
+
+    def test_evict(self):
+        registry = self.create_registry()
+        registry.get(*self.DEFAULT_KEY)
+        self.assertTrue(registry.evict(*self.DEFAULT_KEY))
+        self.assertFalse(registry.evict(*self.DEFAULT_KEY))
+        self.assertEqual(len(registry), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from service.summary_registry import SummaryRegistry, SummaryReloadWatcher
+from test.fixture import SummaryFilesTestCase, TEST_CLASS_NUM
+from util.path_util import PathUtil
+
+
+class SummaryReloadTest(SummaryFilesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.key = (self.PRO_NAME, self.VERSION, self.MODEL_NAME)
+        self.registry = SummaryRegistry(self.key, pro_names=[self.PRO_NAME])
+        self.save_model()
+
+    def save_class_names(self, class_num):
+        graph_data = self.save_graph_data(class_num=class_num)
+        return {graph_data.get_node_info_dict(class_id)["properties"]["qualified_name"]
+                for class_id in graph_data.get_node_ids_by_label("class")}
+
+    def build_serving_files(self):
+        summary = self.load_summary()
+        summary.export_serving_artifacts(self.serving_artifacts_dir)
+        summary.build_snapshot(PathUtil.summary_snapshot(pro_name=self.PRO_NAME, version=self.VERSION,
+                                                         model_type=self.MODEL_NAME))
+
+    def test_reload_rebuilt_graph(self):
+        old_class_names = self.save_class_names(TEST_CLASS_NUM)
+        self.build_serving_files()
+        old_summary = self.registry.get(*self.key)
+        # it is loaded from the snapshot
+        self.assertIsNone(old_summary.graph_data)
+
+        new_class_name = sorted(self.save_class_names(TEST_CLASS_NUM + 10) - old_class_names)[0]
+        self.assertIsNone(old_summary.graph_index.find_node_id_by_qualified_name(new_class_name))
+        self.assertEqual(self.registry.reload(*self.key)["state"], "done")
+        summary = self.registry.get(*self.key)
+        # the stale snapshot and serving artifacts are skipped, it is loaded from the rebuilt graph data
+        self.assertIsNotNone(summary.graph_data)
+        self.assertIsNotNone(summary.graph_index.find_node_id_by_qualified_name(new_class_name))
+        self.assertNotEqual(summary.artifact_key, old_summary.artifact_key)
+
+        self.build_serving_files()
+        self.registry.reload(*self.key)
+        snapshot_summary = self.registry.get(*self.key)
+        self.assertIsNone(snapshot_summary.graph_data)
+        self.assertIsNotNone(snapshot_summary.graph_index.find_node_id_by_qualified_name(new_class_name))
+        self.assertEqual(snapshot_summary.artifact_key, summary.artifact_key)
+
+    def test_watch_retrained_model(self):
+        self.save_graph_data()
+        old_summary = self.registry.get(*self.key)
+        watcher = SummaryReloadWatcher(self.registry, interval=0)
+        self.assertEqual(watcher.check(), [])
+
+        self.save_model(seed=42)
+        # the changed files are reloaded after they are unchanged for one poll
+        self.assertEqual(watcher.check(), [])
+        self.assertEqual(watcher.check(), [self.key])
+        summary = self.registry.get(*self.key)
+        self.assertIsNot(summary, old_summary)
+        self.assertNotEqual(summary.artifact_key, old_summary.artifact_key)
+        self.assertEqual(watcher.check(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import hashlib
+from pathlib import Path
+
+
+class ArtifactUtil:
+    """
+    helper for the artifacts loaded for serving, e.g. the graph data file and the model dirs.
+    """
+
+    @staticmethod
+    def list_files(path, exclude_dir_names=()):
+        """
+        list all files of the path, sorted by the file path.
+        :param path: a file or a dir
+        :param exclude_dir_names: the files in the sub dirs of these names are not listed, e.g. the indexes built
+        in the model dir after training
+        :return: list of Path, [] if the path is not exist
+        """
+        path = Path(path)
+        if path.is_file():
+            return [path]
+        if path.is_dir():
+            return sorted(file_path for file_path in path.rglob("*") if file_path.is_file() and not any(
+                part in exclude_dir_names for part in file_path.relative_to(path).parts[:-1]))
+        return []
+
+    @staticmethod
+    def fingerprint(*paths, exclude_dir_names=()):
+        """
+        the fingerprint of the files and dirs, it is changed when any file is added, replaced or modified.
+        it only uses the path, size and modify time of the files, the content is not read.
+        :param paths: the files or dirs
+        :param exclude_dir_names: the sub dirs of these names are not included, see list_files()
+        :return: a hex str
+        """
+        digest = hashlib.md5()
+        for path in paths:
+            for file_path in ArtifactUtil.list_files(path, exclude_dir_names):
+                stat = file_path.stat()
+                digest.update(("%s:%d:%d;" % (file_path, stat.st_size, stat.st_mtime_ns)).encode("utf-8"))
+        return digest.hexdigest()
@@ -0,0 +1,33 @@
+class MemoryUtil:
+    """
+    helper for the memory of the current process (linux only), e.g. the memory reported by the benchmarks.
+    """
+
+    @staticmethod
+    def process_memory():
+        """
+        the memory of the current process in kb, read from /proc/self/smaps_rollup.
+        the rss counts the shared pages in each process, the pss divides them by the number of the processes sharing
+        them.
+        :return: dict of rss, pss, shared and private memory, {} if it is not linux
+        """
+        field_2_name = {"Rss": "rss_kb", "Pss": "pss_kb", "Shared_Clean": "shared_clean_kb",
+                        "Shared_Dirty": "shared_dirty_kb", "Private_Clean": "private_clean_kb",
+                        "Private_Dirty": "private_dirty_kb"}
+        memory = {}
+        try:
+            with open("/proc/self/smaps_rollup") as f:
+                for line in f:
+                    field = line.split(":")[0]
+                    if field in field_2_name:
+                        memory[field_2_name[field]] = int(line.split()[1])
+        except OSError:
+            return {}
+        return memory
+
+    @staticmethod
+    def rss_kb():
+        """
+        :return: the rss of the current process in kb, 0 if it is not linux
+        """
+        return MemoryUtil.process_memory().get("rss_kb", 0)
@@ -0,0 +1,177 @@
+import bisect
+import threading
+import time
+
+
+class NullStage:
+    """
+    the stage used when the metrics are disabled, it does nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class StageTimer:
+    """
+    time a stage by the monotonic clock and observe the duration into the metrics when the stage exits.
+    """
+
+    def __init__(self, metrics, stage_name):
+        self.metrics = metrics
+        self.stage_name = stage_name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(self.stage_name, time.perf_counter() - self.start)
+        return False
+
+
+class LatencyHistogram:
+    """
+    the cumulative histogram of the latency in seconds, like the histogram of prometheus.
+    """
+
+    def __init__(self, buckets):
+        """
+        :param buckets: the upper bounds of the buckets sorted ascending, the +Inf bucket is added
+        """
+        self.buckets = list(buckets)
+        # the count of each bucket, not cumulative, the last one is the +Inf bucket
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        counts = []
+        total = 0
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            counts.append(total)
+        return counts
+
+
+class SummaryMetrics:
+    """
+    the metrics of the summary service: the latency histogram of each stage, e.g. "score/AVGW2VFLModel",
+    "graph_lookup" or "json_encode", the request counts and the in-flight requests.
+    they are exposed in the prometheus text format by render().
+
+    the stages are timed by "with metrics.stage(name):". when the metrics are disabled, stage() returns a shared
+    object doing nothing, and nothing is recorded.
+    """
+    DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    PREFIX = "apisummary"
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.stage_2_histogram = {}
+        # (endpoint, status) -> count
+        self.request_2_count = {}
+        self.in_flight_num = 0
+
+    def stage(self, stage_name):
+        if not self.enabled:
+            return NULL_STAGE
+        return StageTimer(self, stage_name)
+
+    def observe(self, stage_name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.stage_2_histogram.get(stage_name, None)
+            if histogram is None:
+                histogram = LatencyHistogram(self.buckets)
+                self.stage_2_histogram[stage_name] = histogram
+            histogram.observe(seconds)
+
+    def start_request(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.in_flight_num += 1
+
+    def finish_request(self, endpoint, status, seconds):
+        """
+        :param endpoint: the name of the endpoint
+        :param status: the http status code
+        :param seconds: the latency of the request
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.in_flight_num -= 1
+            key = (endpoint, str(status))
+            self.request_2_count[key] = self.request_2_count.get(key, 0) + 1
+        self.observe("request/%s" % endpoint, seconds)
+
+    @staticmethod
+    def escape_label(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    @staticmethod
+    def format_value(value):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(float(value))
+
+    def render(self, gauges=None):
+        """
+        render the metrics in the prometheus text format.
+        :param gauges: the extra gauges, name -> (help, value), e.g. the statistics of the result cache,
+        the value could be a list of (labels dict, value) for a gauge with labels
+        :return: the text
+        """
+        prefix = self.PREFIX
+        with self.lock:
+            lines = [
+                "# HELP %s_stage_latency_seconds the latency of each stage of the summary" % prefix,
+                "# TYPE %s_stage_latency_seconds histogram" % prefix,
+            ]
+            for stage_name, histogram in sorted(self.stage_2_histogram.items()):
+                stage_label = self.escape_label(stage_name)
+                for upper_bound, count in zip(self.buckets + (float("inf"),), histogram.cumulative_counts()):
+                    lines.append('%s_stage_latency_seconds_bucket{stage="%s",le="%s"} %d' % (
+                        prefix, stage_label, self.format_value(upper_bound), count))
+                lines.append('%s_stage_latency_seconds_sum{stage="%s"} %s' % (
+                    prefix, stage_label, self.format_value(histogram.sum)))
+                lines.append('%s_stage_latency_seconds_count{stage="%s"} %d' % (prefix, stage_label, histogram.count))
+
+            lines.append("# HELP %s_requests_total the number of requests" % prefix)
+            lines.append("# TYPE %s_requests_total counter" % prefix)
+            for (endpoint, status), count in sorted(self.request_2_count.items()):
+                lines.append('%s_requests_total{endpoint="%s",status="%s"} %d' % (
+                    prefix, self.escape_label(endpoint), self.escape_label(status), count))
+
+            lines.append("# HELP %s_in_flight_requests the number of requests being served" % prefix)
+            lines.append("# TYPE %s_in_flight_requests gauge" % prefix)
+            lines.append("%s_in_flight_requests %d" % (prefix, self.in_flight_num))
+
+        for name, (help_text, value) in sorted((gauges or {}).items()):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_text))
+            lines.append("# TYPE %s_%s gauge" % (prefix, name))
+            if not isinstance(value, list):
+                lines.append("%s_%s %s" % (prefix, name, self.format_value(value)))
+                continue
+            for labels, labelled_value in value:
+                label_text = ",".join('%s="%s"' % (label_name, self.escape_label(label_value)) for
+                                      label_name, label_value in sorted(labels.items()))
+                lines.append("%s_%s{%s} %s" % (prefix, name, label_text, self.format_value(labelled_value)))
+        return "\n".join(lines) + "\n"
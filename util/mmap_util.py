@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import numpy as np
+
+
+class MmapStringArray:
+    """
+    a read-only list of str stored in flat files, the utf-8 bytes of all str are concatenated in "{prefix}.bin"
+    and the str at index i is bin[offsets[i]:offsets[i + 1]], the offsets are in "{prefix}.offsets.npy".
+    both files are memory-mapped, so the processes loading the same files share one copy in the page cache.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __getitem__(self, index):
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self):
+        return "<MmapStringArray size=%d>" % len(self)
+
+
+class MmapUtil:
+    """
+    save the serving data as flat files and load them memory-mapped and read-only.
+    """
+
+    @staticmethod
+    def array_path(dir_path, name):
+        return str(Path(dir_path) / ("%s.npy" % name))
+
+    @staticmethod
+    def save_array(dir_path, name, array):
+        Path(dir_path).mkdir(exist_ok=True, parents=True)
+        np.save(MmapUtil.array_path(dir_path, name), np.ascontiguousarray(array))
+
+    @staticmethod
+    def load_array(dir_path, name):
+        """
+        :return: the read-only memory-mapped numpy array
+        """
+        return np.load(MmapUtil.array_path(dir_path, name), mmap_mode="r")
+
+    @staticmethod
+    def save_strings(dir_path, name, strings):
+        """
+        save list of str as a MmapStringArray.
+        :param dir_path: the dir of the files
+        :param name: the prefix of the files
+        :param strings: list of str
+        """
+        encoded_strings = [string.encode("utf-8") for string in strings]
+        offsets = np.zeros(len(encoded_strings) + 1, dtype=np.int64)
+        np.cumsum([len(encoded_string) for encoded_string in encoded_strings], out=offsets[1:])
+        MmapUtil.save_array(dir_path, "%s.offsets" % name, offsets)
+        with open(str(Path(dir_path) / ("%s.bin" % name)), "wb") as f:
+            for encoded_string in encoded_strings:
+                f.write(encoded_string)
+
+    @staticmethod
+    def load_strings(dir_path, name):
+        offsets = MmapUtil.load_array(dir_path, "%s.offsets" % name)
+        data_path = str(Path(dir_path) / ("%s.bin" % name))
+        if offsets[-1] == 0:
+            # an empty file could not be memory-mapped
+            return MmapStringArray(offsets, np.zeros(0, dtype=np.uint8))
+        return MmapStringArray(offsets, np.memmap(data_path, dtype=np.uint8, mode="r"))
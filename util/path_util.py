@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from definitions import OUTPUT_DIR, BENCHMARK_DIR, DATA_DIR
+from definitions import OUTPUT_DIR, BENCHMARK_DIR, DATA_DIR, LOG_DIR
 
 
 class PathUtil:
@@ -295,3 +295,39 @@ class PathUtil:
         model_dir = Path(OUTPUT_DIR) / "sim_models" / pro_name / "method_search" / model_type
         model_dir.mkdir(exist_ok=True, parents=True)
         return str(model_dir)
+
+    @staticmethod
+    def model_bundle(pro_name, version, model_type):
+        bundle_root_dir = Path(OUTPUT_DIR) / "model_bundle" / pro_name / version / model_type
+        bundle_root_dir.mkdir(exist_ok=True, parents=True)
+        return str(bundle_root_dir)
+
+    @staticmethod
+    def serving_artifacts(pro_name, version, model_type):
+        serving_artifacts_dir = Path(OUTPUT_DIR) / "serving" / pro_name / version / model_type
+        serving_artifacts_dir.mkdir(exist_ok=True, parents=True)
+        return str(serving_artifacts_dir)
+
+    @staticmethod
+    def summary_snapshot(pro_name, version, model_type):
+        snapshot_dir = Path(OUTPUT_DIR) / "snapshot" / pro_name / version / model_type
+        snapshot_dir.mkdir(exist_ok=True, parents=True)
+        return str(snapshot_dir)
+
+    @staticmethod
+    def summary_store(pro_name, version, model_type):
+        store_dir = Path(OUTPUT_DIR) / "summary_store" / pro_name / version / model_type
+        store_dir.mkdir(exist_ok=True, parents=True)
+        return str(store_dir / "summary.sqlite")
+
+    @staticmethod
+    def benchmark_result(name):
+        benchmark_dir = Path(BENCHMARK_DIR)
+        benchmark_dir.mkdir(exist_ok=True, parents=True)
+        return str(benchmark_dir / "{name}.json".format(name=name))
+
+    @staticmethod
+    def slow_query_log():
+        log_dir = Path(LOG_DIR)
+        log_dir.mkdir(exist_ok=True, parents=True)
+        return str(log_dir / "slow_query.jsonl")
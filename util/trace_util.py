@@ -0,0 +1,169 @@
+import json
+import logging
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+
+class Span:
+    """
+    a timed part of a request, with the attributes like the candidate-set size and the nested spans.
+    """
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.children = []
+        self.start = 0.0
+        self.duration = 0.0
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "duration_ms": 1000 * self.duration,
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+    def __repr__(self):
+        return "<Span name=%r duration=%.6f children=%d>" % (self.name, self.duration, len(self.children))
+
+
+class SpanScope:
+    """
+    the context manager of a span, it pushes the span on the stack of the thread when entered.
+    """
+
+    def __init__(self, tracer, span):
+        self.tracer = tracer
+        self.span = span
+
+    def set(self, **attributes):
+        """
+        add the attributes known after the span is started, e.g. the number of methods of the class.
+        """
+        self.span.attributes.update(attributes)
+
+    def start(self):
+        stack = self.tracer.get_stack()
+        if len(stack) > 0:
+            stack[-1].children.append(self.span)
+        stack.append(self.span)
+        self.span.start = time.perf_counter()
+        return self
+
+    def finish(self, error=None):
+        self.span.duration = time.perf_counter() - self.span.start
+        if error is not None:
+            self.span.attributes["error"] = repr(error)
+        stack = self.tracer.get_stack()
+        if len(stack) > 0 and stack[-1] is self.span:
+            stack.pop()
+        return self.span
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finish(exc_value)
+        return False
+
+
+class NullSpanScope:
+    """
+    the span scope used when the thread is not tracing a request, it does nothing.
+    """
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN_SCOPE = NullSpanScope()
+
+
+class Tracer:
+    """
+    trace the spans of the requests. a request is traced by "with tracer.trace(span_name, ...) as scope:", the spans
+    started by "with tracer.span(span_name, ...):" in the same thread are nested into it as a tree.
+    the spans are only recorded when the thread is tracing a request, otherwise span() does nothing,
+    so the same code could run without tracing, e.g. in the scripts.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def get_stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = []
+            self.local.stack = stack
+        return stack
+
+    def reset(self):
+        """
+        drop the spans left by the last request of the thread, e.g. if it is broken by an exception.
+        """
+        self.local.stack = []
+
+    def is_tracing(self):
+        return len(getattr(self.local, "stack", ())) > 0
+
+    def trace(self, span_name, **attributes):
+        """
+        create the root span of a request, it is started by "with" or start(), and finished by finish().
+        :return: the SpanScope, the root span is scope.span
+        """
+        return SpanScope(self, Span(span_name, attributes))
+
+    def span(self, span_name, **attributes):
+        if not self.is_tracing():
+            return NULL_SPAN_SCOPE
+        return SpanScope(self, Span(span_name, attributes))
+
+
+class SlowQueryLog:
+    """
+    write the requests slower than the threshold into a rotating jsonl file, one line for each request with
+    the time, the duration, the attributes of the request (e.g. query and class name) and the span tree.
+    """
+
+    def __init__(self, log_path, threshold=1.0, max_bytes=16 * 1024 * 1024, backup_count=5):
+        """
+        :param log_path: the path of the log file
+        :param threshold: the seconds, the requests slower than it are written
+        :param max_bytes: the file is rotated when it is larger than it
+        :param backup_count: the number of the rotated files kept
+        """
+        self.log_path = log_path
+        self.threshold = threshold
+        self.logger = logging.getLogger("%s.%s" % (__name__, log_path))
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if len(self.logger.handlers) == 0:
+            handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def record(self, root_span):
+        """
+        :param root_span: the root span of the request
+        :return: True if the request is slow and written
+        """
+        if root_span.duration < self.threshold:
+            return False
+        record = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "duration_ms": 1000 * root_span.duration}
+        record.update(root_span.attributes)
+        record["span"] = root_span.to_dict()
+        self.logger.info(json.dumps(record, default=str))
+        return True
+
+    def close(self):
+        for handler in list(self.logger.handlers):
+            handler.close()
+            self.logger.removeHandler(handler)